@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Alert output cost on the detection thread: synchronous logging vs. AlertPipeline
+
+``sync`` is the previous handle_alerts: json.dumps(indent=2) of each alert
+logged through RichHandler to a terminal console (rendered to /dev/null).
+``pipeline`` submits the same alerts to an AlertPipeline writing NDJSON to
+a rotating file and, with --http, to a local _bulk endpoint served by
+this script. Reported: time the detection thread spends per alert, total
+time until every alert is written, and the pipeline's per-sink counters.
+
+Usage: python3 benchmarks/bench_alert_sink.py [--alerts 20000] [--http]
+"""
+
+import argparse
+import http.server
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rich.console import Console
+from rich.logging import RichHandler
+
+from src.alert_sink import AlertPipeline, FileSink, HttpSink
+from src.events import Event, json_default
+
+
+class BulkHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        body = b'{"errors":false}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_alerts(count):
+    now = time.time()
+    return [{
+        'type': 'ml_anomaly',
+        'severity': 'HIGH',
+        'score': -0.42,
+        'timestamp': '2024-01-01T00:00:00',
+        'event': Event(now + i, 'system', f"Failed password for root from 10.0.{i % 256}.{i % 251} port 22 ssh2"),
+        'description': "Anomalous system event detected by Isolation Forest"
+    } for i in range(count)]
+
+
+def run_sync(alerts):
+    with open(os.devnull, 'w') as devnull:
+        logger = logging.getLogger('bench.sync')
+        logger.propagate = False
+        logger.addHandler(RichHandler(console=Console(file=devnull, force_terminal=True, width=120)))
+        start = time.perf_counter()
+        for alert in alerts:
+            logger.warning(f"Anomaly detected: {json.dumps(alert, indent=2, default=json_default)}")
+        return time.perf_counter() - start
+
+
+def run_pipeline(alerts, directory, url):
+    sinks = [FileSink(os.path.join(directory, 'alerts.ndjson'), max_bytes=8 * 1024 * 1024)]
+    if url:
+        sinks.append(HttpSink(url))
+    pipeline = AlertPipeline(sinks, capacity=len(alerts), batch_size=500, flush_interval=0.2)
+    start = time.perf_counter()
+    for alert in alerts:
+        pipeline.submit(alert)
+    submitted = time.perf_counter() - start
+    pipeline.close()
+    return submitted, time.perf_counter() - start, pipeline.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--alerts', type=int, default=20000)
+    parser.add_argument('--http', action='store_true', help="also write to a local _bulk endpoint")
+    args = parser.parse_args()
+
+    alerts = make_alerts(args.alerts)
+    url = None
+    if args.http:
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), BulkHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/_bulk"
+
+    sync = run_sync(alerts)
+    with tempfile.TemporaryDirectory() as directory:
+        submitted, total, stats = run_pipeline(alerts, directory, url)
+        files = sorted(os.listdir(directory))
+
+    print(f"{'mode':>9} {'us/alert on detection thread':>29} {'total s':>8}")
+    print(f"{'sync':>9} {sync / len(alerts) * 1e6:>29.1f} {sync:>8.2f}")
+    print(f"{'pipeline':>9} {submitted / len(alerts) * 1e6:>29.1f} {total:>8.2f}")
+    print(f"pipeline: submitted={stats['submitted']} dropped={stats['dropped']} files={files}")
+    for name, sink in stats['sinks'].items():
+        print(f"  {name}: written={sink['written']} dropped={sink['dropped']} flushes={sink['flushes']} "
+              f"avg={sink['avg_latency'] * 1000:.2f}ms max={sink['max_latency'] * 1000:.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""Event archive: ingest overhead, size and search over a day of events
+
+Publishes ``--events`` events spread over 24 hours through an EventBus
+at ``--rate`` events per second with one draining consumer, first alone
+and then with an EventArchiver subscribed, and reports the time spent in
+publish, events dropped and how long the archive took to catch up. Then
+searches the day: a substring count over every event, the same count
+limited to one hour and one source (pruned by partition and segment
+metadata), and a query returning the matches, each with the Python memory
+it allocated. The baseline is the same search over an NDJSON file of the
+events, one json.loads per line.
+
+Usage: python3 benchmarks/bench_archive.py [--events 1000000] [--rate 100000]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from queue import Empty
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.archive import ArchiveReader, EventArchiver
+from src.event_bus import EventBus
+from src.events import Event, json_default
+
+DAY = 1792195200.0  # 2026-10-17 00:00 UTC
+SOURCES = ('system', 'network', 'application')
+
+
+def make_events(count, seed):
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        ts = DAY + i * 86400 / count
+        ip = f"10.{rng.randrange(4)}.{rng.randrange(64)}.{rng.randrange(256)}"
+        kind = rng.random()
+        if kind < 0.02:
+            content = f"sshd[{rng.randrange(9999)}]: Failed password for user{rng.randrange(500)} from {ip} port 22"
+            severity = 'WARNING'
+        elif kind < 0.5:
+            content = f"kernel: [UFW BLOCK] SRC={ip} DST=10.9.0.{rng.randrange(8)} PROTO=TCP DPT={rng.randrange(65536)}"
+            severity = 'INFO'
+        else:
+            content = f"api[{rng.randrange(99)}]: GET /v1/items/{rng.randrange(10 ** 6)} 200 {rng.randrange(900)}ms"
+            severity = 'INFO'
+        events.append(Event(ts, rng.choice(SOURCES), content, severity, attrs={'ip': ip}))
+    return events
+
+
+def consume(subscription, stop):
+    while not stop.is_set() or subscription.lag:
+        try:
+            subscription.get_batch(4096, 0.01, timeout=0.1)
+        except Empty:
+            continue
+
+
+def publish(events, root, rate):
+    """Publish at ``rate`` events/s with a draining consumer, plus an archiver when root is set
+
+    Returns the time spent inside publish, the bus stats and how long after
+    the last publish the archive was fully written.
+    """
+    bus = EventBus(capacity=10000, policy='drop_oldest')
+    stop = threading.Event()
+    consumer = threading.Thread(target=consume, args=(bus.subscribe('analyzer'), stop))
+    consumer.start()
+    archiver = None
+    if root:
+        archiver = EventArchiver(bus.subscribe('archive', capacity=50000), root).start()
+    busy = 0.0
+    started = time.perf_counter()
+    for first in range(0, len(events), 1000):
+        chunk_started = time.perf_counter()
+        for event in events[first:first + 1000]:
+            bus.publish(event)
+        busy += time.perf_counter() - chunk_started
+        delay = started + (first + 1000) / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    finished = time.perf_counter()
+    stop.set()
+    consumer.join()
+    stats = bus.stats()
+    if archiver is not None:
+        archiver.close(timeout=None)
+    return busy, stats, time.perf_counter() - finished
+
+
+def measured(fn):
+    """Result, seconds, and peak Python memory allocated (from a second, traced run)"""
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def ndjson_count(path, needle, start=None, end=None, source=None):
+    count = 0
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            record = json.loads(line)
+            if start is not None and not start <= record['ts'] < end:
+                continue
+            if source is not None and record['source'] != source:
+                continue
+            if needle in record['content']:
+                count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=1000000, help="events over one day")
+    parser.add_argument('--rate', type=float, default=100000.0, help="events published per second")
+    args = parser.parse_args()
+
+    events = make_events(args.events, 23)
+    with tempfile.TemporaryDirectory() as directory:
+        root = os.path.join(directory, 'archive')
+        for name, archive_root in (('without archive', None), ('with archive', root)):
+            busy, stats, catch_up = publish(events, archive_root, args.rate)
+            line = (f"publish {name:>15}: {busy / len(events) * 1e6:5.2f} us/event at {args.rate:.0f} events/s, "
+                    f"consumer dropped {stats['analyzer']['dropped']}")
+            if archive_root:
+                line += f", archiver dropped {stats['archive']['dropped']}, caught up {catch_up:.2f}s after"
+            print(line)
+
+        ndjson = os.path.join(directory, 'events.ndjson')
+        with open(ndjson, 'w', encoding='utf-8') as f:
+            for event in events:
+                f.write(json.dumps(dict(event.to_dict(), ts=event.ts), default=json_default) + '\n')
+        archived = sum(os.path.getsize(os.path.join(path, name))
+                       for path, _, names in os.walk(root) for name in names)
+        print(f"size: archive {archived / len(events):.0f} B/event, NDJSON {os.path.getsize(ndjson) / len(events):.0f} "
+              f"B/event")
+
+        reader = ArchiveReader(root)
+        needle = 'Failed password for user42 '
+        hour_start, hour_end = DAY + 13 * 3600, DAY + 14 * 3600
+        started = time.perf_counter()
+        baseline = ndjson_count(ndjson, needle)
+        print(f"{'NDJSON scan, day':>28}: {time.perf_counter() - started:7.3f}s, {baseline} matches")
+        count, seconds, peak = measured(lambda: reader.count(contains=needle))
+        print(f"{'archive count, day':>28}: {seconds:7.3f}s, {peak / 1e6:6.1f} MB allocated, {count} matches, "
+              f"{reader.last_scan}")
+        started = time.perf_counter()
+        baseline = ndjson_count(ndjson, 'Failed password', hour_start, hour_end, 'system')
+        print(f"{'NDJSON scan, hour + source':>28}: {time.perf_counter() - started:7.3f}s, {baseline} matches")
+        count, seconds, peak = measured(
+            lambda: reader.count(start=hour_start, end=hour_end, source='system', contains='Failed password'))
+        print(f"{'archive count, hour + source':>28}: {seconds:7.3f}s, {peak / 1e6:6.1f} MB allocated, "
+              f"{count} matches, {reader.last_scan}")
+        found, seconds, peak = measured(lambda: list(reader.query(contains=needle)))
+        print(f"{'archive query, day':>28}: {seconds:7.3f}s, {peak / 1e6:6.1f} MB allocated, {len(found)} events")
+
+
+if __name__ == '__main__':
+    main()
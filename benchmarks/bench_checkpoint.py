@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""Checkpoint size, save time and warm-restart time for detector state
+
+Fills an EventHistoryStore with ``--events`` parsed syslog events (brute
+force, firewall blocks, sudo and application errors from a few hundred
+hosts) and runs the last ``--analyzed`` of them through a LogAnalyzer, so
+the pattern, entity, distinct-count, similarity and sequence windows and
+the alert store are all populated. Then writes a checkpoint with the
+CheckpointManager and restores it into a fresh history and analyzer,
+reporting file size, save time, load + restore time, the first query
+against the restored history (which unpacks segments lazily) and whether
+the restored analyzer raises the same alerts as the original on the next
+events.
+
+Usage: python3 benchmarks/bench_checkpoint.py [--events 1000000] [--analyzed 20000]
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from queue import Queue
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.analyzer import LogAnalyzer
+from src.checkpoint import CheckpointManager
+from src.history import EventHistoryStore
+from src.parsers import LineParser
+
+
+def make_lines(count, seed):
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        ip = f"10.{rng.randrange(4)}.{rng.randrange(16)}.{rng.randrange(32)}"
+        second = i // 100
+        stamp = f"Oct 17 {second // 3600 % 24:02d}:{second // 60 % 60:02d}:{second % 60:02d}"
+        kind = rng.random()
+        if kind < 0.3:
+            lines.append(f"{stamp} web{rng.randrange(8):02d} sshd[{rng.randrange(9999)}]: "
+                         f"Failed password for user{rng.randrange(200)} from {ip} port 22")
+        elif kind < 0.5:
+            lines.append(f"{stamp} fw01 kernel: [UFW BLOCK] SRC={ip} DST=10.9.0.{rng.randrange(8)} "
+                         f"PROTO=TCP DPT={rng.randrange(1, 4096)}")
+        elif kind < 0.55:
+            lines.append(f"{stamp} web{rng.randrange(8):02d} sudo: user{rng.randrange(20)} : "
+                         f"privilege elevation via sudo")
+        else:
+            lines.append(f"{stamp} app{rng.randrange(8):02d} api[{rng.randrange(99)}]: Connection error "
+                         f"talking to {ip} after {rng.randrange(5000)} ms")
+    return lines
+
+
+def build(retention):
+    history = EventHistoryStore(retention=retention, max_bytes=8 * 1024 ** 3)
+    return history, LogAnalyzer(Queue(), history=history)
+
+
+def normalized(alerts):
+    return [json.dumps(alert, sort_keys=True, default=str) for alert in alerts]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=1000000, help="events held in the history")
+    parser.add_argument('--analyzed', type=int, default=20000, help="most recent events run through the analyzer")
+    parser.add_argument('--after', type=int, default=5000, help="events compared after the restore")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    line_parser = LineParser(year=2026)
+    events = [line_parser.parse(line, 'system') for line in make_lines(args.events + args.after, 17)]
+    later = events[args.events:]
+    events = events[:args.events]
+    # Long enough that nothing expires while the benchmark runs
+    retention = 10 ** 9
+    history, analyzer = build(retention)
+    for start in range(0, len(events), history.segment_size):
+        history.extend(events[start:start + history.segment_size])
+    for event in events[-args.analyzed:]:
+        analyzer.process_event(event)
+    print(f"{len(history)} events in history ({history.stats()['sealed_bytes'] / 1e6:.0f} MB), "
+          f"{args.analyzed} analyzed, {len(analyzer.alert_store)} alerts stored "
+          f"(built in {time.perf_counter() - started:.0f}s)")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'checkpoint.bin')
+        manager = CheckpointManager(path)
+        manager.register('history', history)
+        manager.register('analyzer', analyzer)
+        started = time.perf_counter()
+        manager.save()
+        print(f"save: {time.perf_counter() - started:.2f}s, {os.path.getsize(path) / 1e6:.1f} MB on disk")
+
+        restored_history, restored = build(retention)
+        # A restarted process does not hold the original history and
+        # analyzer: keep the collector from rescanning them during the restore
+        gc.freeze()
+        started = time.perf_counter()
+        manager = CheckpointManager(path)
+        manager.load()
+        manager.register('history', restored_history)
+        manager.register('analyzer', restored)
+        print(f"load + restore: {time.perf_counter() - started:.3f}s ({', '.join(manager.stats['restored'])})")
+
+    started = time.perf_counter()
+    latest = restored_history.latest(100)
+    first = time.perf_counter() - started
+    started = time.perf_counter()
+    everything = restored_history.range()
+    print(f"first latest(100): {first * 1e3:.1f} ms, full range of {len(everything)} events: "
+          f"{time.perf_counter() - started:.2f}s")
+    assert [event['content'] for event in latest] == [event['content'] for event in history.latest(100)]
+
+    original = []
+    warm = []
+    for event in later:
+        history.append(event)
+        restored_history.append(event)
+        original.extend(analyzer.process_event(event))
+        warm.extend(restored.process_event(event))
+    cold_history, cold = build(retention)
+    cold_alerts = []
+    for event in later:
+        cold_history.append(event)
+        cold_alerts.extend(cold.process_event(event))
+    print(f"next {len(later)} events: original {len(original)} alerts, restored {len(warm)} "
+          f"(identical: {normalized(original) == normalized(warm)}), cold start {len(cold_alerts)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Correlation cost per event as alert history grows: list rescans vs. incremental rules
+
+``rescan`` is the previous analyze_correlations: for every event, each rule
+scans the stored alerts of its types and parses their ISO timestamps.
+``incremental`` is AlertStore + CorrelationTracker, updated only when an
+alert fires; each alert is indexed under a host and a user, as the
+analyzer does.
+
+Usage: python3 benchmarks/bench_correlation.py [--history 1000,10000,100000]
+"""
+
+import argparse
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.alert_store import AlertStore, CorrelationTracker
+from src.analyzer import LogAnalyzer
+
+TYPES = ('brute_force', 'privilege_escalation', 'data_exfiltration', 'frequency')
+
+
+def rescan(rules, alerts_of_type):
+    fired = 0
+    for rule in rules:
+        matching = [
+            pattern for pattern in rule['events']
+            if any(alert['type'] == pattern
+                   for alert in alerts_of_type(pattern)
+                   if datetime.fromisoformat(alert['timestamp']) >
+                   datetime.now() - timedelta(seconds=rule['timeframe']))
+        ]
+        fired += len(matching) == len(rule['events'])
+    return fired
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--history', default='1000,10000,100000')
+    parser.add_argument('--events', type=int, default=200)
+    parser.add_argument('--alert-every', type=int, default=20, help="one alert per N events")
+    args = parser.parse_args()
+
+    rules = LogAnalyzer(None).load_correlation_rules()
+    print(f"{'alerts held':>12} {'rescan us/event':>16} {'incremental us/event':>21}")
+    for size in [int(n) for n in args.history.split(',')]:
+        now = time.time()
+        # Old history: every alert ever raised, never expired
+        alert_history = defaultdict(list)
+        for i in range(size):
+            alert_type = TYPES[i % len(TYPES)]
+            stamp = datetime.fromtimestamp(now - 7200 + i * 7200 / size).isoformat()
+            alert_history[alert_type].append({'type': alert_type, 'timestamp': stamp})
+
+        start = time.perf_counter()
+        for _ in range(args.events):
+            rescan(rules, lambda t: alert_history[t])
+        old = (time.perf_counter() - start) / args.events * 1e6
+
+        store = AlertStore(retention=max(rule['timeframe'] for rule in rules))
+        tracker = CorrelationTracker(rules, store)
+        for i in range(size):
+            ts = now - 7200 + i * 7200 / size
+            alert = {'type': TYPES[i % len(TYPES)]}
+            entities = [f"host{i % 50}", f"user{i % 30}"]
+            store.add(alert, entities, ts)
+            tracker.observe(alert['type'], entities, ts)
+        start = time.perf_counter()
+        for i in range(args.events):
+            if i % args.alert_every == 0:
+                ts = now + i * 0.01
+                alert = {'type': TYPES[i % len(TYPES)]}
+                entities = [f"host{i % 50}", f"user{i % 30}"]
+                store.add(alert, entities, ts)
+                tracker.observe(alert['type'], entities, ts)
+        new = (time.perf_counter() - start) / args.events * 1e6
+        print(f"{size:>12} {old:>16.1f} {new:>21.2f}")
+
+
+if __name__ == '__main__':
+    main()
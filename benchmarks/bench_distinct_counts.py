@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""Distinct ports per source IP: exact sets vs. DistinctWindowCounter
+
+Background traffic reaches one or two common ports from many source IPs;
+``--scanners`` sources each probe ``--ports`` distinct destination ports
+within the 5 minute window. Both approaches count distinct ports per IP
+over the sliding window: a dict per IP of port -> last seen time (what an
+exact sliding count needs), and the DistinctWindowCounter the
+port_scan rule uses (exact up to 32 values, HyperLogLog beyond). Reports
+time per event, memory held, bytes per scanner and the count error.
+
+Usage: python3 benchmarks/bench_distinct_counts.py [--events 500000] [--scanners 20] [--ports 5000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.sketches import DistinctWindowCounter
+
+TIMEFRAME = 300
+COMMON_PORTS = (22, 80, 443, 443, 443, 8080)
+
+
+def make_stream(events, scanners, ports, rate, seed):
+    rng = random.Random(seed)
+    start = 1_700_000_000.0
+    stream = [
+        (f"198.{rng.randrange(64)}.{rng.randrange(256)}.{rng.randrange(256)}", rng.choice(COMMON_PORTS),
+         start + i / rate)
+        for i in range(events)
+    ]
+    scanner_ips = [f"203.0.113.{i + 1}" for i in range(scanners)]
+    probes = []
+    for ip in scanner_ips:
+        first = start + rng.uniform(0, events / rate - TIMEFRAME)
+        for port in rng.sample(range(1, 65536), ports):
+            # Each scan lasts at most one minute
+            probes.append((ip, port, first + rng.uniform(0, 60)))
+    stream.extend(probes)
+    stream.sort(key=lambda item: item[2])
+    return stream, scanner_ips
+
+
+def run_exact(stream):
+    seen = {}
+    peak = {}
+    for ip, port, ts in stream:
+        ports = seen.get(ip)
+        if ports is None:
+            ports = seen[ip] = {}
+        ports.pop(port, None)
+        ports[port] = ts
+        # Oldest first: drop ports last seen before the window
+        while True:
+            first = next(iter(ports))
+            if ports[first] >= ts - TIMEFRAME:
+                break
+            del ports[first]
+        if len(ports) > peak.get(ip, 0):
+            peak[ip] = len(ports)
+    return seen, peak
+
+
+def run_sketch(stream, precision):
+    counter = DistinctWindowCounter(TIMEFRAME, precision=precision)
+    peak = {}
+    for ip, port, ts in stream:
+        count = counter.add(ip, port, ts)
+        if count > peak.get(ip, 0):
+            peak[ip] = count
+    return counter, peak
+
+
+def measure(fn, stream):
+    started = time.perf_counter()
+    fn(stream)
+    elapsed = time.perf_counter() - started
+    tracemalloc.start()
+    structure, peak = fn(stream)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return elapsed, held, structure, peak
+
+
+def scanner_bytes(ports, precision):
+    """Memory one entity with ``ports`` distinct values holds in each structure"""
+    tracemalloc.start()
+    exact = {port: 1_700_000_000.0 + port / 100 for port in range(ports)}
+    exact_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    counter = DistinctWindowCounter(TIMEFRAME, precision=precision)
+    counter.add('warmup', 0, 1_700_000_000.0)
+    tracemalloc.start()
+    for port in range(ports):
+        counter.add('scanner', port, 1_700_000_000.0 + port * TIMEFRAME / ports)
+    sketch_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del exact, counter
+    return exact_bytes, sketch_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=500000, help="background events")
+    parser.add_argument('--rate', type=float, default=1000.0, help="background events per second")
+    parser.add_argument('--scanners', type=int, default=20)
+    parser.add_argument('--ports', type=int, default=5000, help="distinct ports per scanner")
+    parser.add_argument('--precision', type=int, default=9, help="HyperLogLog registers: 2 ** precision")
+    args = parser.parse_args()
+
+    stream, scanner_ips = make_stream(args.events, args.scanners, args.ports, args.rate, 11)
+    print(f"{len(stream)} events, {len({ip for ip, _, _ in stream})} source IPs, "
+          f"{args.scanners} scanners x {args.ports} ports, {TIMEFRAME}s window")
+    exact_time, exact_held, _, exact_peak = measure(run_exact, stream)
+    sketch_time, sketch_held, counter, sketch_peak = measure(lambda s: run_sketch(s, args.precision), stream)
+    print(f"{'exact dicts':>22}: {exact_time / len(stream) * 1e6:6.2f} us/event, {exact_held / 1e6:6.1f} MB")
+    print(f"{'DistinctWindowCounter':>22}: {sketch_time / len(stream) * 1e6:6.2f} us/event, "
+          f"{sketch_held / 1e6:6.1f} MB, {counter.stats()}")
+    errors = [abs(sketch_peak[ip] - exact_peak[ip]) / exact_peak[ip] for ip in scanner_ips]
+    print(f"scanner peak count error: mean {sum(errors) / len(errors):.1%}, max {max(errors):.1%}")
+    background = [ip for ip in exact_peak if ip not in scanner_ips]
+    mismatched = sum(1 for ip in background if sketch_peak[ip] != exact_peak[ip])
+    print(f"background IPs with a different count: {mismatched} of {len(background)}")
+    exact_bytes, sketch_bytes = scanner_bytes(args.ports, args.precision)
+    print(f"one entity with {args.ports} distinct values: exact {exact_bytes / 1024:.0f} KB, "
+          f"DistinctWindowCounter {sketch_bytes / 1024:.1f} KB")
+
+
+if __name__ == '__main__':
+    main()
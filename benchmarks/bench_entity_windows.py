@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Per-entity thresholds: global window vs. exact dict vs. EntityWindowCounter
+
+A stream of failed logins from many distinct source IPs (background noise,
+one attempt per IP) hides a few attackers making ``--attempts`` attempts
+each within the 5 minute window. Each approach counts the stream against
+the brute-force threshold of 5: one global SlidingWindowCounter (the old
+behaviour), a dict of one SlidingWindowCounter per IP, and the sketch-backed
+EntityWindowCounter. Reports which IPs alert, time per event and the memory
+each structure holds at the end.
+
+Usage: python3 benchmarks/bench_entity_windows.py [--events 1000000] [--attackers 5]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.sketches import EntityWindowCounter
+from src.windows import SlidingWindowCounter
+
+THRESHOLD = 5
+TIMEFRAME = 300
+
+
+def make_stream(events, attackers, attempts, rate, seed):
+    rng = random.Random(seed)
+    start = 1_700_000_000.0
+    stream = []
+    for i in range(events):
+        stream.append((f"198.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}", start + i / rate))
+    attacker_ips = [f"203.0.113.{i + 1}" for i in range(attackers)]
+    for ip in attacker_ips:
+        first = rng.randrange(events - 1000)
+        # The attempts land within one minute of each other
+        for _ in range(attempts):
+            position = min(events - 1, first + rng.randrange(int(rate * 60)))
+            stream.insert(position, (ip, stream[position][1]))
+    return stream, set(attacker_ips)
+
+
+def run_global(stream):
+    window = SlidingWindowCounter(TIMEFRAME)
+    alerted = 0
+    for ip, ts in stream:
+        window.add(ts)
+        if window.count(ts) >= THRESHOLD:
+            alerted += 1
+    return window, {'<global>'} if alerted else set()
+
+
+def run_exact(stream):
+    windows = {}
+    alerted = set()
+    for ip, ts in stream:
+        window = windows.get(ip)
+        if window is None:
+            window = windows[ip] = SlidingWindowCounter(TIMEFRAME)
+        window.add(ts)
+        if window.count(ts) >= THRESHOLD:
+            alerted.add(ip)
+    return windows, alerted
+
+
+def run_sketch(stream, width, max_exact):
+    window = EntityWindowCounter(TIMEFRAME, width=width, max_exact=max_exact)
+    alerted = set()
+    for ip, ts in stream:
+        if window.add(ip, ts) >= THRESHOLD:
+            alerted.add(ip)
+    return window, alerted
+
+
+def measure(name, fn, stream, attacker_ips):
+    started = time.perf_counter()
+    structure, alerted = fn(stream)
+    elapsed = time.perf_counter() - started
+    del structure
+    # A second run under tracemalloc for the memory the structure holds
+    tracemalloc.start()
+    structure, _ = fn(stream)
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del structure
+    caught = len(alerted & attacker_ips)
+    false_alerts = len(alerted - attacker_ips)
+    print(f"{name:>22}: {elapsed / len(stream) * 1e6:6.2f} us/event, {held / 1e6:7.1f} MB, "
+          f"attackers caught {caught}/{len(attacker_ips)}, other entities alerted {false_alerts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=1000000, help="background failed logins")
+    parser.add_argument('--rate', type=float, default=100.0, help="background events per second")
+    parser.add_argument('--attackers', type=int, default=5)
+    parser.add_argument('--attempts', type=int, default=8, help="attempts per attacker")
+    parser.add_argument('--width', type=int, default=8192)
+    parser.add_argument('--max-exact', type=int, default=4096)
+    args = parser.parse_args()
+
+    stream, attacker_ips = make_stream(args.events, args.attackers, args.attempts, args.rate, 5)
+    distinct = len({ip for ip, _ in stream})
+    print(f"{len(stream)} events from {distinct} IPs, {args.rate * TIMEFRAME:.0f} per {TIMEFRAME}s window, "
+          f"{args.attackers} attackers x {args.attempts} attempts, threshold {THRESHOLD}")
+    measure('global window', run_global, stream, attacker_ips)
+    measure('dict of exact windows', run_exact, stream, attacker_ips)
+    measure('EntityWindowCounter', lambda s: run_sketch(s, args.width, args.max_exact), stream, attacker_ips)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""Memory per retained event and timestamp compare cost: dict events vs. Event
+
+Builds the events the collectors produce (unique content, shared file path)
+both as the old dicts with an ISO timestamp string and as Event objects,
+and measures the heap they retain with tracemalloc.
+
+Usage: python3 benchmarks/bench_event_memory.py [--events 1000000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.events import Event
+
+FILE_PATH = os.path.join(os.getcwd(), 'logs', 'system.log')
+SOURCES = ('system', 'network', 'application')
+SEVERITIES = ('INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+
+def content(i):
+    return f"Failed login attempt from IP 10.0.{i % 256}.{i % 253} for user user{i}"
+
+
+def make_dicts(count, start):
+    return [{
+        'timestamp': datetime.fromtimestamp(start + i * 0.001).isoformat(),
+        'source': SOURCES[i % 3],
+        'file': FILE_PATH,
+        'content': content(i),
+        'severity': SEVERITIES[i % 4]
+    } for i in range(count)]
+
+
+def make_events(count, start):
+    return [
+        Event(start + i * 0.001, SOURCES[i % 3], content(i), SEVERITIES[i % 4], file=FILE_PATH)
+        for i in range(count)
+    ]
+
+
+def retained_bytes(factory, count, start):
+    """Heap retained by the events, and by their content strings alone"""
+    gc.collect()
+    tracemalloc.start()
+    events = factory(count, start)
+    total = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    contents = sum(sys.getsizeof(event['content']) for event in events)
+    return events, total, contents
+
+
+def compare_seconds(events, cutoff, as_float):
+    start = time.perf_counter()
+    if as_float:
+        newer = sum(1 for event in events if event.ts > cutoff)
+    else:
+        newer = sum(1 for event in events
+                    if datetime.fromisoformat(event['timestamp']).timestamp() > cutoff)
+    return time.perf_counter() - start, newer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=1000000)
+    args = parser.parse_args()
+
+    start = time.time() - args.events * 0.001
+    # Half a step between two events, so the microsecond rounding of the
+    # dicts' ISO timestamps cannot move an event across the cutoff
+    cutoff = start + (args.events // 2 + 0.5) * 0.001
+    print(f"{args.events:,} retained events")
+    print(f"\n{'representation':>15} {'MB':>8} {'bytes/event':>12} {'excl. content':>14} {'window scan s':>14}")
+    results = {}
+    for label, factory, as_float in (('dict', make_dicts, False), ('Event', make_events, True)):
+        events, total, contents = retained_bytes(factory, args.events, start)
+        seconds, newer = compare_seconds(events, cutoff, as_float)
+        results[label] = (total, newer)
+        print(f"{label:>15} {total / 1e6:>8.1f} {total / args.events:>12.0f} "
+              f"{(total - contents) / args.events:>14.0f} {seconds:>14.2f}")
+        del events
+    if results['dict'][1] != results['Event'][1]:
+        raise SystemExit("Window scans disagree")
+    print(f"\nEvent retains {results['dict'][0] / results['Event'][0]:.1f}x less memory")
+
+
+if __name__ == '__main__':
+    main()
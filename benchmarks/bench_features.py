@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Feature extraction throughput: per-event extractors vs. the batch extractor
+
+Checks that both produce identical values before timing them.
+
+Usage: python3 benchmarks/bench_features.py [--events 100000] [--batch-size 512]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.ai_detection import AIDetectionEngine
+
+WORDS = [
+    'error', 'warning', 'critical', 'failed', 'Failed', 'permission', 'denied',
+    'crash', 'kernel', 'login', 'user', 'root', 'from', '192.168.1.100',
+    'port', '22', '404', '500', '403', 'timeout', 'exception', 'null',
+    'undefined', 'GET', '/index.html', 'session', 'Ünïcödé', 'İstanbul'
+]
+SOURCES = ['system', 'network', 'application', 'auth', 'custom']
+
+
+def make_events(count, seed):
+    rng = random.Random(seed)
+    return [{
+        'timestamp': '2024-03-20T10:15:45',
+        'source': rng.choice(SOURCES),
+        'content': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 30))),
+        'severity': 'INFO'
+    } for _ in range(count)]
+
+
+def per_event(engine, events):
+    return np.array([engine.extract_features(event) for event in events])
+
+
+def throughput(func, engine, events, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(events), batch_size):
+        func(engine, events[i:i + batch_size])
+    return len(events) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=512)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    engine = AIDetectionEngine(None, scoring_only=True)
+    events = make_events(args.events, args.seed)
+
+    expected = per_event(engine, events).astype(np.float32)
+    actual = engine.extract_features_batch(events)
+    if actual.dtype != np.float32 or not np.array_equal(expected, actual):
+        mismatched = np.argwhere(expected != actual)
+        raise SystemExit(f"Feature mismatch at {len(mismatched)} cells, first {mismatched[:5].tolist()}")
+    print(f"identical features for {len(events)} events")
+
+    print(f"\n{'extractor':>10} {'events/s':>12}")
+    baseline = throughput(per_event, engine, events, args.batch_size)
+    batched = throughput(AIDetectionEngine.extract_features_batch, engine, events, args.batch_size)
+    print(f"{'per-event':>10} {baseline:>12,.0f}")
+    print(f"{'batch':>10} {batched:>12,.0f}  ({batched / baseline:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Event history: concurrent append rate and window query latency
+
+Compares EventHistoryStore range queries against scanning a deque, as the
+engines' count-capped histories did, at growing history sizes.
+
+Usage: python3 benchmarks/bench_history.py [--sizes 10000,100000,1000000] [--writers 3]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.events import Event
+from src.history import EventHistoryStore
+
+SOURCES = ('system', 'network', 'application')
+
+
+def make_events(count, rate):
+    start = time.time() - count / rate
+    return [
+        Event(start + i / rate, SOURCES[i % 3], f"event {i} from 10.0.{i % 256}.{i % 251}")
+        for i in range(count)
+    ]
+
+
+def append_rate(events, writers, retention):
+    store = EventHistoryStore(retention=retention, max_bytes=1 << 40)
+    parts = [events[i::writers] for i in range(writers)]
+    threads = [threading.Thread(target=lambda part=part: [store.append(e) for e in part])
+               for part in parts]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return store, len(events) / (time.perf_counter() - start)
+
+
+def median_ms(func, repeat=21):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10000,100000,1000000')
+    parser.add_argument('--writers', type=int, default=3)
+    parser.add_argument('--rate', type=float, default=1000.0, help="events per second of log time")
+    parser.add_argument('--window', type=float, default=60.0, help="seconds queried")
+    args = parser.parse_args()
+
+    print(f"{'events':>9} {'append/s':>10} {'deque scan ms':>14} {'store ms':>9} "
+          f"{'store+source ms':>16} {'hits':>7}")
+    for size in [int(n) for n in args.sizes.split(',')]:
+        events = make_events(size, args.rate)
+        store, rate = append_rate(events, args.writers, retention=size / args.rate + 60)
+        history = deque(events)
+        cutoff = events[-1].ts - args.window
+
+        expected = sum(1 for event in history if event.ts >= cutoff)
+        hits = len(store.range(cutoff))
+        if hits != expected:
+            raise SystemExit(f"Store returned {hits} events, scan found {expected}")
+        scan = median_ms(lambda: [event for event in history if event.ts >= cutoff])
+        indexed = median_ms(lambda: store.range(cutoff))
+        by_source = median_ms(lambda: store.range(cutoff, source='network'))
+        print(f"{size:>9} {rate:>10,.0f} {scan:>14.2f} {indexed:>9.3f} {by_source:>16.3f} {hits:>7}")
+
+
+if __name__ == '__main__':
+    main()
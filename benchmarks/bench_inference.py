@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Neural network scoring latency: Keras predict vs. the NumPy forward pass
+
+Usage: python3 benchmarks/bench_inference.py [--batch-sizes 1,10,100,10000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from src.ai_detection import AIDetectionEngine
+from src.inference import DenseNetwork
+
+
+def latency_ms(func, features, budget):
+    """Median per-call latency in milliseconds over at most budget seconds"""
+    func(features)  # warm up
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < 5 or (time.perf_counter() - start < budget and len(samples) < 1000):
+        t = time.perf_counter()
+        func(features)
+        samples.append((time.perf_counter() - t) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-sizes', default='1,10,100,10000')
+    parser.add_argument('--budget', type=float, default=2.0)
+    args = parser.parse_args()
+
+    engine = AIDetectionEngine(None)
+    model = engine.model
+    network = DenseNetwork.from_keras(model)
+    rng = np.random.default_rng(0)
+
+    print(f"{'batch':>6} {'keras predict ms':>17} {'keras call ms':>14} {'numpy ms':>9} {'speedup':>8} {'max abs diff':>13}")
+    for size in [int(b) for b in args.batch_sizes.split(',')]:
+        features = rng.standard_normal((size, 20)).astype(np.float32)
+        diff = np.abs(model.predict(features, verbose=0) - network.predict(features)).max()
+
+        keras_predict = latency_ms(lambda x: model.predict(x, verbose=0), features, args.budget)
+        keras_call = latency_ms(lambda x: model(x, training=False).numpy(), features, args.budget)
+        numpy_ms = latency_ms(network.predict, features, args.budget)
+        print(f"{size:>6} {keras_predict:>17.3f} {keras_call:>14.3f} {numpy_ms:>9.3f} "
+              f"{keras_predict / numpy_ms:>7.0f}x {diff:>13.2e}")
+
+
+if __name__ == '__main__':
+    main()
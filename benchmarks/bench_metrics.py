@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Instrumentation overhead: detection with metrics enabled, disabled and while profiling
+
+Runs LogAnalyzer.process_event and the AI engine's process_batch
+(signature stage, scoring only) over the same events with the default
+registry and with a disabled MetricsRegistry whose metrics are no-ops.
+``profiled`` adds the StackSampler at its default 10 ms interval.
+The order of the three modes rotates on every repeat and the median is
+reported, since on a busy machine whichever run goes first is faster.
+
+Usage: python3 benchmarks/bench_metrics.py [--events 20000] [--repeat 9]
+"""
+
+import argparse
+import gc
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ai_detection import AIDetectionEngine
+from src.analyzer import LogAnalyzer
+from src.events import Event
+from src.metrics import MetricsRegistry, StackSampler
+
+LINES = [
+    "Failed login attempt for root from 10.0.{a}.{b} port 22",
+    "GET /index.html 200 from 10.1.{a}.{b}",
+    "sudo: user{a} : COMMAND=/bin/ls",
+    "connection from 10.2.{a}.{b} closed after {a} ms",
+]
+
+
+def make_events(count):
+    now = time.time()
+    return [Event(now, ('system', 'network', 'application')[i % 3],
+                  LINES[i % len(LINES)].format(a=i % 256, b=(i * 7) % 256))
+            for i in range(count)]
+
+
+def run_analyzer(events, metrics):
+    analyzer = LogAnalyzer(None, metrics=metrics)
+    start = time.perf_counter()
+    for event in events:
+        analyzer.process_event(event)
+    return time.perf_counter() - start
+
+
+def run_ai(events, metrics, batch=512):
+    engine = AIDetectionEngine(None, scoring_only=True, metrics=metrics)
+    start = time.perf_counter()
+    for i in range(0, len(events), batch):
+        engine.process_batch(events[i:i + batch])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=9)
+    args = parser.parse_args()
+
+    events = make_events(args.events)
+    profile = os.path.join(tempfile.mkdtemp(), 'profile.folded')
+    modes = ('disabled', 'enabled', 'profiled')
+    for name, run in (('analyzer', run_analyzer), ('ai', run_ai)):
+        times = {mode: [] for mode in modes}
+        for repeat in range(args.repeat):
+            for i in range(len(modes)):
+                mode = modes[(repeat + i) % len(modes)]
+                gc.collect()
+                sampler = StackSampler(profile).start() if mode == 'profiled' else None
+                times[mode].append(run(events, MetricsRegistry(enabled=mode != 'disabled')))
+                if sampler is not None:
+                    sampler.stop()
+        median = {mode: statistics.median(samples) for mode, samples in times.items()}
+        base = median['disabled']
+        for mode, seconds in median.items():
+            print(f"{name:>9} {mode:>9}: {len(events) / seconds:>9.0f} events/s "
+                  f"({(seconds / base - 1) * 100:+.1f}%)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""Ingest cost per line: structured LineParser vs the old keyword loop
+
+Lines in four formats (bracketed timestamp, syslog, JSON, nginx combined)
+are turned into Events the old way (lowercase the line for the keyword
+filter, lowercase it again for three severity scans, stamp it with the
+current time, and let the host and user entity lookups search the content
+with regexes) and with LineParser, which folds the line once for the
+keyword filter and severity, parses the line's own timestamp and level,
+and stores the IP and user on the event so the entity lookups read them.
+
+Usage: python3 benchmarks/bench_parsers.py [--lines 100000] [--format mixed] [--lookups 1]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.events import ENTITY_KEYS, Event
+from src.parsers import LineParser
+
+PATTERNS = ['error', 'warning', 'critical', 'failed', '403', '404', '500', 'denied']
+MESSAGES = [
+    "Failed password for invalid user {user} from {ip} port 22",
+    "Accepted publickey for {user} from {ip} port 51234",
+    "connection error talking to {ip}",
+    "session opened for user {user}",
+    "permission denied for user {user}",
+    "health check passed",
+]
+_IPV4 = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+_USER = re.compile(r'\b(?:user|for)[=: ]+([\w.@-]+)', re.IGNORECASE)
+
+
+def make_line(rng, fmt):
+    ip = f"10.0.{rng.randrange(256)}.{rng.randrange(256)}"
+    user = rng.choice(['root', 'admin', 'alice', 'bob', 'deploy'])
+    message = rng.choice(MESSAGES).format(ip=ip, user=user)
+    level = rng.choice(['INFO', 'WARNING', 'ERROR'])
+    second = rng.randrange(60)
+    if fmt == 'bracket':
+        return f"[2024-03-20 10:15:{second:02d}] {level}: {message}\n"
+    if fmt == 'syslog':
+        return f"<38>Mar 20 10:15:{second:02d} web01 sshd[{rng.randrange(99999)}]: {message}\n"
+    if fmt == 'json':
+        return (f'{{"timestamp": "2024-03-20T10:15:{second:02d}Z", "level": "{level.lower()}", '
+                f'"message": "{message}", "host": "web01"}}\n')
+    status = rng.choice([200, 200, 200, 304, 403, 404, 500])
+    return (f'{ip} - {user} [20/Mar/2024:10:15:{second:02d} +0000] "GET /index.html HTTP/1.1" '
+            f'{status} 512 "-" "Mozilla/5.0"\n')
+
+
+def determine_severity(log_line):
+    log_lower = log_line.lower()
+    if any(critical in log_lower for critical in ['critical', 'emergency', 'alert']):
+        return 'CRITICAL'
+    elif any(error in log_lower for error in ['error', 'failure', 'failed']):
+        return 'ERROR'
+    elif any(warning in log_lower for warning in ['warning', 'warn']):
+        return 'WARNING'
+    return 'INFO'
+
+
+def legacy(lines, lookups):
+    kept = 0
+    for line in lines:
+        if any(pattern in line.lower() for pattern in PATTERNS):
+            event = Event(time.time(), 'system', line.strip(), determine_severity(line))
+            for _ in range(lookups):
+                match = _IPV4.search(event.content)
+                host = match.group(0) if match else event.source
+                match = _USER.search(event.content)
+                user = match.group(1) if match else event.source
+            kept += 1
+    return kept
+
+
+def structured(lines, lookups):
+    parser = LineParser(keywords=PATTERNS)
+    host_key = ENTITY_KEYS['host']
+    user_key = ENTITY_KEYS['user']
+    kept = 0
+    for line in lines:
+        event = parser.parse(line, 'system')
+        if event is not None:
+            for _ in range(lookups):
+                host = host_key(event)
+                user = user_key(event)
+            kept += 1
+    return kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=100000)
+    parser.add_argument('--format', choices=['mixed', 'bracket', 'syslog', 'json', 'nginx'], default='mixed')
+    parser.add_argument('--lookups', type=int, default=1,
+                        help="host and user entity lookups per event downstream (partitioning, "
+                             "sequences, correlation and suppression each do one)")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    formats = ['bracket', 'syslog', 'json', 'nginx'] if args.format == 'mixed' else [args.format]
+    # Files hold one format each, so a collector sees long runs of one format
+    per_format = args.lines // len(formats)
+    lines = [make_line(rng, fmt) for fmt in formats for _ in range(per_format)]
+
+    results = {}
+    for name, fn in (('legacy', legacy), ('structured', structured)):
+        best = None
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            kept = fn(lines, args.lookups)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+        print(f"{name:>10}: {best / len(lines) * 1e6:.2f} us/line, {kept} of {len(lines)} lines kept")
+    print(f"speedup: {results['legacy'] / results['structured']:.2f}x "
+          f"(structured also parses timestamps, levels and fields)")
+
+
+if __name__ == '__main__':
+    main()
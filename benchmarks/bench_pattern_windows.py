@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""Per-event latency of LogAnalyzer.analyze_patterns as retained history grows
+
+The original implementation rescans the whole history for every matching
+event; the sliding-window counters should keep latency flat up to 1M events.
+Patterns with an ``entity`` are counted per entity by both, so the legacy
+scan only counts history events with the same host or user.
+
+Usage: python3 benchmarks/bench_pattern_windows.py [--sizes 1000,10000,100000,1000000]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.analyzer import LogAnalyzer
+from src.events import ENTITY_KEYS
+
+LINES = [
+    'Failed login attempt from IP 192.168.1.{n}',
+    'sudo: user{n} : TTY=pts/0 ; COMMAND=/bin/ls',
+    'large file transfer of {n} MB to 203.0.113.7',
+    'GET /index.html 200 from 10.0.0.{n}',
+    'session opened for user app{n}',
+    'health check ok in {n}ms',
+]
+
+
+def make_event(rng):
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'source': 'system',
+        'content': rng.choice(LINES).format(n=rng.randint(1, 250)),
+        'severity': 'INFO'
+    }
+
+
+def legacy_analyze_patterns(patterns, history, event):
+    """The original history-scanning analyze_patterns, restricted to the event's entity"""
+    matches = []
+    content = event['content'].lower()
+    for pattern_name, pattern_info in patterns.items():
+        if re.search(pattern_info['pattern'], content, re.IGNORECASE):
+            entity_key = pattern_info.get('entity')
+            entity = ENTITY_KEYS[entity_key](event) if entity_key else None
+            recent_matches = [
+                e for e in history
+                if re.search(pattern_info['pattern'], e['content'], re.IGNORECASE)
+                and (entity_key is None or ENTITY_KEYS[entity_key](e) == entity)
+                and datetime.fromisoformat(e['timestamp']) >
+                datetime.now() - timedelta(seconds=pattern_info['timeframe'])
+            ]
+            if len(recent_matches) >= pattern_info['threshold']:
+                matches.append((pattern_name, len(recent_matches)))
+    return matches
+
+
+def measure(func, events, budget):
+    """Mean latency in microseconds over events, stopping after budget seconds"""
+    done = 0
+    start = time.perf_counter()
+    for event in events:
+        func(event)
+        done += 1
+        if time.perf_counter() - start > budget:
+            break
+    return (time.perf_counter() - start) / done * 1e6, done
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000')
+    parser.add_argument('--samples', type=int, default=2000)
+    parser.add_argument('--budget', type=float, default=3.0,
+                        help='max seconds spent measuring each implementation and size')
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'history':>9} {'legacy us/event':>16} {'windowed us/event':>18}")
+    for size in [int(s) for s in args.sizes.split(',')]:
+        history = [make_event(rng) for _ in range(size)]
+        probes = [make_event(rng) for _ in range(args.samples)]
+
+        analyzer = LogAnalyzer(None)
+        for event in history:
+            analyzer.analyze_patterns(event)
+
+        # Correctness: both implementations agree on the first probes
+        for event in probes[:20]:
+            history.append(event)
+            legacy = legacy_analyze_patterns(analyzer.event_patterns, history, event)
+            windowed = [(m['type'], m['matched_events']) for m in analyzer.analyze_patterns(event)]
+            assert legacy == windowed, (legacy, windowed)
+
+        def run_legacy(event):
+            history.append(event)
+            legacy_analyze_patterns(analyzer.event_patterns, history, event)
+
+        legacy_us, legacy_n = measure(run_legacy, probes[20:], args.budget)
+        windowed_us, _ = measure(analyzer.analyze_patterns, probes[20:], args.budget)
+        print(f"{size:>9} {legacy_us:>13.1f} ({legacy_n:>4}) {windowed_us:>18.1f}")
+
+
+if __name__ == '__main__':
+    main()
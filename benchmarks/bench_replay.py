@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Offline replay throughput over generated archives, plain and gzipped
+
+Writes a plain system log and a gzipped network log with increasing
+timestamps, then replays both through LogReplayer with every engine, the
+analyzer only, and parsing only (no engines). Lines without their
+source's collector keywords are dropped, as in live collection, so
+``events`` is lower than the line count.
+
+Usage: python3 benchmarks/bench_replay.py [--lines 100000]
+"""
+
+import argparse
+import gzip
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.replay import LogReplayer
+
+MESSAGES = [
+    "INFO: Accepted password for user{u} from 10.0.{a}.{b} port 22",
+    "WARNING: Failed login attempt for admin from 10.0.{a}.{b}",
+    "ERROR: Authentication failure for user{u} from 10.0.{a}.{b}",
+    "INFO: GET /index.html 200 from 10.1.{a}.{b}",
+    "INFO: connection from 10.2.{a}.{b} closed after {u} ms",
+    "CRITICAL: sudo su - root executed by user{u}",
+]
+
+
+def write_log(path, lines, start, seed):
+    rng = random.Random(seed)
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'wt') as f:
+        for i in range(lines):
+            stamp = (start + timedelta(seconds=i * 0.5)).strftime('%Y-%m-%d %H:%M:%S')
+            message = rng.choice(MESSAGES).format(u=rng.randrange(50), a=rng.randrange(8), b=rng.randrange(256))
+            f.write(f"[{stamp}] {message}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=100000, help="lines per file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = datetime(2024, 3, 20)
+        paths = [os.path.join(directory, 'system.log'), os.path.join(directory, 'network.log.gz')]
+        write_log(paths[0], args.lines, start, 1)
+        write_log(paths[1], args.lines, start + timedelta(seconds=0.25), 2)
+        print(f"{'engines':>16} {'lines/s':>9} {'MB/s':>6} {'events':>7} {'alerts':>7} {'written':>8}")
+        for label, options in (('analyzer + ai', {}), ('analyzer', {'ai': False}),
+                               ('parse only', {'ai': False, 'analyzer': False})):
+            replayer = LogReplayer(alert_path=os.path.join(directory, 'alerts.ndjson'), **options)
+            stats = replayer.replay(paths)
+            print(f"{label:>16} {stats['lines_per_second']:>9.0f} {stats['mb_per_second']:>6.2f} "
+                  f"{stats['events']:>7} {stats['alerts']:>7} {stats['written']:>8}")
+
+
+if __name__ == '__main__':
+    main()
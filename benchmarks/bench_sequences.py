@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""Sequence detection cost per event as the number of rules grows
+
+Each synthetic rule has three steps with distinct literal patterns. The
+stream is mostly noise with a few planted, interleaved sequences per
+rule; the run checks that every planted sequence is reported exactly once.
+
+Usage: python3 benchmarks/bench_sequences.py [--rules 10,100,500] [--events 50000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.events import Event
+from src.sequences import SequenceDetector, SequenceRule
+
+NOISE = [
+    "GET /index.html 200 from 10.1.{a}.{b}",
+    "cron job {a} finished in {b} ms",
+    "connection from 10.2.{a}.{b} closed",
+    "disk usage {a}% on /dev/sd{b}",
+]
+
+
+def make_rules(count):
+    return [
+        SequenceRule(f"rule{r}", [
+            {'name': f"s{s}", 'pattern': f"marker{r}x{s}\\b"} for s in range(3)
+        ], key='host', max_gap=300)
+        for r in range(count)
+    ]
+
+
+def make_stream(rules, events, planted, seed=7):
+    rng = random.Random(seed)
+    stream = [
+        rng.choice(NOISE).format(a=rng.randrange(256), b=rng.randrange(256))
+        for _ in range(events)
+    ]
+    for r in range(rules):
+        for p in range(planted):
+            host = f"192.168.{r % 256}.{p + 1}"
+            positions = sorted(rng.sample(range(events), 3))
+            for step, position in enumerate(positions):
+                stream[position] = f"marker{r}x{step} seen from {host}"
+    # Planted steps may overwrite each other, so the expected count is
+    # recomputed from the final stream by count_complete
+    return stream
+
+
+def count_complete(stream):
+    """Reference count: in-order steps per (rule, host), ignoring gaps"""
+    progress = {}
+    complete = 0
+    for content in stream:
+        if not content.startswith('marker'):
+            continue
+        tag, _, _, host = content.split()
+        rule, step = tag[len('marker'):].split('x')
+        key = (rule, host)
+        step = int(step)
+        if step == 0:
+            progress[key] = 1
+        elif progress.get(key) == step:
+            if step == 2:
+                complete += 1
+                del progress[key]
+            else:
+                progress[key] = step + 1
+    return complete
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rules', default='10,100,500')
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--planted', type=int, default=2, help="planted sequences per rule")
+    args = parser.parse_args()
+
+    print(f"{'rules':>6} {'us/event':>9} {'alerts':>7} {'expected':>9}")
+    for count in [int(n) for n in args.rules.split(',')]:
+        detector = SequenceDetector(make_rules(count))
+        stream = make_stream(count, args.events, args.planted)
+        expected = count_complete(stream)
+        now = time.time()
+        events = [Event(now + i * 0.001, 'system', content) for i, content in enumerate(stream)]
+        start = time.perf_counter()
+        alerts = 0
+        for event in events:
+            alerts += len(detector.process(event))
+        elapsed = time.perf_counter() - start
+        status = '' if alerts == expected else '  MISMATCH'
+        print(f"{count:>6} {elapsed / len(events) * 1e6:>9.1f} {alerts:>7} {expected:>9}{status}")
+
+
+if __name__ == '__main__':
+    main()
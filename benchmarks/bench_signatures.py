@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Compare the per-signature regex loop against the compiled SignatureMatcher
+
+Usage: python3 benchmarks/bench_signatures.py [--counts 10,100,1000,5000]
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml
+
+from src.signature_engine import SignatureMatcher
+
+BUILTIN_SIGNATURES = {
+    'malware': [
+        {'name': 'Generic Backdoor', 'pattern': r'(backdoor|reverse shell|reverse_shell|bind shell|bind_shell)', 'severity': 'CRITICAL'},
+        {'name': 'Command Injection', 'pattern': r';.*(\||>|<|\$\(|`)', 'severity': 'CRITICAL'},
+        {'name': 'SQL Injection', 'pattern': r'(\'|--|\#|/\*|\*/|;|union\s+select|select.*from)', 'severity': 'CRITICAL'},
+    ],
+    'privilege_escalation': [
+        {'name': 'Sudo Abuse', 'pattern': r'(sudo\s+-i|sudo\s+su|sudo.*-s\s+\/bin\/bash)', 'severity': 'HIGH'},
+        {'name': 'SUID Exploitation', 'pattern': r'(chmod.*\+s|chmod.*u\+s|chmod.*4755)', 'severity': 'HIGH'},
+    ],
+    'reconnaissance': [
+        {'name': 'Network Scanning', 'pattern': r'(nmap|port scan|nikto|dirb|gobuster)', 'severity': 'MEDIUM'},
+    ],
+}
+
+BENIGN_LINES = [
+    'Accepted publickey for deploy from 10.1.{a}.{b} port {p} ssh2',
+    'GET /api/v1/orders/{p} HTTP/1.1 200 512 "Mozilla/5.0"',
+    'Started session {p} of user www-data',
+    'worker[{p}]: processed batch {a} in {b}ms',
+    'Connection closed by 192.168.{a}.{b} port {p}',
+    'cron[{p}]: (root) CMD (run-parts /etc/cron.hourly)',
+]
+
+
+def build_signatures(count, seed=0):
+    """Return a signature dict with exactly count entries"""
+    rng = random.Random(seed)
+    signatures = {category: list(sigs) for category, sigs in BUILTIN_SIGNATURES.items()}
+    config = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'config', 'custom_signatures.yaml')
+    with open(config) as f:
+        for category, sigs in yaml.safe_load(f).items():
+            signatures.setdefault(category, []).extend(sigs)
+
+    flat = [(c, s) for c, sigs in signatures.items() for s in sigs]
+    i = 0
+    while len(flat) < count:
+        family = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(6))
+        pattern = rng.choice([
+            rf'({family}|{family}_loader|{family}\.dropper)',
+            rf'{family}[0-9]+\.example\.(com|net)/.*\.php',
+            rf'user-agent:\s*{family}/[0-9.]+',
+        ])
+        flat.append(('synthetic', {'name': f'Synthetic {i}', 'pattern': pattern, 'severity': 'MEDIUM'}))
+        i += 1
+
+    result = {}
+    for category, sig in flat[:count]:
+        result.setdefault(category, []).append(sig)
+    return result
+
+
+def build_events(n, seed=0):
+    rng = random.Random(seed)
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(repo, 'logs', 'test.log')) as f:
+        attacks = [line.strip() for line in f if line.strip()]
+    events = []
+    for _ in range(n):
+        if rng.random() < 0.05:
+            events.append(rng.choice(attacks))
+        else:
+            events.append(rng.choice(BENIGN_LINES).format(
+                a=rng.randint(0, 255), b=rng.randint(0, 255), p=rng.randint(1000, 65535)))
+    return events
+
+
+def legacy_match(signatures, content):
+    """The original SignatureDatabase.match_signatures loop"""
+    if not content:
+        return []
+    matches = []
+    for category, sigs in signatures.items():
+        for sig in sigs:
+            if re.search(sig['pattern'], content, re.IGNORECASE):
+                matches.append({
+                    'category': category,
+                    'signature': sig['name'],
+                    'severity': sig['severity'],
+                    'pattern': sig['pattern']
+                })
+    return matches
+
+
+def events_per_second(func, events, budget):
+    """Run func over events until they run out or budget seconds pass"""
+    done = 0
+    start = time.perf_counter()
+    for content in events:
+        func(content)
+        done += 1
+        if done % 16 == 0 and time.perf_counter() - start > budget:
+            break
+    return done / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--counts', default='10,100,500,1000,5000')
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--budget', type=float, default=3.0,
+                        help='max seconds spent per implementation and count')
+    args = parser.parse_args()
+
+    events = build_events(args.events)
+    print(f"{'signatures':>10} {'compile ms':>11} {'legacy ev/s':>12} {'compiled ev/s':>14} {'speedup':>8}")
+    for count in [int(c) for c in args.counts.split(',')]:
+        signatures = build_signatures(count)
+
+        start = time.perf_counter()
+        matcher = SignatureMatcher(signatures)
+        compile_ms = (time.perf_counter() - start) * 1000
+
+        for content in events[:200]:
+            assert matcher.match(content) == legacy_match(signatures, content)
+
+        legacy = events_per_second(lambda c: legacy_match(signatures, c), events, args.budget)
+        compiled = events_per_second(matcher.match, events, args.budget)
+        print(f"{count:>10} {compile_ms:>11.1f} {legacy:>12.0f} {compiled:>14.0f} {compiled / legacy:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
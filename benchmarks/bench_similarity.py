@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Accuracy and latency of the MinHash frequency analyzer vs. the exact scan
+
+Usage: python3 benchmarks/bench_similarity.py [--events 10000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.analyzer import LogAnalyzer
+from src.minhash import NearDuplicateIndex
+
+TEMPLATES = [
+    'Failed login attempt for user {u} from IP 10.0.{a}.{b} port {p} ssh2 protocol 2 preauth',
+    'Accepted publickey for {u} from 10.1.{a}.{b} port {p} ssh2 key fingerprint sha256',
+    'GET /api/v1/items/{p} HTTP/1.1 200 {a} bytes from 172.16.{a}.{b} agent curl',
+    'kernel: eth0 link up speed {p} Mbps full duplex flow control rx tx',
+]
+
+
+def build_events(n, seed=0):
+    """Templated lines with varying fields, plus bursts of exact repeats"""
+    rng = random.Random(seed)
+    events = []
+    for _ in range(n):
+        if events and rng.random() < 0.3:
+            events.append(rng.choice(events[-50:]))
+            continue
+        line = rng.choice(TEMPLATES).format(
+            u=rng.choice(['root', 'admin', 'deploy', 'guest']),
+            a=rng.randint(0, 255), b=rng.randint(0, 255), p=rng.randint(1, 65535))
+        events.append(('system', line))
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=10000)
+    parser.add_argument('--exact-sample', type=int, default=300,
+                        help='number of events checked against the exact O(history) scan')
+    args = parser.parse_args()
+
+    events = build_events(args.events)
+    analyzer = LogAnalyzer(None)
+    index = NearDuplicateIndex()
+    now = time.time()
+
+    start = time.perf_counter()
+    estimates = [index.add_and_count(source, content, now, now) for source, content in events]
+    minhash_us = (time.perf_counter() - start) / len(events) * 1e6
+
+    rng = random.Random(1)
+    sample = sorted(rng.sample(range(len(events)), min(args.exact_sample, len(events))))
+    errors = []
+    start = time.perf_counter()
+    for i in sample:
+        source, content = events[i]
+        exact = sum(
+            1 for other_source, other in events[:i + 1]
+            if other_source == source and analyzer.calculate_similarity(other, content) > 0.8
+        )
+        errors.append(abs(estimates[i] - exact) / exact)
+    exact_us = (time.perf_counter() - start) / len(sample) * 1e6
+
+    errors.sort()
+    print(f"events: {len(events)}")
+    print(f"minhash us/event:        {minhash_us:10.1f}")
+    print(f"exact scan us/event:     {exact_us:10.1f} (mean history {sum(sample) / len(sample):.0f})")
+    print(f"relative count error:    median {errors[len(errors) // 2]:.3f}, "
+          f"p95 {errors[int(len(errors) * 0.95)]:.3f}, max {errors[-1]:.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""Cold-start cost of the SIEM: import breakdown and time to first analyzed event
+
+Each measurement runs in a fresh interpreter. ``eager`` builds the AI
+engine (TensorFlow, sklearn) before the analyzer starts consuming, as
+startup used to; ``lazy`` is the current background initialization.
+
+Usage: python3 benchmarks/bench_startup.py [--top 15]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STARTUP_SCRIPT = r"""
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {repo!r})
+from src.siem_core import AdvancedSIEM
+
+siem = AdvancedSIEM()
+imported = time.perf_counter()
+if {eager!r}:
+    import sklearn.ensemble
+    from src.ai_detection import AIDetectionEngine
+    engine = AIDetectionEngine(siem.event_bus.subscribe('ai_detection'))
+    siem.ai_ready.set()
+else:
+    siem.start_ai_detection()
+siem.start_analyzer()
+siem.event_bus.publish({{
+    'timestamp': '2024-03-20T10:15:45', 'source': 'system',
+    'content': 'Failed login attempt from IP 192.168.1.100', 'severity': 'WARNING'
+}})
+while siem.event_bus.stats()['analyzer']['consumed'] < 1:
+    time.sleep(0.001)
+first_event = time.perf_counter()
+siem.ai_ready.wait()
+ready = time.perf_counter()
+print('RESULT', json.dumps({{
+    'import': imported - start,
+    'first_event': first_event - start,
+    'ai_ready': ready - start
+}}), flush=True)
+"""
+
+
+def run_startup(eager, cwd):
+    code = STARTUP_SCRIPT.format(repo=REPO, eager=eager)
+    result = subprocess.run([sys.executable, '-c', code], cwd=cwd,
+                            capture_output=True, text=True, check=True)
+    line = next(l for l in result.stdout.splitlines() if l.startswith('RESULT '))
+    return json.loads(line[len('RESULT '):])
+
+
+def import_breakdown(statement, cwd, top):
+    """Return total and the top cumulative entries from -X importtime"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import sys; sys.path.insert(0, {REPO!r}); {statement}"],
+        cwd=cwd, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line.split(':', 1)[1].split('|')
+        name = name[1:]  # nested imports are indented below this
+        rows.append((int(cumulative_us), int(self_us), name))
+    total = sum(row[0] for row in rows if not row[2].startswith(' '))
+    return total, sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cwd:
+        for label, statement in [
+            ('siem startup imports', 'import src.siem_core, src.collectors, src.analyzer, src.ai_detection'),
+            ('deferred AI imports', 'import tensorflow, sklearn.ensemble, sklearn.preprocessing'),
+        ]:
+            total, rows = import_breakdown(statement, cwd, args.top)
+            print(f"\n{label}: {total / 1e6:.2f}s")
+            print(f"  {'cumulative ms':>13} {'self ms':>8}  module")
+            for cumulative_us, self_us, name in rows:
+                print(f"  {cumulative_us / 1000:>13.1f} {self_us / 1000:>8.1f}  {name}")
+
+        print(f"\n{'mode':>6} {'import s':>9} {'first event s':>14} {'AI ready s':>11}")
+        for eager in (True, False):
+            timings = run_startup(eager, cwd)
+            print(f"{'eager' if eager else 'lazy':>6} {timings['import']:>9.2f} "
+                  f"{timings['first_event']:>14.2f} {timings['ai_ready']:>11.2f}")
+
+
+if __name__ == '__main__':
+    main()
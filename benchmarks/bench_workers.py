@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""Detection throughput with 1, 2, 4 and 8 worker processes
+
+Runs a synthetic event stream through an in-process engine and through
+WorkerPool instances, partitioned by host. Events without a host go to
+the worker of their source, so scaling is bounded by the number of
+available cores and by the share of events the busiest worker gets,
+which is reported alongside.
+
+Usage: python3 benchmarks/bench_workers.py [--kind analyzer] [--events 50000] [--workers 1,2,4,8]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.workers import WorkerPool, encode_batch, decode_batch
+
+MESSAGES = [
+    'Failed login attempt from IP {ip} for user {user}',
+    'Accepted password for {user} from {ip} port {port} ssh2',
+    'sudo: {user} : TTY=pts/0 ; PWD=/home/{user} ; COMMAND=/bin/ls',
+    'Connection timeout to {ip}:{port} after 30 seconds',
+    'GET /index.html HTTP/1.1 404 from {ip}',
+    'Permission denied for user {user} on /var/log/secure',
+    'kernel: eth0 link up, 1000 Mbps, full duplex from {ip}',
+]
+
+
+def make_events(count, seed):
+    rng = random.Random(seed)
+    start = time.time() - 60
+    return [{
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(start + i * 60 / count)),
+        'source': rng.choice(['system', 'network', 'application']),
+        'file': '/var/log/bench.log',
+        'content': rng.choice(MESSAGES).format(
+            ip=f"10.0.{rng.randint(0, 15)}.{rng.randint(1, 254)}",
+            user=f"user{rng.randint(1, 500)}",
+            port=rng.randint(1024, 65535)
+        ),
+        'severity': 'INFO'
+    } for i in range(count)]
+
+
+def in_process(kind, events, batch_size):
+    if kind == 'analyzer':
+        from src.analyzer import LogAnalyzer
+        analyzer = LogAnalyzer(None)
+        process = lambda batch: [analyzer.process_event(event) for event in batch]
+    else:
+        from src.ai_detection import AIDetectionEngine
+        engine = AIDetectionEngine(None, scoring_only=True)
+        process = engine.process_batch
+    start = time.perf_counter()
+    for i in range(0, len(events), batch_size):
+        process(events[i:i + batch_size])
+    return len(events) / (time.perf_counter() - start)
+
+
+def pooled(kind, events, batch_size, workers, partition_key):
+    alerts = []
+    pool = WorkerPool(kind, workers=workers, partition_key=partition_key,
+                      handler=alerts.extend).start()
+    try:
+        start = time.perf_counter()
+        for i in range(0, len(events), batch_size):
+            pool.submit(events[i:i + batch_size])
+        pool.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        pool.close()
+    return len(events) / elapsed, max(pool.stats['events']) / len(events)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--kind', choices=['analyzer', 'ai'], default='analyzer')
+    parser.add_argument('--events', type=int, default=50000)
+    parser.add_argument('--batch-size', type=int, default=2048)
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--partition-key', default='host')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    events = make_events(args.events, args.seed)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count()
+    print(f"{args.events} events, {args.kind} engine, {cores} cores available")
+
+    start = time.perf_counter()
+    for i in range(0, len(events), args.batch_size):
+        decode_batch(encode_batch(events[i:i + args.batch_size]))
+    codec_rate = len(events) / (time.perf_counter() - start)
+    print(f"shared memory codec (encode + decode): {codec_rate:,.0f} events/s")
+
+    baseline = in_process(args.kind, events, args.batch_size)
+    print(f"\n{'workers':>8} {'events/s':>12} {'speedup':>8} {'busiest':>8}")
+    print(f"{'thread':>8} {baseline:>12,.0f} {1.0:>7.2f}x")
+    for workers in [int(n) for n in args.workers.split(',')]:
+        rate, busiest = pooled(args.kind, events, args.batch_size, workers, args.partition_key)
+        print(f"{workers:>8} {rate:>12,.0f} {rate / baseline:>7.2f}x {busiest:>8.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,28 @@
 import numpy as np
-from sklearn.ensemble import IsolationForest
-from sklearn.preprocessing import StandardScaler
-import tensorflow as tf
 import json
 import logging
-from datetime import datetime, timedelta
+import os
+from datetime import datetime
 import threading
-from collections import deque
 import time
-import re
 import yaml
 from queue import Empty
+from .signature_engine import SignatureMatcher
+from .inference import DenseNetwork
+from .features import BatchFeatureExtractor, feature_text
+from .events import as_event, json_default
+from .history import EventHistoryStore
+from .metrics import REGISTRY, LAG_BUCKETS, SIZE_BUCKETS
+
+def _pack_array(array):
+    """(dtype, shape, bytes) of a NumPy array, for checkpoints"""
+    return str(array.dtype), tuple(array.shape), np.ascontiguousarray(array).tobytes()
+
+
+def _unpack_array(state):
+    dtype, shape, data = state
+    return np.frombuffer(data, dtype=dtype).reshape(shape).copy()
+
 
 class SignatureDatabase:
     def __init__(self):
@@ -69,6 +81,14 @@ class SignatureDatabase:
                 }
             ]
         }
+        self.compile()
+
+    def compile(self):
+        """Compile all signatures into a single prefiltered matcher
+
+        Must be called again after editing ``self.signatures`` directly.
+        """
+        self.matcher = SignatureMatcher(self.signatures)
         
     def load_custom_signatures(self, filepath):
         """Load custom signatures from YAML file"""
@@ -81,48 +101,102 @@ class SignatureDatabase:
                     self.signatures[category].extend(sigs)
         except Exception as e:
             logging.error(f"Error loading custom signatures: {e}")
+        finally:
+            self.compile()
+
+    def merge_signatures(self, signatures):
+        """Add signatures not loaded yet (by category and name); returns how many"""
+        added = 0
+        for category, sigs in signatures.items():
+            existing = self.signatures.setdefault(category, [])
+            names = {sig.get('name') for sig in existing}
+            for sig in sigs:
+                if sig.get('name') not in names:
+                    existing.append(dict(sig))
+                    added += 1
+        if added:
+            self.compile()
+        return added
 
     def match_signatures(self, content):
         """Match content against all signatures"""
-        if not content:
-            return []
-            
-        matches = []
-        for category, signatures in self.signatures.items():
-            for sig in signatures:
-                if re.search(sig['pattern'], content, re.IGNORECASE):
-                    match = {
-                        'category': category,
-                        'signature': sig['name'],
-                        'severity': sig['severity'],
-                        'pattern': sig['pattern']
-                    }
-                    matches.append(match)
-        return matches
+        return self.matcher.match(content)
 
 class AIDetectionEngine:
-    def __init__(self, event_queue):
+    # Timed stages of detect_anomalies and run, in order
+    STAGES = ('signatures', 'features', 'scaler', 'isolation_forest', 'neural_network', 'handle')
+
+    def __init__(self, event_queue, scoring_only=False, progress=None, history=None, alert_sink=None,
+                 metrics=None):
         self.logger = logging.getLogger(__name__)
         self.event_queue = event_queue
-        self.event_history = deque(maxlen=10000)  # Store last 10000 events
-        self.anomaly_detector = IsolationForest(contamination=0.1, random_state=42)
-        self.scaler = StandardScaler()
+        self.metrics = metrics if metrics is not None else REGISTRY
+        # AlertPipeline to hand anomalies to; without one they are logged
+        self.alert_sink = alert_sink
+        # Optional callback(description, percent) reporting initialization steps
+        self.progress = progress or (lambda description, percent: None)
+        # Scoring-only engines never import TensorFlow; they score with
+        # weights exported by a training engine
+        self.scoring_only = scoring_only
+        self.inference_config = {
+            'backend': 'numpy',  # or 'keras' to score with model.predict
+            'weights_path': os.path.join('state', 'model_weights.npz'),
+            'reload_interval': 300  # seconds between weight reloads when scoring only
+        }
+        self.model = None
+        self.scorer = None
+        self.weights_mtime = None
+        # Shared time-indexed history; without one the engine keeps its own
+        self.owns_history = history is None
+        self.event_history = history if history is not None else EventHistoryStore()
+        self.model_config = {
+            'fit_window': 5000,  # most recent events used to fit the models
+            'train_window': 900,  # seconds of history the neural network trains on
+            'train_max_events': 10000,  # most recent events kept from that window
+            'min_samples': 100,  # no ML scoring until this many events were seen
+            'refit_interval': 300,  # seconds between background refits
+            'retry_interval': 10,  # seconds between attempts before the first fit
+            'contamination': 0.01
+        }
+        # Scaler and IsolationForest fitted in the background; replaced as a
+        # whole so the hot path always sees a consistent pair
+        self.fitted_models = None
+        self.batch_config = {
+            'max_size': 512,  # events per detection batch
+            'max_wait': 0.02,  # seconds to keep filling a batch after its first event
+            'idle_timeout': 1.0  # seconds to block waiting for a first event
+        }
+        self.metrics_interval = 60  # seconds between metrics log lines
+        self.setup_metrics()
         self.feature_extractors = {
             'system': self.extract_system_features,
             'network': self.extract_network_features,
             'application': self.extract_application_features
         }
+        self.batch_extractor = BatchFeatureExtractor(self.feature_extractors)
+        self.progress("Compiling signatures", 5)
         self.signature_db = SignatureDatabase()
-        self.setup_neural_network()
+        if scoring_only:
+            self.progress("Loading exported model weights", 30)
+            self.load_exported_model()
+        else:
+            self.setup_neural_network()
         
         # Try to load custom signatures if available
+        self.progress("Loading custom signatures", 90)
         try:
             self.signature_db.load_custom_signatures('config/custom_signatures.yaml')
         except Exception as e:
             self.logger.warning(f"Could not load custom signatures: {e}")
+        self.progress("AI engine ready", 100)
         
     def setup_neural_network(self):
         """Initialize deep learning model for pattern recognition"""
+        # Imported here so startup and scoring-only engines don't pay for it
+        self.progress("Loading TensorFlow", 10)
+        import tensorflow as tf
+
+        self.progress("Building neural network", 70)
         inputs = tf.keras.Input(shape=(20,))
         x = tf.keras.layers.Dense(64, activation='relu')(inputs)
         x = tf.keras.layers.Dropout(0.2)(x)
@@ -133,6 +207,53 @@ class AIDetectionEngine:
         
         self.model = tf.keras.Model(inputs=inputs, outputs=outputs)
         self.model.compile(optimizer='adam', loss='binary_crossentropy', metrics=['accuracy'])
+        self.scorer = DenseNetwork.from_keras(self.model)
+
+    def export_model(self, scaler):
+        """Swap in a NumPy scorer for the current Keras weights and save them
+
+        ``scaler`` is the one the network was trained behind; the scorer
+        keeps it, so it scores raw features even after a refit swaps the
+        anomaly models' scaler, and scoring-only workers load both.
+        """
+        self.scorer = DenseNetwork.from_keras(self.model, scaler)
+        try:
+            self.scorer.save(self.inference_config['weights_path'])
+        except Exception as e:
+            self.logger.error(f"Error exporting model weights: {str(e)}")
+
+    def load_exported_model(self):
+        """Load exported weights into the NumPy scorer, if a file exists"""
+        path = self.inference_config['weights_path']
+        if not os.path.exists(path):
+            self.logger.warning(f"No exported model weights at {path}; neural scoring disabled")
+            return False
+        try:
+            scorer = DenseNetwork.load(path)
+            self.weights_mtime = os.path.getmtime(path)
+        except Exception as e:
+            self.logger.error(f"Error loading model weights from {path}: {str(e)}")
+            return False
+        if not scorer.standardizes:
+            self.scorer = None
+            self.logger.warning(f"Model weights at {path} were exported without their scaler; "
+                                f"neural scoring disabled")
+            return False
+        self.scorer = scorer
+        self.logger.info(f"Loaded exported model weights from {path}")
+        return True
+
+    def predict_scores(self, features, scaled_features):
+        """Neural network scores with dropout disabled, shape (n, 1)
+
+        A trained, exported network standardizes the raw features itself;
+        before the first training it scores the anomaly models' scaling.
+        """
+        if self.inference_config['backend'] == 'keras' and self.model is not None:
+            return self.model.predict(scaled_features, verbose=0)
+        if self.scorer is not None:
+            return self.scorer.predict(features if self.scorer.standardizes else scaled_features)
+        return np.zeros((len(scaled_features), 1), dtype=np.float32)
         
     def extract_features(self, event):
         """Extract features based on event type"""
@@ -141,11 +262,15 @@ class AIDetectionEngine:
             
         extractor = self.feature_extractors.get(event['source'], self.extract_generic_features)
         return extractor(event)
+
+    def extract_features_batch(self, events):
+        """Extract an (N, 20) float32 feature matrix for a list of events"""
+        return self.batch_extractor.extract(events)
         
     def extract_system_features(self, event):
         """Extract features from system events"""
         features = np.zeros(20)
-        content = event.get('content', '').lower()
+        content = feature_text(event)
         
         # Feature engineering for system events
         features[0] = 1 if 'error' in content else 0
@@ -162,7 +287,7 @@ class AIDetectionEngine:
     def extract_network_features(self, event):
         """Extract features from network events"""
         features = np.zeros(20)
-        content = event.get('content', '').lower()
+        content = feature_text(event)
         
         # Feature engineering for network events
         features[0] = 1 if '404' in content else 0
@@ -178,7 +303,7 @@ class AIDetectionEngine:
     def extract_application_features(self, event):
         """Extract features from application events"""
         features = np.zeros(20)
-        content = event.get('content', '').lower()
+        content = feature_text(event)
         
         # Feature engineering for application events
         features[0] = 1 if 'exception' in content else 0
@@ -194,7 +319,7 @@ class AIDetectionEngine:
     def extract_generic_features(self, event):
         """Extract generic features for unknown event types"""
         features = np.zeros(20)
-        content = event.get('content', '').lower()
+        content = feature_text(event)
         
         # Generic feature extraction
         features[0] = len(content)
@@ -204,12 +329,183 @@ class AIDetectionEngine:
         
         return features
         
+    def fit_models(self):
+        """Fit scaler and IsolationForest on recent history and swap them in"""
+        from sklearn.preprocessing import StandardScaler
+
+        recent = self.event_history.latest(self.model_config['fit_window'])
+        if len(recent) < self.model_config['min_samples']:
+            return False
+
+        features = self.extract_features_batch([event for event in recent if event])
+        self.fitted_models = self.build_models(StandardScaler().fit(features), features)
+        self.logger.info(f"Anomaly models refitted on {len(features)} events")
+        return True
+
+    def build_models(self, scaler, features, fitted_at=None):
+        """Fit the IsolationForest on scaled features and bundle it with the scaler
+
+        The features are kept so a checkpoint can refit the same forest
+        (the fit is seeded).
+        """
+        from sklearn.ensemble import IsolationForest
+
+        forest = IsolationForest(
+            contamination=self.model_config['contamination'],
+            random_state=42
+        ).fit(scaler.transform(features))
+        return {
+            'scaler': scaler,
+            'forest': forest,
+            # score_samples below offset_ is what IsolationForest.predict calls -1
+            'threshold': forest.offset_,
+            'samples': len(features),
+            'features': features,
+            'fitted_at': fitted_at or datetime.now().isoformat()
+        }
+
+    def snapshot(self):
+        """Signatures, anomaly model and network state for a checkpoint"""
+        state = {
+            'signatures': {
+                category: [dict(sig) for sig in sigs] for category, sigs in self.signature_db.signatures.items()
+            },
+            'models': None,
+            'network': None
+        }
+        models = self.fitted_models
+        if models is not None:
+            scaler = models['scaler']
+            state['models'] = {
+                'mean': _pack_array(scaler.mean_),
+                'scale': _pack_array(scaler.scale_),
+                'var': _pack_array(scaler.var_),
+                'samples_seen': int(scaler.n_samples_seen_),
+                'features': _pack_array(models['features']),
+                'fitted_at': models['fitted_at']
+            }
+        if self.scorer is not None and not self.scoring_only:
+            state['network'] = [
+                (_pack_array(kernel), _pack_array(bias), activation) for kernel, bias, activation in self.scorer.layers
+            ]
+            if self.scorer.standardizes:
+                state['network_scaler'] = (_pack_array(self.scorer.input_mean), _pack_array(self.scorer.input_scale))
+        return state
+
+    def restore(self, state):
+        """Reload a snapshot; the forest is refitted on the checkpointed features"""
+        added = self.signature_db.merge_signatures(state.get('signatures') or {})
+        if added:
+            self.logger.info(f"Restored {added} signatures from checkpoint")
+        if state.get('models'):
+            try:
+                self.restore_models(state['models'])
+            except Exception as e:
+                self.logger.warning(f"Could not restore anomaly models: {str(e)}")
+        # Scoring-only engines load the exported weights instead
+        if state.get('network') and not self.scoring_only:
+            try:
+                layers = [(_unpack_array(kernel), _unpack_array(bias), activation)
+                          for kernel, bias, activation in state['network']]
+                if self.model is not None:
+                    self.model.set_weights([weights for kernel, bias, _ in layers for weights in (kernel, bias)])
+                scaler = state.get('network_scaler')
+                if scaler:
+                    self.scorer = DenseNetwork(layers, _unpack_array(scaler[0]), _unpack_array(scaler[1]))
+                else:
+                    self.scorer = DenseNetwork(layers)
+            except Exception as e:
+                self.logger.warning(f"Could not restore network weights: {str(e)}")
+
+    def restore_models(self, state):
+        from sklearn.preprocessing import StandardScaler
+
+        features = _unpack_array(state['features'])
+        scaler = StandardScaler()
+        scaler.mean_ = _unpack_array(state['mean'])
+        scaler.scale_ = _unpack_array(state['scale'])
+        scaler.var_ = _unpack_array(state['var'])
+        scaler.n_samples_seen_ = state['samples_seen']
+        scaler.n_features_in_ = features.shape[1]
+        self.fitted_models = self.build_models(scaler, features, fitted_at=state['fitted_at'])
+        self.logger.info(f"Restored anomaly models fitted at {state['fitted_at']} on {len(features)} events")
+
+    def periodic_model_fit(self):
+        """Refit the anomaly models in the background"""
+        while True:
+            try:
+                fitted = self.fit_models()
+            except Exception as e:
+                self.logger.error(f"Error fitting anomaly models: {str(e)}")
+                fitted = False
+            if fitted or self.fitted_models is not None:
+                time.sleep(self.model_config['refit_interval'])
+            else:
+                time.sleep(self.model_config['retry_interval'])
+
+    def setup_metrics(self):
+        """Look up batching, lag and per-stage timing metrics once"""
+        metrics = self.metrics
+        self.stage_timers = {
+            stage: metrics.histogram('siem_stage_seconds', engine='ai', stage=stage)
+            for stage in self.STAGES
+        }
+        self.batch_sizes = metrics.histogram('siem_batch_size', buckets=SIZE_BUCKETS, engine='ai')
+        self.events_processed = metrics.counter('siem_events_processed_total', engine='ai')
+        self.anomalies_raised = metrics.counter('siem_alerts_total', engine='ai')
+        self.event_lag = metrics.histogram('siem_event_lag_seconds', buckets=LAG_BUCKETS, engine='ai')
+        self.signature_counters = {}
+        self.max_batch_size = 0
+        self.lag_sample_every = 8  # event lag is observed for one event in N
+
+    def signature_counter(self, name):
+        counter = self.signature_counters.get(name)
+        if counter is None:
+            counter = self.signature_counters[name] = self.metrics.counter(
+                'siem_signature_matches_total', signature=name)
+        return counter
+
+    def get_metrics(self):
+        """Snapshot of batch size, queue depth and time spent per stage"""
+        batches = self.batch_sizes.count
+        return {
+            'batches': batches,
+            'events': int(self.batch_sizes.sum),
+            'max_batch_size': self.max_batch_size,
+            'mean_batch_size': self.batch_sizes.sum / batches if batches else 0,
+            'queue_depth': self.event_queue.qsize() if self.event_queue is not None else 0,
+            'stage_seconds': {
+                stage: timer.sum for stage, timer in self.stage_timers.items() if timer.count
+            }
+        }
+
+    def next_batch(self):
+        """Collect an adaptively sized batch of events from the queue"""
+        config = self.batch_config
+        if hasattr(self.event_queue, 'get_batch'):
+            return self.event_queue.get_batch(
+                config['max_size'], config['max_wait'], timeout=config['idle_timeout'])
+
+        # Plain queue.Queue: same policy built from get()
+        batch = [self.event_queue.get(timeout=config['idle_timeout'])]
+        deadline = time.monotonic() + config['max_wait']
+        while len(batch) < config['max_size']:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.event_queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
     def detect_anomalies(self, events_batch):
         """Detect anomalies in a batch of events"""
         if not events_batch:
             return []
             
         anomalies = []
+        stage_start = time.perf_counter()
         
         # Signature-based detection
         for event in events_batch:
@@ -221,90 +517,132 @@ class AIDetectionEngine:
             
             if signature_matches:
                 for match in signature_matches:
+                    self.signature_counter(match['signature']).inc()
                     anomaly = {
                         'event': event,
                         'detection_type': 'signature',
                         'signature_match': match,
-                        'timestamp': datetime.now().isoformat(),
+                        'timestamp': event['timestamp'],
                         'severity': match['severity']
                     }
                     anomalies.append(anomaly)
+        stage_start = self._record_stage('signatures', stage_start)
             
-        # Extract features for ML-based detection
-        features = np.array([self.extract_features(event) for event in events_batch if event])
+        # ML-based detection only scores against the frozen, pre-fitted models
+        models = self.fitted_models
+        events = [event for event in events_batch if event]
         
-        if len(features) > 0:
+        if models is not None and events:
+            features = self.extract_features_batch(events)
+            stage_start = self._record_stage('features', stage_start)
+
             # Scale features
-            scaled_features = self.scaler.fit_transform(features)
+            scaled_features = models['scaler'].transform(features)
+            stage_start = self._record_stage('scaler', stage_start)
             
             # Detect anomalies using Isolation Forest
-            anomaly_scores = self.anomaly_detector.fit_predict(scaled_features)
+            isolation_scores = models['forest'].score_samples(scaled_features)
+            stage_start = self._record_stage('isolation_forest', stage_start)
             
             # Deep learning prediction
-            dl_predictions = self.model.predict(scaled_features, verbose=0)
+            dl_predictions = self.predict_scores(features, scaled_features)
+            stage_start = self._record_stage('neural_network', stage_start)
             
             # Combine ML predictions
-            for i, (event, score, dl_pred) in enumerate(zip(events_batch, anomaly_scores, dl_predictions)):
-                if event and (score == -1 or dl_pred > 0.8):  # Anomaly detected by either method
+            for event, score, dl_pred in zip(events, isolation_scores, dl_predictions):
+                if score < models['threshold'] or dl_pred > 0.8:  # Anomaly detected by either method
                     anomaly = {
                         'event': event,
                         'detection_type': 'ml',
                         'anomaly_score': float(dl_pred[0]),
-                        'timestamp': datetime.now().isoformat(),
+                        'isolation_score': float(score),
+                        'timestamp': event['timestamp'],
                         'severity': 'HIGH' if dl_pred > 0.9 else 'MEDIUM'
                     }
                     anomalies.append(anomaly)
                 
         return anomalies
+
+    def _record_stage(self, stage, started):
+        now = time.perf_counter()
+        self.stage_timers[stage].observe(now - started)
+        return now
         
     def analyze_patterns(self):
         """Analyze patterns in event history"""
-        if len(self.event_history) < 100:
+        models = self.fitted_models
+        if models is None or self.model is None:
+            return
+        events = self.event_history.window(self.model_config['train_window'])
+        events = events[-self.model_config['train_max_events']:]
+        if len(events) < 100:
             return
             
         # Convert events to feature matrix
-        features = np.array([self.extract_features(event) for event in self.event_history if event])
+        features = self.extract_features_batch(events)
         
         if len(features) > 0:
-            scaled_features = self.scaler.fit_transform(features)
+            scaled_features = models['scaler'].transform(features)
             
             # Train model on historical data
             labels = np.zeros(len(features))  # Assuming all historical events are normal
             self.model.fit(scaled_features, labels, epochs=5, verbose=0)
+            self.export_model(models['scaler'])
         
-    def run(self):
-        """Main execution loop"""
-        self.logger.info("Starting AI Detection Engine")
-        
+    def start_background_threads(self):
+        """Start the pattern analysis and model fitting threads"""
         # Start pattern analysis in a separate thread
         pattern_thread = threading.Thread(target=self.periodic_pattern_analysis)
         pattern_thread.daemon = True
         pattern_thread.start()
+
+        # Fit anomaly models off the detection path
+        model_thread = threading.Thread(target=self.periodic_model_fit)
+        model_thread.daemon = True
+        model_thread.start()
+
+    def process_batch(self, events_batch):
+        """Score a batch, update metrics and history; returns the anomalies"""
+        events_batch = [as_event(event) for event in events_batch]
+        self.batch_sizes.observe(len(events_batch))
+        self.max_batch_size = max(self.max_batch_size, len(events_batch))
+        anomalies = self.detect_anomalies(events_batch)
+        # A shared history was already filled by the event bus
+        if self.owns_history:
+            self.event_history.extend(events_batch)
+        self.events_processed.inc(len(events_batch))
+        self.anomalies_raised.inc(len(anomalies))
+        now = time.time()
+        lag = self.event_lag
+        for event in events_batch[::self.lag_sample_every]:
+            lag.observe(now - event.ts)
+        return anomalies
+
+    def run(self):
+        """Main execution loop"""
+        self.logger.info("Starting AI Detection Engine")
+        self.start_background_threads()
         
         try:
+            last_report = time.time()
             while True:
                 try:
-                    # Process events in batches
-                    events_batch = []
-                    
-                    # Try to collect up to 10 events
-                    for _ in range(10):
-                        try:
-                            event = self.event_queue.get_nowait()
-                            if event:
-                                events_batch.append(event)
-                        except Empty:
-                            break
-                    
+                    if time.time() - last_report >= self.metrics_interval:
+                        self.log_metrics()
+                        last_report = time.time()
+
+                    # Block for the first event, then fill the batch adaptively
+                    try:
+                        events_batch = [e for e in self.next_batch() if e]
+                    except Empty:
+                        continue
+
                     if events_batch:
-                        anomalies = self.detect_anomalies(events_batch)
+                        anomalies = self.process_batch(events_batch)
                         if anomalies:
+                            started = time.perf_counter()
                             self.handle_anomalies(anomalies)
-                            
-                        # Store valid events in history
-                        self.event_history.extend([e for e in events_batch if e])
-                    
-                    time.sleep(0.1)  # Prevent tight loop
+                            self._record_stage('handle', started)
                     
                 except Exception as e:
                     self.logger.error(f"Error in AI Detection Engine: {str(e)}")
@@ -315,14 +653,44 @@ class AIDetectionEngine:
         except Exception as e:
             self.logger.error(f"Critical error in AI Detection Engine: {str(e)}")
             
+    def log_metrics(self):
+        """Log a one-line summary of batching and stage timings"""
+        metrics = self.get_metrics()
+        stages = ', '.join(f"{name}={seconds:.3f}s" for name, seconds in metrics['stage_seconds'].items())
+        self.logger.info(
+            f"AI engine: {metrics['events']} events in {metrics['batches']} batches "
+            f"(mean {metrics['mean_batch_size']:.1f}, max {metrics['max_batch_size']}), "
+            f"queue depth {metrics['queue_depth']}; {stages}"
+        )
+            
     def periodic_pattern_analysis(self):
         """Periodically analyze patterns"""
         while True:
+            if self.scoring_only:
+                self.reload_exported_model()
+                time.sleep(self.inference_config['reload_interval'])
+                continue
             self.analyze_patterns()
-            time.sleep(300)  # Analyze every 5 minutes
+            if self.scorer is not None and self.scorer.standardizes:
+                time.sleep(300)  # Analyze every 5 minutes
+            else:
+                # Not trained yet: retry until enough history has arrived
+                time.sleep(self.model_config['retry_interval'])
+
+    def reload_exported_model(self):
+        """Pick up weights exported since the last load"""
+        path = self.inference_config['weights_path']
+        try:
+            if os.path.getmtime(path) != self.weights_mtime:
+                self.load_exported_model()
+        except OSError:
+            pass
             
     def handle_anomalies(self, anomalies):
         """Handle detected anomalies"""
+        if self.alert_sink is not None:
+            self.alert_sink.submit_many(anomalies)
+            return
         for anomaly in anomalies:
-            self.logger.warning(f"Anomaly detected: {json.dumps(anomaly, indent=2)}")
+            self.logger.warning(f"Anomaly detected: {json.dumps(anomaly, indent=2, default=json_default)}")
             # Here you would implement alert generation, notification, etc. 
\ No newline at end of file
@@ -0,0 +1,273 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.request
+from abc import ABC, abstractmethod
+from queue import Empty, Full, Queue
+
+from .events import json_default
+
+SINK_TYPES = ('file', 'stdout', 'http', 'archive')
+
+
+class AlertSink(ABC):
+    """Destination for batches of NDJSON alert lines"""
+
+    name = 'sink'
+
+    @abstractmethod
+    def write(self, lines):
+        """Deliver a list of newline-terminated alert lines"""
+
+    def close(self):
+        pass
+
+
+class FileSink(AlertSink):
+    """Appends to a file, rotating it to ``path.1`` .. ``path.N`` at ``max_bytes``"""
+
+    name = 'file'
+
+    def __init__(self, path=os.path.join('state', 'alerts.ndjson'), max_bytes=50 * 1024 * 1024, backups=5):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, 'a', encoding='utf-8')
+        self.size = self.file.tell()
+
+    def write(self, lines):
+        data = ''.join(lines)
+        self.file.write(data)
+        self.file.flush()
+        # Bytes on disk, not characters: max_bytes is a byte limit
+        self.size = self.file.tell()
+        if self.size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{i}"):
+                os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        self.file = open(self.path, 'w', encoding='utf-8')
+        self.size = 0
+
+    def close(self):
+        self.file.close()
+
+
+class StdoutSink(AlertSink):
+    """Writes alert lines to a stream (stdout by default)"""
+
+    name = 'stdout'
+
+    def __init__(self, stream=None):
+        self.stream = stream
+
+    def write(self, lines):
+        stream = self.stream or sys.stdout
+        stream.write(''.join(lines))
+        stream.flush()
+
+
+class HttpSink(AlertSink):
+    """POSTs batches to an Elasticsearch-compatible ``_bulk`` endpoint"""
+
+    name = 'http'
+
+    def __init__(self, url='http://localhost:9200/_bulk', index='siem-alerts', timeout=5):
+        self.url = url
+        self.action = json.dumps({'index': {'_index': index}}) + '\n'
+        self.timeout = timeout
+
+    def write(self, lines):
+        body = ''.join(self.action + line for line in lines).encode('utf-8')
+        request = urllib.request.Request(
+            self.url, data=body, method='POST',
+            headers={'Content-Type': 'application/x-ndjson'}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            result = json.loads(response.read() or b'{}')
+        if result.get('errors'):
+            raise RuntimeError(f"bulk request to {self.url} reported item errors")
+
+
+class AlertPipeline:
+    """Asynchronous alert output
+
+    Detection threads hand alerts to ``submit``, which only enqueues them
+    on a bounded queue; a writer thread drains the queue in batches of up
+    to ``batch_size`` (waiting at most ``flush_interval`` seconds to fill
+    one), serializes each alert to one compact JSON line and writes the
+    batch to every sink. When the queue is full the alert is dropped and
+    counted instead of stalling detection, unless ``block`` is set (for
+    offline replay, where every alert must be written). Each sink has its own flush
+    latency and drop counters; a batch a sink fails to write is counted
+    as dropped for that sink only. With a ``suppressor``
+    (AlertSuppressor) repeated alerts are folded before they are queued
+    and the writer releases their summaries as they expire.
+    """
+
+    def __init__(self, sinks, capacity=10000, batch_size=500, flush_interval=1.0, suppressor=None,
+                 block=False):
+        self.logger = logging.getLogger(__name__)
+        self.sinks = list(sinks)
+        self.suppressor = suppressor
+        self.block = block
+        self.queue = Queue(maxsize=capacity)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submitted = 0
+        self.dropped = 0
+        self.sink_names = []
+        for sink in self.sinks:
+            name = sink.name
+            while name in self.sink_names:
+                name = f"{sink.name}{len(self.sink_names)}"
+            self.sink_names.append(name)
+        self.sink_stats = {
+            name: {'written': 0, 'dropped': 0, 'flushes': 0, 'errors': 0,
+                   'last_latency': 0.0, 'max_latency': 0.0, 'total_latency': 0.0}
+            for name in self.sink_names
+        }
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='alert-writer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    @classmethod
+    def from_names(cls, names, path=None, url=None, archive_dir=None, **kwargs):
+        """Build a pipeline from sink names such as ``['file', 'http']``"""
+        sinks = []
+        for name in names:
+            if name == 'file':
+                sinks.append(FileSink(path) if path else FileSink())
+            elif name == 'stdout':
+                sinks.append(StdoutSink())
+            elif name == 'http':
+                sinks.append(HttpSink(url) if url else HttpSink())
+            elif name == 'archive':
+                from .archive import ArchiveSink
+                sinks.append(ArchiveSink(archive_dir) if archive_dir else ArchiveSink())
+            else:
+                raise ValueError(f"Unknown alert sink: {name}")
+        return cls(sinks, **kwargs)
+
+    def submit(self, alert):
+        """Queue one alert; returns False if it was dropped or suppressed"""
+        if self.suppressor is None:
+            return self._enqueue(alert)
+        accepted = False
+        for item in self.suppressor.filter([alert]):
+            queued = self._enqueue(item)
+            if item is alert:
+                accepted = queued
+        return accepted
+
+    def submit_many(self, alerts):
+        if self.suppressor is not None:
+            alerts = self.suppressor.filter(alerts)
+        self._enqueue_all(alerts)
+
+    def _enqueue_all(self, alerts):
+        for alert in alerts:
+            self._enqueue(alert)
+
+    def _enqueue(self, alert):
+        try:
+            self.queue.put(alert, block=self.block)
+        except Full:
+            self.dropped += 1
+            return False
+        self.submitted += 1
+        return True
+
+    def next_batch(self):
+        """Block for the first alert, then gather more until full or flush_interval passes"""
+        try:
+            # Short waits so close() is noticed promptly
+            batch = [self.queue.get(timeout=min(self.flush_interval, 0.1))]
+        except Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except Empty:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop.is_set():
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=min(remaining, 0.05)))
+                except Empty:
+                    continue
+        return batch
+
+    def write_batch(self, batch):
+        lines = []
+        for alert in batch:
+            try:
+                lines.append(json.dumps(alert, default=json_default, separators=(',', ':')) + '\n')
+            except Exception as e:
+                self.logger.error(f"Could not serialize alert: {str(e)}")
+        if not lines:
+            return
+        for name, sink in zip(self.sink_names, self.sinks):
+            stats = self.sink_stats[name]
+            start = time.perf_counter()
+            try:
+                sink.write(lines)
+                stats['written'] += len(lines)
+            except Exception as e:
+                stats['dropped'] += len(lines)
+                stats['errors'] += 1
+                self.logger.error(f"Alert sink {name} failed: {str(e)}")
+            latency = time.perf_counter() - start
+            stats['flushes'] += 1
+            stats['last_latency'] = latency
+            stats['max_latency'] = max(stats['max_latency'], latency)
+            stats['total_latency'] += latency
+
+    def run(self):
+        """Writer loop: drain the queue until closed, then flush what is left"""
+        while not self._stop.is_set() or not self.queue.empty():
+            batch = self.next_batch()
+            if self.suppressor is not None:
+                batch.extend(self.suppressor.expire())
+            if batch:
+                self.write_batch(batch)
+        if self.suppressor is not None:
+            summaries = self.suppressor.flush()
+            if summaries:
+                self.write_batch(summaries)
+
+    def close(self, timeout=10):
+        """Flush queued alerts and close every sink"""
+        self._stop.set()
+        self.thread.join(timeout=timeout)
+        for sink in self.sinks:
+            try:
+                sink.close()
+            except Exception as e:
+                self.logger.error(f"Error closing alert sink {sink.name}: {str(e)}")
+
+    def stats(self):
+        sinks = {}
+        for name, stats in self.sink_stats.items():
+            flushes = stats['flushes']
+            sinks[name] = dict(stats, avg_latency=stats['total_latency'] / flushes if flushes else 0.0)
+        return {
+            'submitted': self.submitted,
+            'dropped': self.dropped,
+            'queued': self.queue.qsize(),
+            'suppression': self.suppressor.stats() if self.suppressor is not None else None,
+            'sinks': sinks
+        }
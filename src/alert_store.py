@@ -0,0 +1,151 @@
+from collections import defaultdict, deque
+
+
+class AlertStore:
+    """Alerts indexed by (alert type, entity) with time-based expiry
+
+    An alert can concern several entities (its own, plus the host and user
+    of the event behind it) and is indexed under each. Every alert is kept
+    in per-key deques and once in an arrival-ordered deque that drives
+    expiry, so dropping old alerts costs O(expired) and lookups for a
+    type/entity never touch other keys. At most ``max_alerts`` are
+    retained; beyond that the oldest are dropped first. Each alert gets an
+    increasing sequence number, so a reader can tell alerts that arrived
+    after a given point from those it has already acted on.
+    """
+
+    def __init__(self, retention=3600, max_alerts=100000):
+        self.retention = retention
+        self.max_alerts = max_alerts
+        self.index = defaultdict(deque)  # (type, entity) -> deque of (ts, sequence, alert)
+        self.arrivals = deque()  # (ts, keys) in insertion order
+        self.sequence = 0  # of the last alert added
+        self.expired = 0
+
+    def add(self, alert, entities, ts):
+        """Index an alert under each of its entities; returns its sequence number"""
+        keys = [(alert['type'], entity) for entity in entities]
+        self.sequence += 1
+        for key in keys:
+            self.index[key].append((ts, self.sequence, alert))
+        self.arrivals.append((ts, keys))
+        self.expire(ts)
+        return self.sequence
+
+    def expire(self, now):
+        """Drop alerts older than ``now - retention`` and any over the size cap"""
+        cutoff = now - self.retention
+        arrivals = self.arrivals
+        while arrivals and (arrivals[0][0] < cutoff or len(arrivals) > self.max_alerts):
+            _, keys = arrivals.popleft()
+            for key in keys:
+                alerts = self.index[key]
+                alerts.popleft()
+                if not alerts:
+                    del self.index[key]
+            self.expired += 1
+
+    def last_seen(self, alert_type, entity):
+        """(ts, sequence) of the latest retained alert of a type for an entity, or None"""
+        alerts = self.index.get((alert_type, entity))
+        if not alerts:
+            return None
+        ts, sequence, _ = alerts[-1]
+        return ts, sequence
+
+    def snapshot(self):
+        """Alerts as (ts, entities, sequence, alert) in arrival order"""
+        alerts = {key: iter(items) for key, items in self.index.items()}
+        entries = []
+        for ts, keys in self.arrivals:
+            for key in keys:
+                _, sequence, alert = next(alerts[key])
+            entries.append((ts, [entity for _, entity in keys], sequence, alert))
+        return {'alerts': entries, 'sequence': self.sequence, 'expired': self.expired}
+
+    def restore(self, state):
+        self.index.clear()
+        self.arrivals.clear()
+        for ts, entities, sequence, alert in state['alerts']:
+            keys = [(alert['type'], entity) for entity in entities]
+            for key in keys:
+                self.index[key].append((ts, sequence, alert))
+            self.arrivals.append((ts, keys))
+        self.sequence = state['sequence']
+        self.expired = state['expired']
+
+    def __len__(self):
+        return len(self.arrivals)
+
+
+class CorrelationTracker:
+    """Incremental evaluation of correlation rules against an AlertStore
+
+    An incoming alert, already added to ``store``, only checks the rules
+    that mention its type: a rule fires for one of the alert's entities
+    when the store holds an alert of each of the rule's types for that
+    entity within ``timeframe`` seconds, all newer than the rule's last
+    firing for the entity, so the next match needs a fresh set of alerts.
+    Rules join alerts keyed differently (a brute force by IP, a privilege
+    escalation by user) through the host and user both carry. Work per
+    alert depends on the number of rules using its type, not on history
+    size.
+    """
+
+    def __init__(self, rules, store, sweep_interval=60):
+        self.rules = rules
+        self.store = store
+        self.rules_by_type = defaultdict(list)
+        for rule in rules:
+            for alert_type in set(rule['events']):
+                self.rules_by_type[alert_type].append(rule)
+        self.max_timeframe = max((rule['timeframe'] for rule in rules), default=0)
+        self.fired = {}  # (rule name, entity) -> (ts, store sequence) of the last firing
+        self.sweep_interval = sweep_interval
+        self.last_sweep = None
+
+    def observe(self, alert_type, entities, ts):
+        """Check the rules an alert just added to the store may complete
+
+        Returns (rule, entity) pairs. A rule fires at most once per alert,
+        and the firing counts for all of the alert's entities.
+        """
+        completed = []
+        for rule in self.rules_by_type.get(alert_type, ()):
+            for entity in entities:
+                if self._complete(rule, entity, ts):
+                    completed.append((rule, entity))
+                    for fired_entity in entities:
+                        self.fired[(rule['name'], fired_entity)] = (ts, self.store.sequence)
+                    break
+        self.sweep(ts)
+        return completed
+
+    def _complete(self, rule, entity, ts):
+        fired = self.fired.get((rule['name'], entity))
+        after = fired[1] if fired is not None else 0
+        cutoff = ts - rule['timeframe']
+        for other in rule['events']:
+            seen = self.store.last_seen(other, entity)
+            if seen is None or seen[0] < cutoff or seen[1] <= after:
+                return False
+        return True
+
+    def sweep(self, now):
+        """Forget firings older than any rule's timeframe"""
+        if self.last_sweep is not None and now - self.last_sweep < self.sweep_interval:
+            return
+        self.last_sweep = now
+        cutoff = now - self.max_timeframe
+        stale = [key for key, (ts, _) in self.fired.items() if ts < cutoff]
+        for key in stale:
+            del self.fired[key]
+
+    def snapshot(self):
+        return {'fired': list(self.fired.items()), 'last_sweep': self.last_sweep}
+
+    def restore(self, state):
+        """Reload last firings; those of rules no longer loaded are dropped"""
+        names = {rule['name'] for rule in self.rules}
+        self.fired = {tuple(key): tuple(fired) for key, fired in state['fired'] if key[0] in names}
+        self.last_sweep = state['last_sweep']
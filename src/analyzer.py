@@ -1,20 +1,66 @@
 import json
 import logging
-from datetime import datetime, timedelta
+import marshal
+from datetime import datetime
 import re
-from collections import defaultdict, deque
 import threading
 import time
 from queue import Empty
+from .windows import SlidingWindowCounter
+from .sketches import EntityWindowCounter
+from .events import ENTITY_KEYS, as_event, event_host, event_time, event_user
+from .minhash import NearDuplicateIndex
+from .history import EventHistoryStore
+from .alert_store import AlertStore, CorrelationTracker
+from .sequences import SequenceDetector
+from .cardinality import DistinctCountDetector
+from .metrics import REGISTRY, LAG_BUCKETS
 
 class LogAnalyzer:
-    def __init__(self, event_queue):
+    def __init__(self, event_queue, history=None, alert_sink=None, metrics=None):
         self.event_queue = event_queue
+        self.metrics = metrics if metrics is not None else REGISTRY
+        # AlertPipeline to hand alerts to; without one they are logged
+        self.alert_sink = alert_sink
         self.logger = logging.getLogger(__name__)
         self.event_patterns = self.load_patterns()
-        self.event_history = deque(maxlen=10000)
-        self.alert_history = defaultdict(list)
+        self.setup_pattern_windows()
+        self.frequency_config = {
+            'window': 300,  # 5 minutes
+            'similarity': 0.8,
+            'threshold': 10,
+            # 'words', 'masked' to ignore IPs and numbers, or 'template' to
+            # count events sharing a mined template id
+            'shingling': 'words'
+        }
+        self.template_windows = {}
+        self.similarity_index = NearDuplicateIndex(
+            window=self.frequency_config['window'],
+            threshold=self.frequency_config['similarity'],
+            shingling=(
+                'masked' if self.frequency_config['shingling'] == 'template'
+                else self.frequency_config['shingling']
+            )
+        )
+        # Shared time-indexed history; without one the analyzer keeps its own
+        self.owns_history = history is None
+        self.event_history = history if history is not None else EventHistoryStore()
+        self.sequence_detector = SequenceDetector()
+        try:
+            self.sequence_detector.load_rules('config/sequence_rules.yaml')
+        except Exception as e:
+            self.logger.warning(f"Could not load sequence rules: {e}")
+        # Scan and spray detection from per-entity distinct counts
+        self.distinct_detector = DistinctCountDetector()
         self.correlation_rules = self.load_correlation_rules()
+        self.correlation_config = {
+            'entity': 'source',  # 'source', 'host' or 'user' for alerts that name no entity
+            'retention': max(rule['timeframe'] for rule in self.correlation_rules)
+        }
+        self.alert_store = AlertStore(retention=self.correlation_config['retention'])
+        self.correlator = CorrelationTracker(self.correlation_rules, self.alert_store)
+        # Held while an event is analyzed, so a checkpoint sees state between events
+        self.state_lock = threading.Lock()
         self.setup_analyzers()
         
     def load_patterns(self):
@@ -24,19 +70,22 @@ class LogAnalyzer:
                 'pattern': r'Failed login attempt|Authentication failure',
                 'threshold': 5,
                 'timeframe': 300,  # 5 minutes
-                'severity': 'HIGH'
+                'severity': 'HIGH',
+                'entity': 'host'  # threshold per source IP; None counts globally
             },
             'privilege_escalation': {
                 'pattern': r'sudo|su\s|privilege|elevation',
                 'threshold': 3,
                 'timeframe': 600,  # 10 minutes
-                'severity': 'CRITICAL'
+                'severity': 'CRITICAL',
+                'entity': 'user'
             },
             'data_exfiltration': {
                 'pattern': r'large file transfer|unusual network activity|data transfer',
                 'threshold': 2,
                 'timeframe': 900,  # 15 minutes
-                'severity': 'CRITICAL'
+                'severity': 'CRITICAL',
+                'entity': 'host'
             },
             'system_crash': {
                 'pattern': r'kernel panic|system halt|crash dump',
@@ -46,6 +95,28 @@ class LogAnalyzer:
             }
         }
         
+    def setup_pattern_windows(self):
+        """Compile pattern regexes and create one window counter per pattern"""
+        self.pattern_regexes = {
+            name: re.compile(info['pattern'], re.IGNORECASE)
+            for name, info in self.event_patterns.items()
+        }
+        # Patterns with an 'entity' count per entity in fixed memory: a
+        # count-min sketch per sub-window plus exact counters for hot keys
+        self.entity_window_config = {
+            'buckets': 10,  # sub-windows per timeframe
+            'width': 8192,  # sketch counters per row; keep above ~2x the matches per sub-window
+            'depth': 4,
+            'max_exact': 4096  # hot entities counted exactly
+        }
+        self.pattern_windows = {
+            name: (
+                EntityWindowCounter(info['timeframe'], **self.entity_window_config)
+                if info.get('entity') else SlidingWindowCounter(info['timeframe'])
+            )
+            for name, info in self.event_patterns.items()
+        }
+        
     def load_correlation_rules(self):
         """Load event correlation rules"""
         return [
@@ -67,10 +138,26 @@ class LogAnalyzer:
         """Setup different types of analyzers"""
         self.analyzers = {
             'pattern': self.analyze_patterns,
-            'correlation': self.analyze_correlations,
             'frequency': self.analyze_frequency,
-            'sequence': self.analyze_sequence
+            'sequence': self.analyze_sequence,
+            'distinct': self.analyze_distinct
+        }
+        self.setup_metrics()
+
+    def setup_metrics(self):
+        """Look up the per-analyzer timers and event counters once"""
+        metrics = self.metrics
+        # Counters are exact; stage timings and lag are sampled to keep
+        # the instrumentation cost per event small
+        self.metrics_config = {'sample_every': 8}  # time one event in N
+        self.event_count = 0
+        self.stage_timers = {
+            name: metrics.histogram('siem_stage_seconds', engine='analyzer', stage=name)
+            for name in list(self.analyzers) + ['correlation']
         }
+        self.events_processed = metrics.counter('siem_events_processed_total', engine='analyzer')
+        self.alerts_raised = metrics.counter('siem_alerts_total', engine='analyzer')
+        self.event_lag = metrics.histogram('siem_event_lag_seconds', buckets=LAG_BUCKETS, engine='analyzer')
         
     def analyze_event(self, event):
         """Analyze a single event using all analyzers"""
@@ -84,81 +171,130 @@ class LogAnalyzer:
                 self.logger.error(f"Error in {analyzer_name} analyzer: {str(e)}")
                 
         return results
+
+    def analyze_event_timed(self, event):
+        """analyze_event that also records the time spent in each analyzer"""
+        results = []
+        timers = self.stage_timers
+        started = time.perf_counter()
+        for analyzer_name, analyzer_func in self.analyzers.items():
+            try:
+                result = analyzer_func(event)
+                if result:
+                    results.extend(result)
+            except Exception as e:
+                self.logger.error(f"Error in {analyzer_name} analyzer: {str(e)}")
+            finished = time.perf_counter()
+            timer = timers.get(analyzer_name)
+            if timer is not None:
+                timer.observe(finished - started)
+            started = finished
+                
+        return results
         
     def analyze_patterns(self, event):
         """Analyze event against known patterns"""
         matches = []
         content = event['content'].lower()
+        epoch = None
         
         for pattern_name, pattern_info in self.event_patterns.items():
-            if re.search(pattern_info['pattern'], content, re.IGNORECASE):
+            if self.pattern_regexes[pattern_name].search(content):
                 # Check threshold in timeframe
-                recent_matches = [
-                    e for e in self.event_history
-                    if re.search(pattern_info['pattern'], e['content'], re.IGNORECASE)
-                    and datetime.fromisoformat(e['timestamp']) > 
-                    datetime.now() - timedelta(seconds=pattern_info['timeframe'])
-                ]
+                if epoch is None:
+                    epoch = event_time(event)
+                window = self.pattern_windows[pattern_name]
+                entity_key = pattern_info.get('entity')
+                # Windows run on event time, so replayed logs count correctly
+                if entity_key:
+                    entity = ENTITY_KEYS[entity_key](event)
+                    recent_matches = window.add(entity, epoch)
+                else:
+                    window.add(epoch)
+                    recent_matches = window.count(epoch)
                 
-                if len(recent_matches) >= pattern_info['threshold']:
+                if recent_matches >= pattern_info['threshold']:
                     match = {
                         'type': pattern_name,
                         'severity': pattern_info['severity'],
-                        'matched_events': len(recent_matches),
-                        'timestamp': datetime.now().isoformat(),
-                        'description': f"Pattern {pattern_name} matched {len(recent_matches)} times"
+                        'matched_events': recent_matches,
+                        'timestamp': datetime.fromtimestamp(epoch).isoformat(),
+                        'description': f"Pattern {pattern_name} matched {recent_matches} times"
                     }
+                    if entity_key:
+                        match['entity'] = entity
+                        match['description'] += f" for {entity_key} {entity}"
                     matches.append(match)
                     
         return matches
         
-    def analyze_correlations(self, event):
-        """Analyze event correlations"""
+    def top_entities(self, n=10):
+        """Entities with the most matches per entity-keyed pattern, as (entity, count) pairs"""
+        return {
+            name: window.top(n)
+            for name, window in self.pattern_windows.items()
+            if isinstance(window, EntityWindowCounter)
+        }
+
+    def analyze_correlations(self, event, alerts):
+        """Store the event's alerts and return correlations they complete
+
+        Alerts are stored and correlated by their own entity and by the
+        event's host and user, so a rule can join a brute force keyed by IP
+        with a privilege escalation keyed by user. Alerts without an entity
+        are tagged with the event's entity under correlation_config.
+        """
         correlations = []
+        ts = event_time(event)
+        shared = [entity for entity in (event_host(event), event_user(event)) if entity is not None]
         
-        for rule in self.correlation_rules:
-            # Check if current event matches any rule events
-            matching_patterns = [
-                pattern for pattern in rule['events']
-                if any(alert['type'] == pattern 
-                    for alert in self.alert_history[event['source']]
-                    if datetime.fromisoformat(alert['timestamp']) >
-                    datetime.now() - timedelta(seconds=rule['timeframe']))
-            ]
-            
-            if len(matching_patterns) == len(rule['events']):
+        for alert in alerts:
+            entity = alert.get('entity')
+            if entity is None:
+                entity = alert['entity'] = ENTITY_KEYS[self.correlation_config['entity']](event)
+            entities = [entity] + [other for other in shared if other != entity]
+            self.alert_store.add(alert, entities, ts)
+            for rule, shared_entity in self.correlator.observe(alert['type'], entities, ts):
                 correlation = {
                     'type': 'correlation',
                     'rule_name': rule['name'],
                     'severity': rule['severity'],
-                    'timestamp': datetime.now().isoformat(),
-                    'description': f"Correlation rule {rule['name']} triggered"
+                    'entity': shared_entity,
+                    'timestamp': datetime.fromtimestamp(ts).isoformat(),
+                    'description': f"Correlation rule {rule['name']} triggered for {shared_entity}"
                 }
                 correlations.append(correlation)
                 
+        for correlation in correlations:
+            self.alert_store.add(correlation, [correlation['entity']], ts)
         return correlations
         
     def analyze_frequency(self, event):
         """Analyze event frequency"""
         alerts = []
-        content = event['content'].lower()
+        epoch = event_time(event)
         
         # Count similar events in the last 5 minutes
-        recent_similar = [
-            e for e in self.event_history
-            if e['source'] == event['source']
-            and self.calculate_similarity(e['content'], content) > 0.8
-            and datetime.fromisoformat(e['timestamp']) >
-            datetime.now() - timedelta(minutes=5)
-        ]
+        if self.frequency_config['shingling'] == 'template' and 'template_id' in event:
+            key = (event['source'], event['template_id'])
+            window = self.template_windows.get(key)
+            if window is None:
+                window = self.template_windows[key] = SlidingWindowCounter(
+                    self.frequency_config['window'])
+            window.add(epoch)
+            recent_similar = window.count(epoch)
+        else:
+            recent_similar = self.similarity_index.add_and_count(
+                event['source'], event['content'], epoch, now=epoch
+            )
         
-        if len(recent_similar) > 10:  # Alert on high frequency
+        if recent_similar > self.frequency_config['threshold']:  # Alert on high frequency
             alert = {
                 'type': 'frequency',
                 'severity': 'WARNING',
-                'count': len(recent_similar),
-                'timestamp': datetime.now().isoformat(),
-                'description': f"High frequency of similar events detected: {len(recent_similar)} in 5 minutes"
+                'count': recent_similar,
+                'timestamp': datetime.fromtimestamp(epoch).isoformat(),
+                'description': f"High frequency of similar events detected: {recent_similar} in 5 minutes"
             }
             alerts.append(alert)
             
@@ -166,45 +302,96 @@ class LogAnalyzer:
         
     def analyze_sequence(self, event):
         """Analyze event sequences"""
-        alerts = []
+        return self.sequence_detector.process(event)
         
-        # Look for specific sequences of events
-        recent_events = list(self.event_history)[-5:]  # Last 5 events
-        if len(recent_events) >= 3:
-            # Example: Failed login followed by successful login and privilege escalation
-            if (self.contains_pattern(recent_events[-3], 'Failed login') and
-                self.contains_pattern(recent_events[-2], 'Successful login') and
-                self.contains_pattern(recent_events[-1], 'sudo|su')):
-                
-                alert = {
-                    'type': 'sequence',
-                    'severity': 'HIGH',
-                    'timestamp': datetime.now().isoformat(),
-                    'description': "Suspicious login sequence detected"
-                }
-                alerts.append(alert)
-                
-        return alerts
+    def analyze_distinct(self, event):
+        """Analyze distinct ports, users and hosts per entity"""
+        return self.distinct_detector.process(event)
         
-    def calculate_similarity(self, text1, text2):
-        """Calculate similarity between two texts"""
-        # Simple similarity based on common words
-        words1 = set(text1.lower().split())
-        words2 = set(text2.lower().split())
-        intersection = words1.intersection(words2)
-        union = words1.union(words2)
-        return len(intersection) / len(union) if union else 0
-        
-    def contains_pattern(self, event, pattern):
-        """Check if event contains pattern"""
-        return bool(re.search(pattern, event['content'], re.IGNORECASE))
+    def process_event(self, event):
+        """Analyze one event and correlate its alerts; returns all alerts"""
+        with self.state_lock:
+            return self._process_event(as_event(event))
+
+    def _process_event(self, event):
+        # Store event in history; a shared history was already filled by the event bus
+        if self.owns_history:
+            self.event_history.append(event)
+        self.event_count += 1
+        timed = self.event_count % self.metrics_config['sample_every'] == 0
+        alerts = self.analyze_event_timed(event) if timed else self.analyze_event(event)
+        if alerts:
+            started = time.perf_counter() if timed else 0
+            try:
+                alerts.extend(self.analyze_correlations(event, alerts))
+            except Exception as e:
+                self.logger.error(f"Error in correlation analyzer: {str(e)}")
+            if timed:
+                self.stage_timers['correlation'].observe(time.perf_counter() - started)
+            self.alerts_raised.inc(len(alerts))
+        self.events_processed.inc()
+        if timed:
+            self.event_lag.observe(time.time() - event.ts)
+        return alerts
         
+    def snapshot(self):
+        """Detector state for a checkpoint, captured between two events"""
+        with self.state_lock:
+            # Marshalled before the lock is released: the parts are live
+            # structures the analyzer thread goes on mutating
+            detectors = marshal.dumps({
+                'pattern_windows': {name: window.snapshot() for name, window in self.pattern_windows.items()},
+                'template_windows': [(key, window.snapshot()) for key, window in self.template_windows.items()],
+                'similarity': self.similarity_index.snapshot(),
+                'sequences': self.sequence_detector.snapshot(),
+                'distinct': self.distinct_detector.snapshot(),
+                'alerts': self.alert_store.snapshot(),
+                'correlations': self.correlator.snapshot()
+            })
+        return {
+            'detectors': detectors,
+            # Sealed history segments are immutable; no need to hold up detection
+            'history': self.event_history.snapshot() if self.owns_history else None
+        }
+
+    def restore(self, state):
+        """Reload a snapshot; a part that no longer fits the configuration starts empty"""
+        parts = {
+            'similarity': self.similarity_index,
+            'sequences': self.sequence_detector,
+            'distinct': self.distinct_detector,
+            'alerts': self.alert_store,
+            'correlations': self.correlator
+        }
+        history = state.get('history')
+        state = marshal.loads(state['detectors'])
+        if self.owns_history and history:
+            parts['history'] = self.event_history
+            state['history'] = history
+        with self.state_lock:
+            for name, window_state in state.get('pattern_windows', {}).items():
+                if name in self.pattern_windows:
+                    try:
+                        self.pattern_windows[name].restore(window_state)
+                    except Exception as e:
+                        self.logger.warning(f"Could not restore {name} pattern window: {str(e)}")
+            for key, window_state in state.get('template_windows', []):
+                window = self.template_windows[tuple(key)] = SlidingWindowCounter(self.frequency_config['window'])
+                window.restore(window_state)
+            for name, part in parts.items():
+                if name in state:
+                    try:
+                        part.restore(state[name])
+                    except Exception as e:
+                        self.logger.warning(f"Could not restore analyzer {name} state: {str(e)}")
+
     def handle_alerts(self, alerts):
         """Handle generated alerts"""
+        if self.alert_sink is not None:
+            self.alert_sink.submit_many(alerts)
+            return
         for alert in alerts:
             self.logger.warning(f"Alert generated: {json.dumps(alert, indent=2)}")
-            # Store alert in history
-            self.alert_history[alert['type']].append(alert)
             # Here you would implement notification system, dashboard updates, etc.
             
     def run(self):
@@ -217,11 +404,8 @@ class LogAnalyzer:
                     # Get event from queue (non-blocking)
                     event = self.event_queue.get_nowait()
                     
-                    # Store event in history
-                    self.event_history.append(event)
-                    
                     # Analyze event
-                    alerts = self.analyze_event(event)
+                    alerts = self.process_event(event)
                     
                     # Handle any generated alerts
                     if alerts:
@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+"""Time-partitioned columnar archive of events and alerts
+
+Usage: python3 -m src.archive [--start 2026-10-17T09:00] [--end 2026-10-17T10:00] [--source system] [--contains "Failed password"]
+"""
+
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from operator import itemgetter
+from queue import Empty
+
+import numpy as np
+
+from .alert_sink import AlertSink
+from .events import Event, as_event, json_default
+from .windows import to_epoch
+
+MAGIC = b'SIEMARCH'
+VERSION = 1
+# Magic, format version, metadata length. The JSON metadata follows and
+# the columns start at the next multiple of 8 bytes, each 8-byte aligned.
+_HEADER = struct.Struct('<8sHI')
+PARTITION = 3600  # seconds of event time per partition directory
+KINDS = ('events', 'alerts')
+# One encoder for every record: json.dumps with options builds a new one per call
+_ENCODER = json.JSONEncoder(default=json_default, separators=(',', ':'))
+
+
+def _aligned(offset):
+    return (offset + 7) & ~7
+
+
+def _blob(values):
+    """Concatenated bytes and the offsets of each value's start (plus the end)"""
+    offsets = np.zeros(len(values) + 1, dtype='<u8')
+    np.cumsum([len(value) for value in values], out=offsets[1:])
+    return b''.join(values), offsets
+
+
+def write_segment(path, kind, records):
+    """Write ``(ts, source, severity, content, extra)`` records as one segment file
+
+    Records are sorted by time. Sources and severities are stored as codes
+    into lists kept in the metadata, with the time range; content and extra
+    (JSON of the remaining fields) are UTF-8 bytes concatenated into one
+    column each, with an offsets column, so a reader can search and slice
+    them in place. The file is written next to ``path`` and renamed over
+    it, so readers never see a partial segment. Returns the bytes written.
+    """
+    records.sort(key=itemgetter(0))
+    sources = sorted({record[1] for record in records})
+    severities = sorted({record[2] for record in records})
+    source_codes = {source: i for i, source in enumerate(sources)}
+    severity_codes = {severity: i for i, severity in enumerate(severities)}
+    content, content_offsets = _blob([record[3] for record in records])
+    extra, extra_offsets = _blob([record[4] for record in records])
+    columns = [
+        ('ts', np.array([record[0] for record in records], dtype='<f8')),
+        ('source', np.array([source_codes[record[1]] for record in records], dtype='<u2')),
+        ('severity', np.array([severity_codes[record[2]] for record in records], dtype='u1')),
+        ('content_offsets', content_offsets),
+        ('content', np.frombuffer(content, dtype='u1')),
+        ('extra_offsets', extra_offsets),
+        ('extra', np.frombuffer(extra, dtype='u1'))
+    ]
+    layout = {}
+    offset = 0
+    for name, values in columns:
+        layout[name] = [offset, values.nbytes, values.dtype.str]
+        offset = _aligned(offset + values.nbytes)
+    meta = json.dumps({
+        'kind': kind,
+        'rows': len(records),
+        'min_ts': records[0][0],
+        'max_ts': records[-1][0],
+        'sources': sources,
+        'severities': severities,
+        'columns': layout
+    }).encode('utf-8')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(meta)))
+        f.write(meta)
+        data_start = _aligned(f.tell())
+        for name, values in columns:
+            f.seek(data_start + layout[name][0])
+            f.write(values.tobytes())
+        size = f.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+def partition_dir(root, kind, partition):
+    """``root/kind/YYYY-MM-DD/HH`` (UTC) for a partition's start time"""
+    start = datetime.fromtimestamp(partition, timezone.utc)
+    return os.path.join(root, kind, start.strftime('%Y-%m-%d'), start.strftime('%H'))
+
+
+def event_record(event):
+    """Archive record of an Event; fields without a column go to ``extra``"""
+    if event.file is None and event.template_id is None and event.template_params is None:
+        extra = {'attrs': event.attrs} if event.attrs is not None else None
+    else:
+        extra = {
+            key: value for key, value in (
+                ('file', event.file), ('template_id', event.template_id),
+                ('template_params', event.template_params), ('attrs', event.attrs)
+            ) if value is not None
+        }
+    return (
+        event.ts, event.source, event.severity, event.content.encode('utf-8', 'replace'),
+        _ENCODER.encode(extra).encode('utf-8') if extra else b''
+    )
+
+
+def alert_record(line):
+    """Archive record of an NDJSON alert line; the whole line is the content"""
+    alert = json.loads(line)
+    try:
+        ts = to_epoch(alert['timestamp'])
+    except (KeyError, TypeError, ValueError):
+        ts = time.time()
+    return (ts, str(alert.get('source') or ''), str(alert.get('severity') or ''),
+            line.rstrip('\n').encode('utf-8'), b'')
+
+
+class ArchiveWriter:
+    """Buffers records per partition and writes each as segments of ``segment_rows``
+
+    Records land in the partition of their own timestamp, so late events
+    go to the hour they happened in. Used from a single thread.
+    """
+
+    def __init__(self, root, kind, segment_rows=65536):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown archive kind: {kind}")
+        self.logger = logging.getLogger(__name__)
+        self.root = root
+        self.kind = kind
+        self.segment_rows = segment_rows
+        self.buffers = {}  # partition start -> records
+        self.stats = {'records': 0, 'segments': 0, 'bytes': 0, 'errors': 0, 'lost': 0}
+
+    def add(self, record):
+        partition = int(record[0] // PARTITION) * PARTITION
+        records = self.buffers.get(partition)
+        if records is None:
+            records = self.buffers[partition] = []
+        records.append(record)
+        if len(records) >= self.segment_rows:
+            self.write(partition)
+
+    def write(self, partition):
+        records = self.buffers.pop(partition, None)
+        if not records:
+            return
+        # Time of writing in the name keeps segments of the same partition apart
+        path = os.path.join(partition_dir(self.root, self.kind, partition),
+                            f"{int(records[0][0])}-{time.time_ns()}.seg")
+        try:
+            size = write_segment(path, self.kind, records)
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.stats['lost'] += len(records)
+            self.logger.error(f"Error writing archive segment {path}: {str(e)}")
+            return
+        self.stats['records'] += len(records)
+        self.stats['segments'] += 1
+        self.stats['bytes'] += size
+
+    def flush(self):
+        for partition in list(self.buffers):
+            self.write(partition)
+
+    def pending(self):
+        return sum(len(records) for records in self.buffers.values())
+
+
+class EventArchiver:
+    """Archives every event published on the bus
+
+    Reads its own bus subscription in batches on a background thread, so
+    publishing never waits on disk: when the archiver falls behind, the
+    subscription's backpressure policy applies like for any other
+    consumer. Partitions are written out when they reach ``segment_rows``
+    events and every ``flush_interval`` seconds.
+    """
+
+    def __init__(self, subscription, root=os.path.join('state', 'archive'), segment_rows=65536,
+                 flush_interval=60.0, batch_size=4096):
+        self.logger = logging.getLogger(__name__)
+        self.subscription = subscription
+        self.writer = ArchiveWriter(root, 'events', segment_rows=segment_rows)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self.thread = None
+
+    def archive(self, events):
+        for event in events:
+            try:
+                self.writer.add(event_record(as_event(event)))
+            except Exception as e:
+                self.writer.stats['lost'] += 1
+                self.logger.error(f"Could not archive event: {str(e)}")
+
+    def run(self):
+        """Writer loop: archive until closed, then flush what is left"""
+        last_flush = time.monotonic()
+        while not self._stop.is_set() or self.subscription.lag:
+            try:
+                # Short waits so close() is noticed promptly
+                batch = self.subscription.get_batch(self.batch_size, 0.5, timeout=0.5)
+            except Empty:
+                batch = []
+            self.archive(batch)
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self.writer.flush()
+                last_flush = time.monotonic()
+        self.writer.flush()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='archiver')
+            self.thread.daemon = True
+            self.thread.start()
+        return self
+
+    def close(self, timeout=30):
+        """Archive what is queued and write every partition out"""
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join(timeout=timeout)
+
+    def stats(self):
+        return dict(self.writer.stats, pending=self.writer.pending())
+
+
+class ArchiveSink(AlertSink):
+    """Alert sink writing alerts into the archive's ``alerts`` partitions
+
+    Runs on the AlertPipeline writer thread. Partitions are written out
+    at ``segment_rows`` alerts, on the first batch after ``flush_interval``
+    seconds and on close.
+    """
+
+    name = 'archive'
+
+    def __init__(self, root=os.path.join('state', 'archive'), segment_rows=16384, flush_interval=60.0):
+        self.writer = ArchiveWriter(root, 'alerts', segment_rows=segment_rows)
+        self.flush_interval = flush_interval
+        self.last_flush = time.monotonic()
+
+    def write(self, lines):
+        for line in lines:
+            self.writer.add(alert_record(line))
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.writer.flush()
+            self.last_flush = time.monotonic()
+
+    def close(self):
+        self.writer.flush()
+
+
+class ArchiveSegment:
+    """One segment file; its columns are NumPy views of a read-only memory map
+
+    Opening a segment reads only its header. Filters on time, source and
+    severity run on the mapped columns and content search runs on the
+    mapped bytes, so scanning does not copy records into Python objects;
+    only rows that are returned are decoded.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            magic, version, meta_length = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not an archive segment of this version")
+            self.meta = json.loads(f.read(meta_length))
+        self.data_start = _aligned(_HEADER.size + meta_length)
+        self.rows = self.meta['rows']
+        self.min_ts = self.meta['min_ts']
+        self.max_ts = self.meta['max_ts']
+        self.sources = self.meta['sources']
+        self.severities = self.meta['severities']
+        self._map = None
+
+    def matches(self, start=None, end=None, source=None):
+        """Whether the metadata allows records in [start, end) from source"""
+        return ((start is None or self.max_ts >= start) and (end is None or self.min_ts < end)
+                and (source is None or source in self.sources))
+
+    def column(self, name):
+        if self._map is None:
+            with open(self.path, 'rb') as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        offset, length, dtype = self.meta['columns'][name]
+        dtype = np.dtype(dtype)
+        return np.frombuffer(self._map, dtype=dtype, count=length // dtype.itemsize,
+                             offset=self.data_start + offset)
+
+    def select(self, start=None, end=None, source=None, severity=None):
+        """Indices of the rows in [start, end) from source with severity"""
+        ts = self.column('ts')
+        lo = 0 if start is None else int(np.searchsorted(ts, start, 'left'))
+        hi = len(ts) if end is None else int(np.searchsorted(ts, end, 'left'))
+        mask = None
+        for value, values, name in ((source, self.sources, 'source'), (severity, self.severities, 'severity')):
+            if value is None:
+                continue
+            if value not in values:
+                return np.arange(0)
+            matching = self.column(name)[lo:hi] == values.index(value)
+            mask = matching if mask is None else mask & matching
+        if mask is None:
+            return np.arange(lo, hi)
+        return np.flatnonzero(mask) + lo
+
+    def search(self, needle, rows):
+        """The rows among ``rows`` whose content contains the bytes ``needle``"""
+        if not len(rows):
+            return rows
+        offsets = self.column('content_offsets')
+        base = self.data_start + self.meta['columns']['content'][0]
+        stop = base + int(offsets[rows[-1] + 1])
+        hits = []
+        position = self._map.find(needle, base + int(offsets[rows[0]]), stop)
+        while position != -1:
+            row = int(np.searchsorted(offsets, position - base, 'right')) - 1
+            row_end = base + int(offsets[row + 1])
+            if position + len(needle) <= row_end:
+                hits.append(row)
+                position = self._map.find(needle, row_end, stop)
+            else:
+                # The match runs into the next row's content
+                position = self._map.find(needle, position + 1, stop)
+        hits = np.array(hits, dtype=np.int64)
+        if len(rows) == rows[-1] - rows[0] + 1:
+            return hits
+        selected = np.zeros(self.rows, dtype=bool)
+        selected[rows] = True
+        return hits[selected[hits]]
+
+    def _text(self, name, row):
+        offsets = self.column(f"{name}_offsets")
+        base = self.data_start + self.meta['columns'][name][0]
+        return self._map[base + int(offsets[row]):base + int(offsets[row + 1])].decode('utf-8')
+
+    def records(self, rows):
+        """Events (or alert dicts, for an alerts segment) for the given rows"""
+        if self.meta['kind'] == 'alerts':
+            return [json.loads(self._text('content', row)) for row in rows]
+        ts = self.column('ts')
+        sources = self.column('source')
+        severities = self.column('severity')
+        events = []
+        for row in rows:
+            extra = self._text('extra', row)
+            extra = json.loads(extra) if extra else {}
+            events.append(Event(
+                float(ts[row]), self.sources[sources[row]], self._text('content', row),
+                self.severities[severities[row]], extra.get('file'), extra.get('template_id'),
+                extra.get('template_params'), extra.get('attrs')
+            ))
+        return events
+
+
+def _bounds(start, end):
+    return (None if start is None else to_epoch(start)), (None if end is None else to_epoch(end))
+
+
+class ArchiveReader:
+    """Queries over the archive, pruning partitions and segments before reading
+
+    A partition directory outside the queried time range is never listed,
+    and a segment whose metadata rules out the range or source is never
+    mapped. ``last_scan`` counts what the latest query opened and skipped.
+    """
+
+    def __init__(self, root=os.path.join('state', 'archive')):
+        self.root = root
+        self.last_scan = {}
+
+    def partitions(self, kind):
+        """``(start, directory)`` of every partition of a kind, oldest first"""
+        kind_dir = os.path.join(self.root, kind)
+        if not os.path.isdir(kind_dir):
+            return []
+        found = []
+        for day in sorted(os.listdir(kind_dir)):
+            for hour in sorted(os.listdir(os.path.join(kind_dir, day))):
+                try:
+                    start = datetime.strptime(f"{day} {hour}", '%Y-%m-%d %H').replace(tzinfo=timezone.utc)
+                except ValueError:
+                    continue
+                found.append((start.timestamp(), os.path.join(kind_dir, day, hour)))
+        return found
+
+    def segments(self, kind='events', start=None, end=None, source=None):
+        """Segments whose metadata allows matches, grouped by partition"""
+        self.last_scan = {'partitions_pruned': 0, 'segments_pruned': 0, 'segments': 0, 'rows_scanned': 0}
+        groups = []
+        for partition, directory in self.partitions(kind):
+            if (start is not None and partition + PARTITION <= start) or (end is not None and partition >= end):
+                self.last_scan['partitions_pruned'] += 1
+                continue
+            group = []
+            for name in sorted(os.listdir(directory)):
+                if not name.endswith('.seg'):
+                    continue
+                segment = ArchiveSegment(os.path.join(directory, name))
+                if segment.matches(start, end, source):
+                    group.append(segment)
+                else:
+                    self.last_scan['segments_pruned'] += 1
+            self.last_scan['segments'] += len(group)
+            if group:
+                groups.append(group)
+        return groups
+
+    def _matching(self, segment, start, end, source, severity, contains):
+        rows = segment.select(start, end, source, severity)
+        self.last_scan['rows_scanned'] += len(rows)
+        if contains is not None:
+            rows = segment.search(contains.encode('utf-8'), rows)
+        return rows
+
+    def count(self, kind='events', start=None, end=None, source=None, severity=None, contains=None):
+        """Number of matching records, without decoding any of them"""
+        start, end = _bounds(start, end)
+        return sum(
+            len(self._matching(segment, start, end, source, severity, contains))
+            for group in self.segments(kind, start, end, source) for segment in group
+        )
+
+    def query(self, kind='events', start=None, end=None, source=None, severity=None, contains=None, limit=None):
+        """Matching Events (alert dicts for ``alerts``) in time order
+
+        ``start`` and ``end`` are epoch seconds, ISO strings or datetimes;
+        ``contains`` is a case-sensitive substring of the content (for
+        alerts, of the alert's JSON).
+        """
+        start, end = _bounds(start, end)
+        returned = 0
+        for group in self.segments(kind, start, end, source):
+            # Segments of one partition may overlap in time (late events)
+            matches = [(segment, self._matching(segment, start, end, source, severity, contains))
+                       for segment in group]
+            times = np.concatenate([segment.column('ts')[rows] for segment, rows in matches])
+            owners = np.concatenate([np.full(len(rows), i) for i, (_, rows) in enumerate(matches)])
+            positions = np.concatenate([rows for _, rows in matches])
+            order = np.argsort(times, kind='stable')
+            if limit is not None:
+                order = order[:limit - returned]
+            for i in order:
+                segment = matches[owners[i]][0]
+                yield segment.records((positions[i],))[0]
+            returned += len(order)
+            if limit is not None and returned >= limit:
+                return
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Search the SIEM event and alert archive")
+    parser.add_argument('--root', default=os.path.join('state', 'archive'), help="archive directory")
+    parser.add_argument('--kind', choices=KINDS, default='events')
+    parser.add_argument('--start', default=None, help="ISO time or epoch seconds, inclusive")
+    parser.add_argument('--end', default=None, help="ISO time or epoch seconds, exclusive")
+    parser.add_argument('--source', default=None, help="only this source")
+    parser.add_argument('--severity', default=None, help="only this severity")
+    parser.add_argument('--contains', default=None, help="case-sensitive substring of the content")
+    parser.add_argument('--limit', type=int, default=None, help="print at most this many records")
+    parser.add_argument('--count', action='store_true', help="print the number of matches only")
+    return parser.parse_args(argv)
+
+
+def _time_arg(value):
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return to_epoch(value)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    reader = ArchiveReader(args.root)
+    start = _time_arg(args.start)
+    end = _time_arg(args.end)
+    filters = dict(kind=args.kind, start=start, end=end, source=args.source, severity=args.severity,
+                   contains=args.contains)
+    started = time.perf_counter()
+    if args.count:
+        print(reader.count(**filters))
+    else:
+        for record in reader.query(limit=args.limit, **filters):
+            if isinstance(record, Event):
+                record = record.to_dict()
+            print(json.dumps(record, default=json_default, separators=(',', ':')))
+    scan = reader.last_scan
+    print(f"{scan['segments']} segments scanned ({scan['rows_scanned']} rows), {scan['segments_pruned']} segments "
+          f"and {scan['partitions_pruned']} partitions pruned in {time.perf_counter() - started:.3f}s",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
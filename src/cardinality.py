@@ -0,0 +1,184 @@
+import re
+from datetime import datetime
+
+from .events import _IPV4, _USER, event_time
+from .sketches import DistinctWindowCounter
+
+# Destination ports as firewalls and flow logs write them: DPT=22, dst_port=22
+_DST_PORT = re.compile(r'\b(?:DPT|dst_?port|dport|dest(?:ination)?[ _]port)[=: ]+(\d{1,5})\b', re.IGNORECASE)
+
+
+def _ip(event):
+    ip = event.get('ip')
+    # Events from LineParser (with a 'format') already carry any IP found
+    if ip is None and 'format' not in event:
+        match = _IPV4.search(event.get('content', ''))
+        ip = match.group(0) if match else None
+    return ip
+
+
+def _user(event):
+    user = event.get('user')
+    if user is None and 'format' not in event:
+        match = _USER.search(event.get('content', ''))
+        user = match.group(1) if match else None
+    return user
+
+
+def _hostname(event):
+    return event.get('hostname') or event.get('host')
+
+
+def _port(event):
+    port = event.get('dst_port')
+    if port is None:
+        content = event.get('content', '')
+        # Every spelling _DST_PORT accepts contains 'dpt' or 'port', in any case
+        folded = content.lower()
+        if 'dpt' in folded or 'port' in folded:
+            match = _DST_PORT.search(content)
+            port = match.group(1) if match else None
+    return port
+
+
+# Fields a rule can count by or count distinct values of. Unlike
+# ENTITY_KEYS these do not fall back to the source: an event without the
+# field is skipped rather than lumped in with every other such event.
+FIELDS = {
+    'ip': _ip,
+    'user': _user,
+    'hostname': _hostname,
+    'port': _port
+}
+
+
+class DistinctCountRule:
+    """Alert when one entity has too many distinct values of a field in a window"""
+
+    __slots__ = ('name', 'entity', 'value', 'pattern', 'regex', 'threshold', 'timeframe', 'severity',
+                 'description')
+
+    def __init__(self, name, entity, value, threshold, timeframe=300, pattern=None, severity='HIGH',
+                 description=None):
+        for field in (entity, value):
+            if field not in FIELDS:
+                raise ValueError(f"Distinct count rule {name!r} has unknown field {field!r}")
+        self.name = name
+        self.entity = entity
+        self.value = value
+        self.pattern = pattern
+        self.regex = re.compile(pattern, re.IGNORECASE) if pattern else None
+        self.threshold = threshold
+        self.timeframe = timeframe
+        self.severity = severity
+        self.description = description or f"{name}: {entity} with many distinct {value} values"
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['name'], data['entity'], data['value'], data['threshold'],
+            timeframe=data.get('timeframe', 300), pattern=data.get('pattern'),
+            severity=data.get('severity', 'HIGH'), description=data.get('description')
+        )
+
+
+class DistinctCountDetector:
+    """Scan and spray detection from per-entity distinct counts
+
+    Each rule counts, per entity (say a source IP), the distinct values of
+    another field (destination ports, usernames, hostnames) seen in events
+    matching its optional pattern, over a sliding window kept in a
+    DistinctWindowCounter: exact for small counts, HyperLogLog beyond. An
+    alert is raised for every event while the count is at or above the
+    rule's threshold; suppression folds the repeats.
+    """
+
+    def __init__(self, rules=None, window_config=None):
+        self.window_config = window_config or {
+            'buckets': 5,  # sub-windows per timeframe
+            'precision': 9,  # 512 B HyperLogLog per sub-window, ~5% error
+            'exact_limit': 32,  # distinct values counted exactly before switching to HyperLogLog
+            'max_entities': 100000  # per rule, least recently seen evicted first
+        }
+        self.rules = []
+        self.windows = []
+        for rule in rules if rules is not None else self.default_rules():
+            self.add_rule(rule)
+
+    @staticmethod
+    def default_rules():
+        return [
+            DistinctCountRule(
+                'port_scan', 'ip', 'port', threshold=50, timeframe=300, severity='HIGH',
+                description="Port scan: one source reached many destination ports"
+            ),
+            DistinctCountRule(
+                'password_spray', 'ip', 'user', threshold=10, timeframe=900, severity='HIGH',
+                pattern=r'Failed password|Failed login|Authentication failure|invalid user',
+                description="Password spray: failed logins for many users from one source"
+            ),
+            DistinctCountRule(
+                'lateral_movement', 'user', 'hostname', threshold=10, timeframe=3600, severity='HIGH',
+                pattern=r'Accepted|session opened|Successful login',
+                description="One user logged in to many hosts"
+            )
+        ]
+
+    def add_rule(self, rule):
+        if isinstance(rule, dict):
+            rule = DistinctCountRule.from_dict(rule)
+        self.rules.append(rule)
+        self.windows.append(DistinctWindowCounter(rule.timeframe, **self.window_config))
+
+    def process(self, event):
+        """Count one event against every rule; returns alerts for rules over threshold"""
+        alerts = []
+        fields = {}
+        ts = None
+        for rule, window in zip(self.rules, self.windows):
+            if rule.regex is not None and not rule.regex.search(event['content']):
+                continue
+            for field in (rule.entity, rule.value):
+                if field not in fields:
+                    fields[field] = FIELDS[field](event)
+            entity = fields[rule.entity]
+            value = fields[rule.value]
+            if entity is None or value is None:
+                continue
+            if ts is None:
+                ts = event_time(event)
+            count = window.add(entity, value, ts)
+            if count >= rule.threshold:
+                alerts.append(self.build_alert(rule, entity, count, ts))
+        return alerts
+
+    def build_alert(self, rule, entity, count, ts):
+        return {
+            'type': 'distinct_count',
+            'rule_name': rule.name,
+            'severity': rule.severity,
+            'entity': entity,
+            'distinct_count': count,
+            'timestamp': datetime.fromtimestamp(ts).isoformat(),
+            'description': f"{rule.description}: {rule.entity} {entity} has {count} distinct "
+                           f"{rule.value} values in {rule.timeframe}s"
+        }
+
+    def sketch(self, rule_name, entity):
+        """HyperLogLog of an entity's window for a rule, to merge counts across workers"""
+        for rule, window in zip(self.rules, self.windows):
+            if rule.name == rule_name:
+                return window.sketch(entity)
+        raise KeyError(rule_name)
+
+    def snapshot(self):
+        return {rule.name: window.snapshot() for rule, window in zip(self.rules, self.windows)}
+
+    def restore(self, state):
+        """Reload the windows of rules that are still loaded"""
+        for rule, window in zip(self.rules, self.windows):
+            if rule.name in state:
+                window.restore(state[rule.name])
+
+    def stats(self):
+        return {rule.name: window.stats() for rule, window in zip(self.rules, self.windows)}
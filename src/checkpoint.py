@@ -0,0 +1,201 @@
+import logging
+import marshal
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+MAGIC = b'SIEMCKPT'
+VERSION = 1
+# Magic, format version, Python major and minor (marshal data is only
+# guaranteed to load on the version that wrote it), write time
+_HEADER = struct.Struct('<8sHBBd')
+# Section name length, payload length, payload CRC-32
+_SECTION = struct.Struct('<HQI')
+
+
+def encode_section(state):
+    """Marshal and compress one component's state"""
+    return zlib.compress(marshal.dumps(state), 1)
+
+
+def load_section(payload):
+    return marshal.loads(zlib.decompress(payload))
+
+
+def write_checkpoint(path, sections):
+    """Atomically write ``{name: encode_section payload}`` to a checkpoint file
+
+    Each section has its own length and CRC, so a reader can restore some
+    sections and skip others. The file is written next to ``path``, synced
+    and renamed over it, so a crash leaves either the old or the new
+    checkpoint, never a torn one. Returns the bytes written.
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, sys.version_info[0], sys.version_info[1], time.time()))
+        for name, payload in sections.items():
+            encoded = name.encode('utf-8')
+            f.write(_SECTION.pack(len(encoded), len(payload), zlib.crc32(payload)))
+            f.write(encoded)
+            f.write(payload)
+        size = f.tell()
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return size
+
+
+def read_checkpoint(path):
+    """``({name: compressed payload}, written at, [corrupt names])`` from a checkpoint file
+
+    Payloads are checked against their CRC but not decoded; pass one to
+    ``load_section`` to get its state back. A section failing its CRC is
+    left out and named in the third item, so the others still load; a
+    truncated section ends the file.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < _HEADER.size:
+        raise ValueError("checkpoint is truncated")
+    magic, version, major, minor, written_at = _HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a checkpoint file of this version")
+    if (major, minor) != sys.version_info[:2]:
+        raise ValueError(f"checkpoint was written by Python {major}.{minor}")
+    sections = {}
+    corrupt = []
+    offset = _HEADER.size
+    view = memoryview(data)
+    while offset + _SECTION.size <= len(data):
+        name_length, payload_length, crc = _SECTION.unpack_from(data, offset)
+        offset += _SECTION.size
+        name = bytes(view[offset:offset + name_length]).decode('utf-8', 'replace')
+        offset += name_length
+        payload = view[offset:offset + payload_length]
+        offset += payload_length
+        if len(payload) != payload_length:
+            corrupt.append(name)
+            break
+        if zlib.crc32(payload) != crc:
+            corrupt.append(name)
+            continue
+        # Copied so sections that are never restored do not pin the whole file
+        sections[name] = bytes(payload)
+    return sections, written_at, corrupt
+
+
+class CheckpointManager:
+    """Periodic snapshots of detector state for warm restarts
+
+    Components (the event history, the analyzer, the AI engine) are
+    registered under a name; each has ``snapshot()``, returning its state
+    as builtin types, and ``restore(state)``. A background thread saves
+    every ``interval`` seconds: each component captures its state (the
+    analyzer between two events), then this thread encodes and writes it
+    with ``write_checkpoint``. ``load`` reads the last checkpoint at
+    startup and ``register`` restores a component from it, so components
+    created later (the AI engine finishes initializing in the background)
+    are restored when they appear. A section whose snapshot fails, or
+    whose component has not been registered yet, is written from its last
+    good copy rather than dropped.
+    """
+
+    def __init__(self, path=os.path.join('state', 'checkpoint.bin'), interval=300):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.interval = interval
+        self.components = {}
+        self.pending = {}  # sections loaded but not yet restored
+        self.sections = {}  # name -> last good encoded section, restored or saved
+        self.stats = {'saves': 0, 'errors': 0, 'last_bytes': 0, 'last_seconds': 0.0, 'restored': []}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.thread = None
+
+    def load(self):
+        """Read the last checkpoint; returns False if there is none usable"""
+        if not os.path.exists(self.path):
+            return False
+        started = time.perf_counter()
+        try:
+            sections, written_at, corrupt = read_checkpoint(self.path)
+        except Exception as e:
+            self.logger.error(f"Ignoring checkpoint {self.path}: {str(e)}")
+            return False
+        for name in corrupt:
+            self.logger.warning(f"Skipping corrupt section {name!r} of checkpoint {self.path}")
+        with self._lock:
+            self.pending = sections
+        self.logger.info(
+            f"Loaded checkpoint from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(written_at))} "
+            f"({', '.join(sections)}) in {time.perf_counter() - started:.3f}s"
+        )
+        return True
+
+    def register(self, name, component):
+        """Include a component in checkpoints, restoring it from the loaded one"""
+        with self._lock:
+            self.components[name] = component
+            payload = self.pending.pop(name, None)
+        if payload is None:
+            return False
+        started = time.perf_counter()
+        try:
+            component.restore(load_section(payload))
+        except Exception as e:
+            self.logger.error(f"Could not restore {name} from checkpoint: {str(e)}")
+            return False
+        self.sections[name] = payload
+        self.stats['restored'].append(name)
+        self.logger.info(f"Restored {name} from checkpoint in {time.perf_counter() - started:.3f}s")
+        return True
+
+    def save(self):
+        """Snapshot every registered component and write the checkpoint"""
+        started = time.perf_counter()
+        with self._lock:
+            components = dict(self.components)
+            # Loaded for components not registered yet: carried over as is
+            sections = dict(self.pending)
+        for name, component in components.items():
+            try:
+                self.sections[name] = encode_section(component.snapshot())
+            except Exception as e:
+                if name not in self.sections:
+                    self.logger.warning(f"Could not snapshot {name}, leaving it out: {str(e)}")
+                    continue
+                self.logger.warning(f"Could not snapshot {name}, keeping its previous state: {str(e)}")
+            sections[name] = self.sections[name]
+        try:
+            size = write_checkpoint(self.path, sections)
+        except Exception as e:
+            self.stats['errors'] += 1
+            self.logger.error(f"Error writing checkpoint {self.path}: {str(e)}")
+            return False
+        elapsed = time.perf_counter() - started
+        self.stats.update(saves=self.stats['saves'] + 1, last_bytes=size, last_seconds=elapsed)
+        self.logger.info(f"Checkpoint written: {size / 1e6:.1f} MB in {elapsed:.2f}s")
+        return True
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            self.save()
+
+    def start(self):
+        if self.interval and self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='checkpoint')
+            self.thread.daemon = True
+            self.thread.start()
+        return self
+
+    def close(self):
+        """Stop the periodic thread and write a final checkpoint"""
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.save()
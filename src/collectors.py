@@ -1,36 +1,65 @@
 import os
 import time
 import logging
+import threading
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from datetime import datetime
 import json
+from .tailer import FileTailer
+from .parsers import LineParser
+from .metrics import REGISTRY
+
+# Lines without one of their source's keywords are dropped at collection
+# (src.replay applies the same filter to archived files)
+SOURCE_KEYWORDS = {
+    'system': ['error', 'warning', 'critical', 'failed'],
+    'network': ['403', '404', '500', 'denied'],
+    'application': ['exception', 'error', 'crash', 'failed']
+}
 
 class LogCollector:
-    def __init__(self, source_type, event_queue):
+    def __init__(self, source_type, event_queue, template_miner=None, metrics=None):
         self.source_type = source_type
         self.event_queue = event_queue
+        self.template_miner = template_miner
         self.logger = logging.getLogger(__name__)
+        self.poll_interval = 1  # seconds between fallback polls of every file
+        self.checkpoint_interval = 5  # seconds between offset checkpoints
+        # The watchdog thread and the poll loop both process files; one lock
+        # over read, parse and publish keeps lines in file order and guards
+        # the parser, which is not thread-safe (the template miner, shared
+        # by every collector, has its own lock)
+        self.lock = threading.Lock()
         self.setup_source_config()
+        # Keyword filter, severity, timestamp and entity fields, parsed once per line
+        self.parser = LineParser(self.config.get('formats'), keywords=self.config['patterns'])
+        metrics = metrics if metrics is not None else REGISTRY
+        self.events_collected = metrics.counter('siem_events_collected_total', source=source_type)
+        self.collect_timer = metrics.histogram('siem_collect_seconds', source=source_type)
+        self.tailer = FileTailer(
+            checkpoint_path=os.path.join(self.state_dir, f"{source_type}_offsets.json")
+        )
         
     def setup_source_config(self):
         """Configure source-specific settings"""
         # Use local log files for testing
         log_dir = os.path.join(os.getcwd(), 'logs')
         os.makedirs(log_dir, exist_ok=True)
+        self.state_dir = os.path.join(os.getcwd(), 'state')
         
         self.source_configs = {
             'system': {
                 'paths': [os.path.join(log_dir, 'system.log')],
-                'patterns': ['error', 'warning', 'critical', 'failed']
+                'patterns': SOURCE_KEYWORDS['system']
             },
             'network': {
                 'paths': [os.path.join(log_dir, 'network.log')],
-                'patterns': ['403', '404', '500', 'denied']
+                'patterns': SOURCE_KEYWORDS['network']
             },
             'application': {
                 'paths': [os.path.join(log_dir, 'app.log')],
-                'patterns': ['exception', 'error', 'crash', 'failed']
+                'patterns': SOURCE_KEYWORDS['application']
             }
         }
         
@@ -53,40 +82,35 @@ class LogCollector:
         def on_modified(self, event):
             if not event.is_directory and event.src_path in self.collector.config['paths']:
                 self.collector.process_log_file(event.src_path)
+
+        def on_created(self, event):
+            # A rotated log being recreated under the watched name
+            self.on_modified(event)
+
+        def on_moved(self, event):
+            # The watched name was renamed away: drain what is left of it
+            if not event.is_directory and event.src_path in self.collector.config['paths']:
+                self.collector.process_log_file(event.src_path)
                 
     def process_log_file(self, file_path):
-        """Process new log entries from the file"""
-        try:
-            with open(file_path, 'r') as f:
-                # Seek to end minus 4KB to read recent entries
-                f.seek(max(0, os.path.getsize(file_path) - 4096))
-                recent_logs = f.readlines()
-                
-                for line in recent_logs:
-                    if any(pattern in line.lower() for pattern in self.config['patterns']):
-                        event = {
-                            'timestamp': datetime.now().isoformat(),
-                            'source': self.source_type,
-                            'file': file_path,
-                            'content': line.strip(),
-                            'severity': self.determine_severity(line)
-                        }
-                        self.event_queue.put(event)
-                        
-        except Exception as e:
-            self.logger.error(f"Error processing log file {file_path}: {str(e)}")
+        """Process log entries appended to the file since the last read"""
+        with self.lock:
+            started = time.perf_counter()
+            try:
+                for line in self.tailer.read_lines(file_path):
+                    event = self.parser.parse(line, self.source_type, file=file_path)
+                    if event is None:
+                        continue
+                    if self.template_miner:
+                        event.template_id, event.template_params = self.template_miner.add(
+                            self.source_type, event.content)
+                    self.event_queue.put(event)
+                    self.events_collected.inc()
+
+            except Exception as e:
+                self.logger.error(f"Error processing log file {file_path}: {str(e)}")
+            self.collect_timer.observe(time.perf_counter() - started)
             
-    def determine_severity(self, log_line):
-        """Determine the severity of the log entry"""
-        log_lower = log_line.lower()
-        if any(critical in log_lower for critical in ['critical', 'emergency', 'alert']):
-            return 'CRITICAL'
-        elif any(error in log_lower for error in ['error', 'failure', 'failed']):
-            return 'ERROR'
-        elif any(warning in log_lower for warning in ['warning', 'warn']):
-            return 'WARNING'
-        return 'INFO'
-        
     def run(self):
         """Start the log collector"""
         self.logger.info(f"Starting {self.source_type} log collector")
@@ -106,10 +130,23 @@ class LogCollector:
             
         observer.start()
         self.logger.info(f"Monitoring files: {', '.join(self.config['paths'])}")
+
+        # Open every file now so offsets are tracked from startup
+        for path in self.config['paths']:
+            self.process_log_file(path)
                 
         try:
+            last_checkpoint = time.time()
             while True:
-                time.sleep(1)
+                time.sleep(self.poll_interval)
+                # Catch writes and rotations that produced no notification
+                for path in self.config['paths']:
+                    self.process_log_file(path)
+                if time.time() - last_checkpoint >= self.checkpoint_interval:
+                    self.tailer.checkpoint()
+                    last_checkpoint = time.time()
         except KeyboardInterrupt:
             observer.stop()
-            observer.join() 
\ No newline at end of file
+            observer.join()
+        finally:
+            self.tailer.close() 
\ No newline at end of file
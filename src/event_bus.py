@@ -0,0 +1,227 @@
+import itertools
+import threading
+import time
+from queue import Empty
+
+BACKPRESSURE_POLICIES = ('block', 'drop_oldest', 'sample')
+
+
+class Subscription:
+    """Bounded ring buffer with its own read cursor for a single consumer
+
+    Exposes the ``get``/``get_nowait`` subset of ``queue.Queue`` so existing
+    consumer loops can read from it unchanged. What happens when the ring is
+    full depends on ``policy``:
+
+    - ``block``: the publisher waits until the consumer frees a slot
+    - ``drop_oldest``: the oldest unread event is overwritten
+    - ``sample``: only every ``sample_rate``-th overflowing event is kept
+      (overwriting the oldest), the rest are dropped
+    """
+
+    def __init__(self, name, capacity=10000, policy='drop_oldest', sample_rate=10):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        if capacity < 1:
+            raise ValueError("Subscription capacity must be at least 1")
+        self.name = name
+        self.capacity = capacity
+        self.policy = policy
+        self.sample_rate = max(1, sample_rate)
+        self._buffer = [None] * capacity
+        self._head = 0  # sequence number of the next event to read
+        self._tail = 0  # sequence number of the next event to write
+        self._overflow = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self.closed = False
+        self.received = 0
+        self.consumed = 0
+        self.dropped = 0
+
+    @property
+    def lag(self):
+        """Number of published events this consumer has not read yet"""
+        return self._tail - self._head
+
+    def qsize(self):
+        return self.lag
+
+    def offer(self, event):
+        """Append an event, applying the backpressure policy when full"""
+        with self._lock:
+            if self.closed:
+                return False
+            self.received += 1
+            if self._tail - self._head >= self.capacity:
+                if self.policy == 'block':
+                    while self._tail - self._head >= self.capacity and not self.closed:
+                        self._not_full.wait()
+                    if self.closed:
+                        return False
+                elif self.policy == 'sample':
+                    self._overflow += 1
+                    if self._overflow % self.sample_rate:
+                        self.dropped += 1
+                        return False
+                    self._evict_oldest()
+                else:
+                    self._evict_oldest()
+            self._buffer[self._tail % self.capacity] = event
+            self._tail += 1
+            self._not_empty.notify()
+            return True
+
+    def _evict_oldest(self):
+        self._buffer[self._head % self.capacity] = None
+        self._head += 1
+        self.dropped += 1
+
+    def _pop(self):
+        index = self._head % self.capacity
+        event = self._buffer[index]
+        self._buffer[index] = None
+        self._head += 1
+        self.consumed += 1
+        if self.policy == 'block':
+            self._not_full.notify()
+        return event
+
+    def get(self, block=True, timeout=None):
+        """Remove and return the next event, raising queue.Empty like Queue.get"""
+        with self._lock:
+            if not block:
+                if self._tail == self._head:
+                    raise Empty
+            elif timeout is None:
+                while self._tail == self._head and not self.closed:
+                    self._not_empty.wait()
+            else:
+                deadline = time.monotonic() + timeout
+                while self._tail == self._head and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._not_empty.wait(remaining)
+            if self._tail == self._head:
+                raise Empty
+            return self._pop()
+
+    def get_nowait(self):
+        return self.get(block=False)
+
+    def get_batch(self, max_items, max_wait, timeout=None):
+        """Block for the first event, then gather more for up to max_wait seconds
+
+        Returns as soon as ``max_items`` events are collected or ``max_wait``
+        seconds have passed since the first one arrived, so bursts produce
+        large batches and quiet periods produce single-event batches. Raises
+        queue.Empty if nothing arrives within ``timeout``.
+        """
+        with self._lock:
+            if timeout is None:
+                while self._tail == self._head and not self.closed:
+                    self._not_empty.wait()
+            else:
+                deadline = time.monotonic() + timeout
+                while self._tail == self._head and not self.closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._not_empty.wait(remaining)
+            if self._tail == self._head:
+                raise Empty
+
+            batch = []
+            deadline = time.monotonic() + max_wait
+            while True:
+                while self._tail != self._head and len(batch) < max_items:
+                    batch.append(self._pop())
+                if len(batch) >= max_items or self.closed:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._not_empty.wait(remaining)
+            return batch
+
+    def close(self):
+        """Stop accepting events and wake up any waiting publisher or consumer"""
+        with self._lock:
+            self.closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+
+    def stats(self):
+        return {
+            'policy': self.policy,
+            'capacity': self.capacity,
+            'lag': self.lag,
+            'received': self.received,
+            'consumed': self.consumed,
+            'dropped': self.dropped
+        }
+
+
+class EventBus:
+    """Publish/subscribe fan-out where every subscriber sees every event
+
+    Events are published once and the same object is placed in each
+    subscriber's ring, so consumers must treat events as read-only. With a
+    ``history`` store, every event is appended to it before delivery and
+    subscribers receive the stored object.
+    """
+
+    def __init__(self, capacity=10000, policy='drop_oldest', sample_rate=10, history=None):
+        self.history = history
+        self.defaults = {
+            'capacity': capacity,
+            'policy': policy,
+            'sample_rate': sample_rate
+        }
+        self._subscribers = ()
+        self._lock = threading.Lock()
+        self._published = itertools.count(1)
+        self.published = 0
+
+    def subscribe(self, name, capacity=None, policy=None, sample_rate=None):
+        """Register a consumer and return its Subscription
+
+        Names are made unique by appending ``-N`` when already taken.
+        """
+        with self._lock:
+            taken = {sub.name for sub in self._subscribers}
+            unique = name
+            suffix = 1
+            while unique in taken:
+                unique = f"{name}-{suffix}"
+                suffix += 1
+            subscription = Subscription(
+                unique,
+                capacity=capacity or self.defaults['capacity'],
+                policy=policy or self.defaults['policy'],
+                sample_rate=sample_rate or self.defaults['sample_rate']
+            )
+            self._subscribers = self._subscribers + (subscription,)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers = tuple(s for s in self._subscribers if s is not subscription)
+        subscription.close()
+
+    def publish(self, event):
+        """Deliver an event to every current subscriber"""
+        self.published = next(self._published)
+        if self.history is not None:
+            event = self.history.append(event)
+        for subscription in self._subscribers:
+            subscription.offer(event)
+
+    # Queue-style alias so producers written against queue.Queue keep working
+    put = publish
+
+    def stats(self):
+        """Per-subscriber lag, drop and throughput counters"""
+        return {sub.name: sub.stats() for sub in self._subscribers}
@@ -0,0 +1,195 @@
+import json
+import marshal
+import re
+import sys
+import time
+import zlib
+from array import array
+from collections.abc import Mapping
+from datetime import datetime
+
+from .windows import to_epoch
+
+_IPV4 = re.compile(r'\b(?:\d{1,3}\.){3}\d{1,3}\b')
+# "user bob", "user=bob", "for bob", "for user bob", "for invalid user bob"
+_USER = re.compile(r'\b(?:user(?:name)?|for(?: (?:invalid|illegal))?(?: user)?)[=: ]+([\w.@-]+)', re.IGNORECASE)
+
+
+class Event(Mapping):
+    """Compact log event with an epoch-float timestamp
+
+    Stores what a collector produces in eight slots instead of a dict with
+    string keys: ``ts`` is epoch seconds, ``source`` and ``severity`` are
+    interned so every event shares one string object per value. The
+    read-only Mapping interface (``event['content']``, ``event.get(...)``,
+    ``'template_id' in event``) lets code written for dict events keep
+    working; ``event['timestamp']`` formats the ISO string on demand.
+    Parsed fields without a slot of their own live in ``attrs``.
+    """
+
+    __slots__ = ('ts', 'source', 'severity', 'content', 'file',
+                 'template_id', 'template_params', 'attrs')
+
+    # Keys backed by a slot; None means the key is absent
+    _SLOT_KEYS = ('source', 'severity', 'content', 'file', 'template_id', 'template_params')
+
+    def __init__(self, ts, source, content, severity='INFO', file=None,
+                 template_id=None, template_params=None, attrs=None):
+        self.ts = ts
+        self.source = sys.intern(source)
+        self.severity = sys.intern(severity)
+        self.content = content
+        self.file = file
+        self.template_id = template_id
+        self.template_params = template_params
+        self.attrs = attrs
+
+    @classmethod
+    def from_dict(cls, data, ts=None):
+        """Build an Event from a dict event, parsing its ISO timestamp once"""
+        if ts is None:
+            ts = to_epoch(data['timestamp']) if 'timestamp' in data else time.time()
+        attrs = {
+            key: value for key, value in data.items()
+            if key != 'timestamp' and key not in cls._SLOT_KEYS
+        }
+        return cls(
+            ts, data.get('source', ''), data.get('content', ''),
+            data.get('severity') or 'INFO', data.get('file'),
+            data.get('template_id'), data.get('template_params'), attrs or None
+        )
+
+    @property
+    def timestamp(self):
+        return datetime.fromtimestamp(self.ts).isoformat()
+
+    def __getitem__(self, key):
+        if key == 'timestamp':
+            return self.timestamp
+        if key in self._SLOT_KEYS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.attrs and key in self.attrs:
+            return self.attrs[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        if key == 'timestamp':
+            return True
+        if key in self._SLOT_KEYS:
+            return getattr(self, key) is not None
+        return bool(self.attrs) and key in self.attrs
+
+    def __iter__(self):
+        yield 'timestamp'
+        for key in self._SLOT_KEYS:
+            if getattr(self, key) is not None:
+                yield key
+        if self.attrs:
+            yield from self.attrs
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def __repr__(self):
+        return f"Event({self.to_dict()!r})"
+
+
+def as_event(event):
+    """Return event as an Event, converting dict events"""
+    return event if isinstance(event, Event) else Event.from_dict(event)
+
+
+def event_time(event):
+    """Epoch seconds of an Event or a dict event with an ISO 'timestamp'"""
+    ts = getattr(event, 'ts', None)
+    return ts if ts is not None else to_epoch(event['timestamp'])
+
+
+def json_default(obj):
+    """``default`` hook for json.dumps of alerts that embed events"""
+    if isinstance(obj, Event):
+        return obj.to_dict()
+    return str(obj)
+
+
+def pack_events(events):
+    """Compress Events into one bytes blob, column by column
+
+    marshal only handles builtin types, so a blob can be loaded without
+    running code, and it keeps shared objects (interned sources, attrs
+    dicts shared by many events) shared. Values marshal cannot store are
+    converted as for JSON output.
+    """
+    columns = [
+        array('d', [event.ts for event in events]).tobytes(),
+        [event.source for event in events],
+        [event.severity for event in events],
+        [event.content for event in events],
+        [event.file for event in events],
+        [event.template_id for event in events],
+        [event.template_params for event in events],
+        [event.attrs for event in events]
+    ]
+    try:
+        data = marshal.dumps(columns)
+    except ValueError:
+        columns[6:] = json.loads(json.dumps(columns[6:], default=json_default))
+        data = marshal.dumps(columns)
+    return zlib.compress(data, 1)
+
+
+def unpack_events(data):
+    """Events from a pack_events blob"""
+    times, sources, severities, contents, files, template_ids, params, attrs = marshal.loads(zlib.decompress(data))
+    ts = array('d')
+    ts.frombytes(times)
+    return list(map(Event, ts, sources, contents, severities, files, template_ids, params, attrs))
+
+
+def event_host(event):
+    """Host or IP an event concerns, or None"""
+    host = event.get('host') or event.get('ip')
+    # Events from LineParser (with a 'format') already carry any IP found
+    if host is None and 'format' not in event:
+        match = _IPV4.search(event.get('content', ''))
+        host = match.group(0) if match else None
+    return host or None
+
+
+def event_user(event):
+    """User an event concerns, or None"""
+    user = event.get('user')
+    if user is None and 'format' not in event:
+        match = _USER.search(event.get('content', ''))
+        user = match.group(1) if match else None
+    return user or None
+
+
+def _host_key(event):
+    return event_host(event) or event.get('source')
+
+
+def _user_key(event):
+    return event_user(event) or event.get('source')
+
+
+# Which entity an event concerns, used to partition work and to correlate
+# alerts. 'host' and 'user' use the IP and user extracted at ingest; other
+# events fall back to the first IPv4 address / "user X" in the content.
+# Both fall back to the source
+ENTITY_KEYS = {
+    'source': lambda event: event.get('source'),
+    'host': _host_key,
+    'user': _user_key
+}
@@ -0,0 +1,295 @@
+import sys
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from operator import attrgetter
+
+from .events import as_event, pack_events, unpack_events
+
+# Rough per-event cost besides the content string: the Event itself, its
+# float timestamp and the references held by the segment indexes
+EVENT_OVERHEAD = 160
+
+
+def _bounds(segments):
+    """Running max of max_ts and suffix min of min_ts, both sorted for bisect"""
+    max_prefix = []
+    running = float('-inf')
+    for seg in segments:
+        running = max(running, seg.max_ts)
+        max_prefix.append(running)
+    min_suffix = []
+    running = float('inf')
+    for seg in reversed(segments):
+        running = min(running, seg.min_ts)
+        min_suffix.append(running)
+    min_suffix.reverse()
+    return tuple(max_prefix), tuple(min_suffix)
+
+
+class _Segment:
+    """Immutable block of events sorted by timestamp, indexed by source
+
+    A segment restored from a checkpoint holds only its timestamps and the
+    packed events until a query first reaches it.
+    """
+
+    __slots__ = ('events', 'times', 'sources', 'min_ts', 'max_ts', 'nbytes', 'count', 'packed')
+
+    def __init__(self, events):
+        events.sort(key=attrgetter('ts'))
+        self.times = array('d', [event.ts for event in events])
+        self.min_ts = self.times[0]
+        self.max_ts = self.times[-1]
+        self.count = len(events)
+        self.packed = None
+        self._index(events)
+        # Parsed fields are per-event dicts, except the ones shared by events with none
+        attrs = {id(event.attrs): event.attrs for event in events if event.attrs}
+        self.nbytes = (sum(sys.getsizeof(event.content) for event in events) + EVENT_OVERHEAD * len(events)
+                       + sum(sys.getsizeof(fields) for fields in attrs.values()))
+
+    def _index(self, events):
+        positions = defaultdict(list)
+        for i, event in enumerate(events):
+            positions[event.source].append(i)
+        # Sources before events: a segment with events is always fully indexed
+        self.sources = {
+            source: (array('d', [self.times[i] for i in index]), [events[i] for i in index])
+            for source, index in positions.items()
+        }
+        self.events = events
+
+    @classmethod
+    def restored(cls, times, nbytes, packed):
+        segment = cls.__new__(cls)
+        segment.times = array('d')
+        segment.times.frombytes(times)
+        segment.min_ts = segment.times[0]
+        segment.max_ts = segment.times[-1]
+        segment.count = len(segment.times)
+        segment.nbytes = nbytes
+        segment.packed = packed
+        segment.sources = segment.events = None
+        return segment
+
+    def load(self):
+        """The segment with its events unpacked"""
+        if self.events is None:
+            self._index(unpack_events(self.packed))
+        return self
+
+    def pack(self):
+        """The segment's events as a pack_events blob, kept for later checkpoints"""
+        if self.packed is None:
+            self.packed = pack_events(self.events)
+        return self.packed
+
+    def select(self, start, end, source):
+        if self.events is None:
+            self.load()
+        if source is None:
+            times, events = self.times, self.events
+        elif source in self.sources:
+            times, events = self.sources[source]
+        else:
+            return []
+        i = 0 if start is None else bisect_left(times, start)
+        j = len(times) if end is None else bisect_left(times, end)
+        return events[i:j]
+
+
+class EventHistoryStore:
+    """Shared, time-indexed event history with time and memory retention
+
+    Appends go to a small active list under a lock held only for the
+    append. Every ``segment_size`` events the list is sealed, outside the
+    lock, into an immutable segment sorted by timestamp with a per-source
+    index. Range queries bisect to the first segment that can hold
+    ``start`` and past the last one that can hold anything before ``end``,
+    then bisect inside each segment, so they cost O(log n) plus the size
+    of the result. Whole segments are dropped once they are
+    older than ``retention`` seconds (measured from the newest event, so
+    replayed logs age by their own clock) or the sealed total exceeds
+    ``max_bytes``.
+    """
+
+    def __init__(self, retention=1800, max_bytes=256 * 1024 * 1024, segment_size=4096):
+        self.retention = retention
+        self.max_bytes = max_bytes
+        self.segment_size = segment_size
+        self._lock = threading.Lock()
+        self._seal_lock = threading.Lock()
+        self._active = []
+        self._pending = ()  # swapped-out lists still being sealed
+        self._segments = ()
+        self._max_prefix = ()  # running max of segment max_ts, for bisect
+        self._min_suffix = ()  # min of min_ts over each segment and those after it
+        self.newest = None  # largest timestamp appended so far
+        self.sealed_bytes = 0
+        self.expired = 0
+
+    def append(self, event):
+        """Add an event (dicts are converted) and return the stored Event"""
+        event = as_event(event)
+        with self._lock:
+            self._active.append(event)
+            if self.newest is None or event.ts > self.newest:
+                self.newest = event.ts
+            if len(self._active) < self.segment_size:
+                return event
+            full = self._swap_active()
+        self._seal(full)
+        return event
+
+    def extend(self, events):
+        """Append a batch with a single lock acquisition; returns the stored Events"""
+        events = [as_event(event) for event in events]
+        if not events:
+            return events
+        newest = max(event.ts for event in events)
+        with self._lock:
+            self._active.extend(events)
+            if self.newest is None or newest > self.newest:
+                self.newest = newest
+            full = self._swap_active() if len(self._active) >= self.segment_size else None
+        if full:
+            self._seal(full)
+        return events
+
+    def _swap_active(self):
+        full, self._active = self._active, []
+        self._pending = self._pending + (full,)
+        return full
+
+    def _seal(self, events):
+        segment = _Segment(list(events))
+        with self._seal_lock:
+            segments = self._segments + (segment,)
+            sealed_bytes = self.sealed_bytes + segment.nbytes
+            newest = max(segment.max_ts, self._max_prefix[-1]) if self._max_prefix else segment.max_ts
+            drop = 0
+            while drop < len(segments) - 1 and (
+                segments[drop].max_ts < newest - self.retention or sealed_bytes > self.max_bytes
+            ):
+                sealed_bytes -= segments[drop].nbytes
+                self.expired += segments[drop].count
+                drop += 1
+            segments = segments[drop:]
+            max_prefix, min_suffix = _bounds(segments)
+            with self._lock:
+                self._segments = segments
+                self._max_prefix = max_prefix
+                self._min_suffix = min_suffix
+                self._pending = tuple(p for p in self._pending if p is not events)
+                self.sealed_bytes = sealed_bytes
+
+    def _snapshot(self):
+        with self._lock:
+            return self._segments, self._max_prefix, self._min_suffix, self._pending, list(self._active)
+
+    def range(self, start=None, end=None, source=None):
+        """Events with start <= ts < end, optionally from one source, oldest first"""
+        segments, max_prefix, min_suffix, pending, active = self._snapshot()
+        first = 0 if start is None else bisect_left(max_prefix, start)
+        last = len(segments) if end is None else bisect_left(min_suffix, end)
+        result = []
+        ordered = True
+        newest = float('-inf')
+        for segment in segments[first:last]:
+            # A late segment can start after end and still precede one that does not
+            if end is not None and segment.min_ts >= end:
+                continue
+            selected = segment.select(start, end, source)
+            if selected:
+                ordered = ordered and selected[0].ts >= newest
+                newest = selected[-1].ts
+                result.extend(selected)
+        recent = [
+            event for events in pending + (active,) for event in events
+            if (start is None or event.ts >= start)
+            and (end is None or event.ts < end)
+            and (source is None or event.source == source)
+        ]
+        recent.sort(key=attrgetter('ts'))
+        if recent:
+            ordered = ordered and recent[0].ts >= newest
+            result.extend(recent)
+        if not ordered:
+            # Late events sealed into a later segment
+            result.sort(key=attrgetter('ts'))
+        return result
+
+    def window(self, seconds, now=None, source=None):
+        """Events from the trailing ``seconds`` before ``now`` (default: the newest event)"""
+        if now is None:
+            now = self.newest if self.newest is not None else time.time()
+        return self.range(now - seconds, None, source)
+
+    def latest(self, count, source=None):
+        """The ``count`` most recently appended events, oldest first"""
+        segments, _, _, pending, active = self._snapshot()
+
+        def newest_first():
+            for events in reversed(pending + (active,)):
+                yield events if source is None else [e for e in events if e.source == source]
+            # Lazily, so restored segments that are not needed stay packed
+            for seg in reversed(segments):
+                seg.load()
+                yield seg.events if source is None else seg.sources.get(source, (None, []))[1]
+
+        chunks = []
+        needed = count
+        for events in newest_first():
+            if needed <= 0:
+                break
+            chunk = events[max(0, len(events) - needed):]
+            chunks.append(chunk)
+            needed -= len(chunk)
+        return [event for chunk in reversed(chunks) for event in chunk]
+
+    def __len__(self):
+        segments, _, _, pending, active = self._snapshot()
+        return (sum(seg.count for seg in segments)
+                + sum(len(events) for events in pending) + len(active))
+
+    def snapshot(self):
+        """Checkpoint state: packed sealed segments and the events not yet sealed"""
+        segments, _, _, pending, active = self._snapshot()
+        return {
+            'segments': [(seg.times.tobytes(), seg.nbytes, seg.pack()) for seg in segments],
+            'recent': pack_events([event for events in pending + (active,) for event in events]),
+            'expired': self.expired
+        }
+
+    def restore(self, state):
+        """Put checkpointed events back ahead of anything appended since
+
+        Restored segments are unpacked when a query first reaches them.
+        """
+        restored = tuple(_Segment.restored(*item) for item in state['segments'])
+        with self._seal_lock:
+            segments = restored + self._segments
+            max_prefix, min_suffix = _bounds(segments)
+            with self._lock:
+                self._segments = segments
+                self._max_prefix = max_prefix
+                self._min_suffix = min_suffix
+                self.sealed_bytes += sum(seg.nbytes for seg in restored)
+                self.expired += state.get('expired', 0)
+                if segments and (self.newest is None or max_prefix[-1] > self.newest):
+                    self.newest = max_prefix[-1]
+        self.extend(unpack_events(state['recent']))
+
+    def stats(self):
+        segments, max_prefix, _, _, _ = self._snapshot()
+        return {
+            'events': len(self),
+            'segments': len(segments),
+            'sealed_bytes': self.sealed_bytes,
+            'oldest': min(seg.min_ts for seg in segments) if segments else None,
+            'newest': max_prefix[-1] if segments else None,
+            'expired': self.expired
+        }
@@ -0,0 +1,100 @@
+import os
+
+import numpy as np
+
+ACTIVATIONS = ('linear', 'relu', 'sigmoid')
+
+
+class DenseNetwork:
+    """Pure NumPy forward pass for a stack of Dense layers
+
+    Scores the same network as the Keras model in AIDetectionEngine with
+    dropout disabled, without TensorFlow's per-call overhead. Weights are
+    exported from a trained Keras model and can be saved to an ``.npz``
+    file, so scoring-only deployments never import TensorFlow. An exported
+    network carries the mean and scale of the StandardScaler it was trained
+    behind and standardizes raw features itself, so it scores correctly in
+    a process that fitted a different scaler.
+    """
+
+    def __init__(self, layers, input_mean=None, input_scale=None):
+        # layers: list of (kernel, bias, activation) tuples
+        self.input_mean = None if input_mean is None else np.asarray(input_mean, dtype=np.float32)
+        self.input_scale = None if input_scale is None else np.asarray(input_scale, dtype=np.float32)
+        self.layers = []
+        for kernel, bias, activation in layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation: {activation}")
+            self.layers.append((
+                np.ascontiguousarray(kernel, dtype=np.float32),
+                np.asarray(bias, dtype=np.float32),
+                activation
+            ))
+
+    @property
+    def standardizes(self):
+        """Whether predict expects raw features rather than scaled ones"""
+        return self.input_mean is not None
+
+    @classmethod
+    def from_keras(cls, model, scaler=None):
+        """Copy the Dense layer weights out of a Keras model, skipping Dropout
+
+        With the fitted StandardScaler the model was trained behind, the
+        network standardizes its input itself.
+        """
+        layers = []
+        for layer in model.layers:
+            weights = layer.get_weights()
+            if len(weights) != 2:
+                continue
+            activation = layer.get_config().get('activation', 'linear')
+            layers.append((weights[0], weights[1], activation))
+        if scaler is None:
+            return cls(layers)
+        return cls(layers, scaler.mean_, scaler.scale_)
+
+    def predict(self, features):
+        """Return an (n, 1) float32 array, like ``model.predict``"""
+        x = np.asarray(features, dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        if self.input_mean is not None:
+            x = (x - self.input_mean) / self.input_scale
+        for kernel, bias, activation in self.layers:
+            x = x @ kernel
+            x += bias
+            if activation == 'relu':
+                np.maximum(x, 0, out=x)
+            elif activation == 'sigmoid':
+                np.clip(x, -88.0, 88.0, out=x)
+                np.negative(x, out=x)
+                np.exp(x, out=x)
+                x += 1.0
+                np.reciprocal(x, out=x)
+        return x
+
+    def save(self, path):
+        """Atomically write the weights to an .npz file"""
+        arrays = {}
+        for i, (kernel, bias, activation) in enumerate(self.layers):
+            arrays[f'kernel_{i}'] = kernel
+            arrays[f'bias_{i}'] = bias
+        arrays['activations'] = np.array([a for _, _, a in self.layers])
+        if self.input_mean is not None:
+            arrays['input_mean'] = self.input_mean
+            arrays['input_scale'] = self.input_scale
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            activations = [str(a) for a in data['activations']]
+            scaled = 'input_mean' in data.files
+            return cls([
+                (data[f'kernel_{i}'], data[f'bias_{i}'], activation)
+                for i, activation in enumerate(activations)
+            ], data['input_mean'] if scaled else None, data['input_scale'] if scaled else None)
@@ -0,0 +1,321 @@
+import http.server
+import logging
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter as _Tally
+
+# Latency buckets in seconds, from 50us to 1 minute
+DEFAULT_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0, 300.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+METRIC_HELP = {
+    'siem_events_collected_total': "Events published by each log collector",
+    'siem_collect_seconds': "Time spent reading and publishing new lines per log file pass",
+    'siem_stage_seconds': "Time spent per detection stage (per sampled event for the analyzer, per batch for the AI engine)",
+    'siem_events_processed_total': "Events processed by each detection engine",
+    'siem_alerts_total': "Alerts and anomalies raised by each detection engine",
+    'siem_signature_matches_total': "Signature matches by signature name",
+    'siem_batch_size': "Events per AI engine batch",
+    'siem_event_lag_seconds': "Delay between an event's timestamp and finishing its detection, for sampled events",
+    'siem_queue_depth': "Events waiting in each event bus subscription",
+    'siem_queue_dropped_total': "Events dropped by each event bus subscription",
+    'siem_history_events': "Events held in the shared event history",
+    'siem_alert_queue_depth': "Alerts waiting for the alert writer",
+    'siem_alerts_dropped_total': "Alerts dropped because the alert queue was full",
+}
+
+
+class Counter:
+    """Monotonic count, or the value of ``fn`` when given"""
+
+    kind = 'counter'
+    __slots__ = ('value', 'fn', '_lock')
+
+    def __init__(self, fn=None):
+        self.value = 0
+        self.fn = fn
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def get(self):
+        return self.fn() if self.fn is not None else self.value
+
+
+class Gauge(Counter):
+    """Value that goes up and down, or the value of ``fn`` when given"""
+
+    kind = 'gauge'
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``observe`` is one bisect and three adds"""
+
+    kind = 'histogram'
+    __slots__ = ('bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)  # last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _NullMetric:
+    """Stand-in handed out by a disabled registry"""
+
+    __slots__ = ()
+    value = 0
+    sum = 0.0
+    count = 0
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+    def get(self):
+        return 0
+
+
+_NULL = _NullMetric()
+
+
+class MetricsRegistry:
+    """Named metric families with labelled children, rendered as Prometheus text
+
+    Components look their metrics up once and keep the objects, so the hot
+    path is an attribute update under the metric's own uncontended lock.
+    Several threads can write one metric (a collector's watchdog and poll
+    threads, engines sharing a counter), and ``+=`` on an attribute is not
+    atomic, so without the lock increments would be lost. Readers take no
+    lock and may see a slightly stale value. A disabled registry hands out
+    no-op metrics.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._families = {}  # name -> (kind, help, {label items: metric})
+        self._lock = threading.Lock()
+
+    def _child(self, cls, name, help, labels, make):
+        if not self.enabled:
+            return _NULL
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = (cls.kind, help or METRIC_HELP.get(name, ''), {})
+            elif family[0] != cls.kind:
+                raise ValueError(f"Metric {name} is already registered as a {family[0]}")
+            metric = family[2].get(key)
+            if metric is None:
+                metric = family[2][key] = make()
+            return metric
+
+    def counter(self, name, help=None, fn=None, **labels):
+        return self._child(Counter, name, help, labels, lambda: Counter(fn))
+
+    def gauge(self, name, help=None, fn=None, **labels):
+        return self._child(Gauge, name, help, labels, lambda: Gauge(fn))
+
+    def histogram(self, name, help=None, buckets=DEFAULT_BUCKETS, **labels):
+        return self._child(Histogram, name, help, labels, lambda: Histogram(buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            families = [(name, kind, help, list(children.items()))
+                        for name, (kind, help, children) in sorted(self._families.items())]
+        lines = []
+        for name, kind, help, children in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in children:
+                if kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.bounds + ('+Inf',), list(metric.counts)):
+                        cumulative += count
+                        le = bound if bound == '+Inf' else _number(bound)
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(labels)} {_number(metric.sum)}")
+                    lines.append(f"{name}_count{_labels(labels)} {metric.count}")
+                else:
+                    try:
+                        value = metric.get()
+                    except Exception:
+                        continue
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(items):
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in items) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Process-wide registry used unless a component is given its own
+REGISTRY = MetricsRegistry()
+
+
+class MetricsServer:
+    """Serves a registry as Prometheus text on ``/metrics`` from a daemon thread"""
+
+    def __init__(self, registry=REGISTRY, host='127.0.0.1', port=9108):
+        self.logger = logging.getLogger(__name__)
+        registry_ref = registry
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name='metrics-server')
+        self.thread.daemon = True
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        self.thread.start()
+        self.logger.info(f"Serving metrics on {self.address}")
+        return self
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StackSampler:
+    """Statistical profiler writing folded stacks for flame graphs
+
+    Every ``interval`` seconds the current Python stack of each thread is
+    captured with ``sys._current_frames`` and counted as one line of
+    ``thread;outer (file:line);...;inner (file:line)``. The counts are
+    written to ``path`` in the folded format read by flamegraph.pl,
+    speedscope and inferno, every ``flush_interval`` seconds and on stop.
+    Unlike cProfile nothing is traced between samples, so the cost is
+    bounded by the sampling rate and covers every thread.
+    """
+
+    def __init__(self, path=os.path.join('state', 'profile.folded'), interval=0.01, flush_interval=30):
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.stacks = _Tally()
+        self.samples = 0
+        self._labels = {}  # code object -> frame label
+        self._stop = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='stack-sampler')
+        self.thread.daemon = True
+
+    def start(self):
+        self.thread.start()
+        self.logger.info(f"Sampling stacks every {self.interval * 1000:.0f}ms into {self.path}")
+        return self
+
+    def sample(self):
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                label = self._labels.get(code)
+                if label is None:
+                    label = self._labels[code] = (
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                    )
+                stack.append(label)
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)).replace(' ', '_'))
+            stack.reverse()
+            self.stacks[';'.join(stack)] += 1
+        self.samples += 1
+
+    def run(self):
+        last_flush = time.monotonic()
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                self.logger.error(f"Error sampling stacks: {str(e)}")
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self.write()
+                last_flush = time.monotonic()
+
+    def write(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, 'w') as f:
+                for stack, count in self.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.logger.error(f"Error writing profile {self.path}: {str(e)}")
+
+    def stop(self):
+        self._stop.set()
+        self.thread.join(timeout=5)
+        self.write()
@@ -0,0 +1,254 @@
+import hashlib
+import operator
+import re
+import time
+from array import array
+from collections import deque
+from functools import lru_cache
+
+_MASKS = [
+    (re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b'), '<ip>'),
+    (re.compile(r'\b0x[0-9a-f]+\b'), '<hex>'),
+    (re.compile(r'\b[0-9a-f]{12,}\b'), '<hex>'),
+    (re.compile(r'\d+'), '<num>'),
+]
+
+
+def word_shingles(text):
+    """Lowercased whitespace tokens"""
+    return set(text.lower().split())
+
+
+def masked_shingles(text):
+    """Word tokens with IPs, hex ids and numbers replaced by placeholders"""
+    text = text.lower()
+    for regex, placeholder in _MASKS:
+        text = regex.sub(placeholder, text)
+    return set(text.split())
+
+
+SHINGLERS = {
+    'words': word_shingles,
+    'masked': masked_shingles
+}
+
+
+@lru_cache(maxsize=65536)
+def _shingle_hashes(shingle, num_perm):
+    # One extendable-output digest yields num_perm independent 32-bit hashes
+    return array('I', hashlib.shake_128(shingle.encode('utf-8')).digest(4 * num_perm))
+
+
+class MinHasher:
+    """Compute MinHash signatures over a set of string shingles"""
+
+    def __init__(self, num_perm=128):
+        self.num_perm = num_perm
+
+    def signature(self, shingles):
+        """Return the signature tuple, or None for an empty shingle set"""
+        if not shingles:
+            return None
+        num_perm = self.num_perm
+        columns = [_shingle_hashes(s, num_perm) for s in shingles]
+        if len(columns) == 1:
+            return tuple(columns[0])
+        return tuple(map(min, *columns))
+
+    @staticmethod
+    def similarity(sig1, sig2):
+        """Estimated Jaccard similarity: the fraction of equal positions"""
+        return sum(map(operator.eq, sig1, sig2)) / len(sig1)
+
+
+class LSHIndex:
+    """Banded LSH over the token sets of events inside a time window
+
+    Identical token sets share one entry with a count. When a new set is
+    inserted, LSH buckets over its MinHash signature yield candidates which
+    are verified with exact Jaccard similarity; the survivors are kept as a
+    neighbour set, so a repeated line costs a sum over its neighbours rather
+    than a fresh lookup. Entries expire in insertion order once older than
+    ``window`` seconds.
+    """
+
+    def __init__(self, window, bands, rows, threshold, hasher):
+        self.window = window
+        self.bands = bands
+        self.rows = rows
+        self.threshold = threshold
+        self.hasher = hasher
+        self._counts = {}
+        self._neighbours = {}
+        self._signatures = {}
+        self._buckets = [{} for _ in range(bands)]
+        self._arrivals = deque()
+
+    def _band_keys(self, packed):
+        # Slices of the packed signature: they hash as fast as tuples and
+        # checkpoint as flat bytes rather than as tuples of ints
+        width = 4 * self.rows
+        return [packed[start:start + width] for start in range(0, len(packed), width)]
+
+    def _build_buckets(self):
+        """Rebuild the band buckets from the signatures after a restore"""
+        self._buckets = [{} for _ in range(self.bands)]
+        for shingles, packed in self._signatures.items():
+            for buckets, key in zip(self._buckets, self._band_keys(packed)):
+                bucket = buckets.get(key)
+                if bucket is None:
+                    buckets[key] = {shingles}
+                else:
+                    bucket.add(shingles)
+
+    def add(self, shingles, timestamp):
+        """Index a frozenset of shingles observed at timestamp"""
+        if shingles in self._counts:
+            self._counts[shingles] += 1
+        else:
+            if self._buckets is None:
+                self._build_buckets()
+            self._counts[shingles] = 1
+            packed = array('I', self.hasher.signature(shingles)).tobytes()
+            self._signatures[shingles] = packed
+            candidates = set()
+            for buckets, key in zip(self._buckets, self._band_keys(packed)):
+                bucket = buckets.setdefault(key, set())
+                candidates.update(bucket)
+                bucket.add(shingles)
+            neighbours = set()
+            size = len(shingles)
+            threshold = self.threshold
+            for candidate in candidates:
+                common = len(shingles & candidate)
+                if common / (size + len(candidate) - common) > threshold:
+                    neighbours.add(candidate)
+            for neighbour in neighbours:
+                self._neighbours[neighbour].add(shingles)
+            self._neighbours[shingles] = neighbours
+        self._arrivals.append((timestamp, shingles))
+
+    def expire(self, now):
+        cutoff = now - self.window
+        arrivals = self._arrivals
+        while arrivals and arrivals[0][0] <= cutoff:
+            _, shingles = arrivals.popleft()
+            remaining = self._counts[shingles] - 1
+            if remaining:
+                self._counts[shingles] = remaining
+                continue
+            del self._counts[shingles]
+            for neighbour in self._neighbours.pop(shingles):
+                self._neighbours[neighbour].discard(shingles)
+            packed = self._signatures.pop(shingles)
+            if self._buckets is None:
+                continue
+            for buckets, key in zip(self._buckets, self._band_keys(packed)):
+                bucket = buckets[key]
+                bucket.discard(shingles)
+                if not bucket:
+                    del buckets[key]
+
+    def snapshot(self):
+        """Entries as token tuples with their count, signature and neighbours' ids
+
+        No sets: marshal sorts the elements of every set it writes, which
+        would make a checkpoint of a busy window take seconds.
+        """
+        entries = list(self._counts)
+        ids = {shingles: i for i, shingles in enumerate(entries)}
+        return (
+            [tuple(shingles) for shingles in entries],
+            [self._counts[shingles] for shingles in entries],
+            b''.join([self._signatures[shingles] for shingles in entries]),
+            [[ids[neighbour] for neighbour in self._neighbours[shingles]] for shingles in entries],
+            array('d', [timestamp for timestamp, _ in self._arrivals]).tobytes(),
+            array('I', [ids[shingles] for _, shingles in self._arrivals]).tobytes()
+        )
+
+    def restore(self, state):
+        tokens, counts, signatures, neighbours, times, arrival_ids = state
+        entries = [frozenset(entry) for entry in tokens]
+        width = 4 * self.bands * self.rows
+        self._counts = dict(zip(entries, counts))
+        self._signatures = {
+            shingles: signatures[i * width:(i + 1) * width] for i, shingles in enumerate(entries)
+        }
+        self._neighbours = {
+            shingles: {entries[i] for i in ids} for shingles, ids in zip(entries, neighbours)
+        }
+        # Buckets are neither stored nor rebuilt here: repeats and expiry only
+        # need counts and neighbours, and rebuilding every source's buckets
+        # was most of a restore. _build_buckets runs on the first new line
+        self._buckets = None
+        timestamps = array('d')
+        timestamps.frombytes(times)
+        positions = array('I')
+        positions.frombytes(arrival_ids)
+        self._arrivals = deque(zip(timestamps, map(entries.__getitem__, positions)))
+
+    def count_similar(self, shingles):
+        """Number of indexed events similar to an indexed token set, itself included"""
+        counts = self._counts
+        total = counts.get(shingles, 0)
+        for neighbour in self._neighbours.get(shingles, ()):
+            total += counts[neighbour]
+        return total
+
+    def __len__(self):
+        return len(self._arrivals)
+
+
+class NearDuplicateIndex:
+    """Per-source count of recent events similar to a new one
+
+    Answers "how many events in the last ``window`` seconds have Jaccard
+    similarity > ``threshold`` with this one" without scanning the window.
+    Candidates come from LSH and are verified exactly, so the count never
+    includes a dissimilar event. The only error is a similar event that
+    shares no band with the new one. For a pair with similarity J this
+    happens with probability (1 - J^rows)^bands. With the defaults (128
+    permutations, 32 bands of 4 rows) that is below 5e-8 for J > 0.8, so
+    the expected undercount is below 5e-8 times the true count.
+    """
+
+    def __init__(self, window=300, threshold=0.8, num_perm=128, bands=32,
+                 shingling='words'):
+        if bands * (num_perm // bands) != num_perm:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.window = window
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm)
+        self.shingler = SHINGLERS[shingling] if isinstance(shingling, str) else shingling
+        self.indexes = {}
+
+    def add_and_count(self, source, content, timestamp, now=None):
+        """Index an event and return how many events in its window resemble it
+
+        The count includes the event itself, matching a scan over a history
+        that already contains it. Events without tokens are not indexed.
+        """
+        if now is None:
+            now = time.time()
+        shingles = frozenset(self.shingler(content))
+        index = self.indexes.get(source)
+        if index is None:
+            index = self.indexes[source] = LSHIndex(
+                self.window, self.bands, self.rows, self.threshold, self.hasher)
+        index.expire(now)
+        if not shingles:
+            return 0
+        index.add(shingles, timestamp)
+        return index.count_similar(shingles)
+
+    def snapshot(self):
+        return {source: index.snapshot() for source, index in self.indexes.items()}
+
+    def restore(self, state):
+        self.indexes = {}
+        for source, index_state in state.items():
+            index = self.indexes[source] = LSHIndex(
+                self.window, self.bands, self.rows, self.threshold, self.hasher)
+            index.restore(index_state)
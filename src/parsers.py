@@ -0,0 +1,317 @@
+import json
+import re
+import time
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+
+from .events import _IPV4, _USER, Event
+from .signature_engine import fold_case
+
+# Level words as written in logs, mapped to collector severities
+LEVELS = {
+    'emerg': 'CRITICAL', 'emergency': 'CRITICAL', 'alert': 'CRITICAL', 'crit': 'CRITICAL',
+    'critical': 'CRITICAL', 'fatal': 'CRITICAL',
+    'err': 'ERROR', 'error': 'ERROR',
+    'warn': 'WARNING', 'warning': 'WARNING',
+    'notice': 'INFO', 'info': 'INFO', 'debug': 'INFO', 'trace': 'INFO'
+}
+# Syslog PRI severities 0-7
+SYSLOG_SEVERITIES = ('CRITICAL', 'CRITICAL', 'CRITICAL', 'ERROR', 'WARNING', 'INFO', 'INFO', 'INFO')
+# Words that set the severity of a line without a level of its own, strongest first
+SEVERITY_KEYWORDS = (
+    ('CRITICAL', ('critical', 'emergency', 'alert')),
+    ('ERROR', ('error', 'failure', 'failed')),
+    ('WARNING', ('warning', 'warn'))
+)
+MONTHS = {name: i + 1 for i, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'))}
+
+_LEVEL_WORDS = '|'.join(sorted(LEVELS, key=len, reverse=True))
+_ISO = r'\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:Z|[+-]\d{2}:?\d{2})?'
+
+# [2024-03-20 10:15:23] INFO: message, or the same without brackets
+_BRACKET = re.compile(
+    rf'\[?({_ISO})\]?\s+(?:((?i:{_LEVEL_WORDS}))\b:?\s*)?(.*)', re.DOTALL
+)
+# <34>1 2024-03-20T10:15:23.003Z host app 1234 ID47 [sd] message
+_RFC5424 = re.compile(
+    r'<(\d{1,3})>1 (\S+) (\S+) (\S+) (\S+) \S+ (-|(?:\[(?:[^\]\\]|\\.)*\])+) ?(.*)', re.DOTALL
+)
+# <34>Mar 20 10:15:23 host program[123]: message
+_RFC3164 = re.compile(
+    r'(?:<(\d{1,3})>)?([A-Z][a-z]{2}) +(\d{1,2}) (\d{2}):(\d{2}):(\d{2}) (\S+) ([^:\[\s]+)(?:\[(\d+)\])?: ?(.*)',
+    re.DOTALL
+)
+# 10.0.0.5 - alice [20/Mar/2024:10:15:23 +0000] "GET / HTTP/1.1" 404 512 "-" "curl/8.0"
+# sudo: bob : TTY=pts/0 ; PWD=/home/bob ; USER=root ; COMMAND=/bin/bash
+_SUDO_USER = re.compile(r'([\w.@-]+) : ')
+_NGINX = re.compile(
+    r'(\S+) \S+ (\S+) \[(\d{2})/([A-Z][a-z]{2})/(\d{4}):(\d{2}):(\d{2}):(\d{2}) ([+-]\d{4})\] '
+    r'("(?:[^"\\]|\\.)*" (\d{3}) .*)', re.DOTALL
+)
+
+_TIMEZONES = {}
+
+
+@lru_cache(maxsize=4096)
+def _hour_epoch(year, month, day, hour):
+    """Epoch of the start of a local-time hour; DST changes fall on hour boundaries"""
+    return datetime(year, month, day, hour).timestamp()
+
+
+def _local_epoch(year, month, day, hour, minute, second, microsecond=0):
+    return _hour_epoch(year, month, day, hour) + minute * 60 + second + microsecond / 1e6
+
+
+def _iso_epoch(text):
+    if text.endswith('Z'):
+        text = text[:-1] + '+00:00'
+    dt = datetime.fromisoformat(text.replace(',', '.'))
+    if dt.tzinfo is not None:
+        return dt.timestamp()
+    return _local_epoch(dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second, dt.microsecond)
+
+
+def _offset(text):
+    tz = _TIMEZONES.get(text)
+    if tz is None:
+        minutes = int(text[1:3]) * 60 + int(text[3:5])
+        tz = _TIMEZONES[text] = timezone(timedelta(minutes=-minutes if text[0] == '-' else minutes))
+    return tz
+
+
+def parse_bracket(line, year=None):
+    """Bracketed or bare ISO timestamp, optionally followed by a level word"""
+    match = _BRACKET.match(line)
+    if match is None:
+        return None
+    ts_text, level, message = match.groups()
+    try:
+        ts = _iso_epoch(ts_text)
+    except ValueError:
+        return None
+    if not level:
+        return ts, None, message, None
+    level = level.lower()
+    return ts, LEVELS[level], message, {'level': level}
+
+
+def _syslog_attrs(host, program, pid, message):
+    attrs = {'hostname': host, 'program': program}
+    if pid:
+        attrs['pid'] = pid
+    if program == 'sudo':
+        # The invoking user, not the target user in USER=root
+        match = _SUDO_USER.match(message)
+        if match:
+            attrs['user'] = match.group(1)
+    return attrs
+
+
+def parse_syslog(line, year=None):
+    """RFC 5424 or RFC 3164 syslog; the level comes from the PRI when present"""
+    match = _RFC5424.match(line)
+    if match is not None:
+        pri, ts_text, host, app, procid, _, message = match.groups()
+        try:
+            ts = _iso_epoch(ts_text) if ts_text != '-' else None
+        except ValueError:
+            ts = None
+        attrs = _syslog_attrs(host, app, procid if procid != '-' else None, message)
+        return ts, SYSLOG_SEVERITIES[int(pri) & 7], message, attrs
+    match = _RFC3164.match(line)
+    if match is None or match.group(2) not in MONTHS:
+        return None
+    pri, month, day, hour, minute, second, host, program, pid, message = match.groups()
+    fields = (MONTHS[month], int(day), int(hour), int(minute), int(second))
+    try:
+        if year is not None:
+            ts = _local_epoch(year, *fields)
+        else:
+            # No year in the line: assume the latest one that is not in the future
+            now = time.time()
+            this_year = time.localtime(now).tm_year
+            ts = _local_epoch(this_year, *fields)
+            if ts > now + 86400:
+                ts = _local_epoch(this_year - 1, *fields)
+    except ValueError:
+        return None
+    attrs = _syslog_attrs(host, program, pid, message)
+    return ts, SYSLOG_SEVERITIES[int(pri) & 7] if pri else None, message, attrs
+
+
+_JSON_TIME = ('timestamp', '@timestamp', 'time', 'ts')
+_JSON_LEVEL = ('level', 'severity', 'levelname', 'log.level')
+_JSON_MESSAGE = ('message', 'msg', 'log')
+_JSON_FIELDS = {
+    'hostname': ('host', 'hostname'),
+    'ip': ('ip', 'src_ip', 'client_ip', 'remote_addr', 'source_ip'),
+    'user': ('user', 'username', 'user_name'),
+    'dst_port': ('dst_port', 'dest_port', 'destination_port', 'dport')
+}
+
+
+def _first(record, keys):
+    for key in keys:
+        value = record.get(key)
+        if value is not None and value != '':
+            return value
+    return None
+
+
+def parse_json(line, year=None):
+    """One JSON object per line with common timestamp, level and message keys"""
+    if not line.startswith('{'):
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    ts = _first(record, _JSON_TIME)
+    try:
+        if isinstance(ts, (int, float)):
+            ts = ts / 1000.0 if ts > 1e11 else float(ts)  # epoch milliseconds
+        else:
+            ts = _iso_epoch(ts) if ts else None
+    except (TypeError, ValueError):
+        ts = None
+    level = _first(record, _JSON_LEVEL)
+    level = level.lower() if isinstance(level, str) and level.lower() in LEVELS else None
+    message = _first(record, _JSON_MESSAGE)
+    attrs = {'level': level} if level else {}
+    for field, keys in _JSON_FIELDS.items():
+        value = _first(record, keys)
+        if isinstance(value, str):
+            attrs[field] = value
+        elif isinstance(value, int) and not isinstance(value, bool):
+            attrs[field] = str(value)  # ports
+    return ts, LEVELS.get(level), message if isinstance(message, str) else line, attrs or None
+
+
+def parse_nginx(line, year=None):
+    """nginx/Apache combined access log; 5xx is an error and 4xx a warning"""
+    match = _NGINX.match(line)
+    if match is None or match.group(4) not in MONTHS:
+        return None
+    ip, user, day, month, year_text, hour, minute, second, offset, request, status = match.groups()
+    try:
+        ts = datetime(int(year_text), MONTHS[month], int(day), int(hour), int(minute), int(second),
+                      tzinfo=_offset(offset)).timestamp()
+    except ValueError:
+        return None
+    attrs = {'ip': ip, 'status': int(status)}
+    if user != '-':
+        attrs['user'] = user
+    level = 'ERROR' if status[0] == '5' else 'WARNING' if status[0] == '4' else 'INFO'
+    return ts, level, request, attrs
+
+
+# Format name -> parse(line, year) returning (ts, severity, message, attrs)
+# or None. Add an entry here to support another format.
+PARSERS = {
+    'json': parse_json,
+    'syslog': parse_syslog,
+    'nginx': parse_nginx,
+    'bracket': parse_bracket
+}
+
+# Shared attrs of events with nothing extracted beyond their format and level
+_FORMAT_ONLY = {}
+
+
+class LineParser:
+    """Turns raw log lines into Events, parsing each line once
+
+    Each line is case-folded once; the keyword filter, the severity words
+    and the checks that gate the IP and user regexes all test that one
+    folded copy. Lines without a keyword are dropped (when ``keywords`` is
+    given) before any parsing. Kept lines go to the format parsers, starting
+    with the one that matched the previous line. The parsed timestamp,
+    level, hostname, IP and user are stored on the Event
+    (``attrs['format']`` names the parser, 'plain' if none matched), so the
+    entity lookups downstream never rescan the content. The severity is the
+    line's own level, or the strongest severity word when it has none.
+
+    The content is the message without the timestamp, level word and
+    syslog header. The level word (lower-cased, ``attrs['level']``) and the
+    syslog program are kept so features.feature_text can put them back.
+
+    Not thread-safe: ``parse`` updates ``last`` and ``stats``. LogCollector
+    calls it under its per-collector lock.
+    """
+
+    def __init__(self, formats=None, keywords=None, year=None):
+        self.parsers = [(name, PARSERS[name]) for name in formats or PARSERS]
+        self.year = year
+        self.last = 0  # index of the parser that matched the previous line
+        self.stats = {'lines': 0, 'events': 0, 'unparsed': 0}
+        self.words = tuple(word.lower() for word in keywords) if keywords is not None else None
+
+    def matches(self, folded):
+        """Whether a case-folded line contains one of the keywords"""
+        if self.words is None:
+            return True
+        for word in self.words:
+            if word in folded:
+                return True
+        return False
+
+    def keyword_severity(self, folded):
+        """Severity implied by the words of a case-folded line"""
+        for severity, words in SEVERITY_KEYWORDS:
+            for word in words:
+                if word in folded:
+                    return severity
+        return 'INFO'
+
+    def parse(self, line, source, file=None, default_ts=None):
+        """Event for a line, or None if it has no keyword"""
+        self.stats['lines'] += 1
+        line = line.strip()
+        folded = fold_case(line)
+        if not self.matches(folded):
+            return None
+
+        parsers = self.parsers
+        name, parse = parsers[self.last]
+        parsed = parse(line, self.year)
+        if parsed is None:
+            for index, (name, parse) in enumerate(parsers):
+                if index != self.last:
+                    parsed = parse(line, self.year)
+                    if parsed is not None:
+                        self.last = index
+                        break
+        if parsed is None:
+            name = 'plain'
+            ts, severity, message, attrs = None, None, line, None
+            self.stats['unparsed'] += 1
+        else:
+            ts, severity, message, attrs = parsed
+
+        if attrs is None:
+            attrs = {}
+        # Cheap substring checks skip the regexes on most lines
+        if 'ip' not in attrs and message.count('.') >= 3:
+            match = _IPV4.search(message)
+            if match:
+                attrs['ip'] = match.group(0)
+        if 'user' not in attrs and ('user' in folded or 'for ' in folded):
+            match = _USER.search(message)
+            if match:
+                attrs['user'] = match.group(1)
+        if len(attrs) > 1 or attrs and 'level' not in attrs:
+            attrs['format'] = name
+        else:
+            key = (name, attrs.get('level'))
+            shared = _FORMAT_ONLY.get(key)
+            if shared is None:
+                shared = _FORMAT_ONLY[key] = dict(attrs, format=name)
+            attrs = shared
+
+        if ts is None:
+            ts = default_ts if default_ts is not None else time.time()
+        self.stats['events'] += 1
+        return Event(ts, source, message, severity or self.keyword_severity(folded), file=file, attrs=attrs)
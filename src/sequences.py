@@ -0,0 +1,198 @@
+import logging
+import re
+from collections import defaultdict
+from datetime import datetime
+
+import yaml
+
+from .events import ENTITY_KEYS, event_time
+from .signature_engine import SignatureMatcher
+
+
+class SequenceRule:
+    """Ordered steps that must occur for one entity with bounded gaps"""
+
+    __slots__ = ('name', 'steps', 'patterns', 'key', 'max_gap', 'severity', 'description')
+
+    def __init__(self, name, steps, key='host', max_gap=300, severity='HIGH', description=None):
+        if len(steps) < 2:
+            raise ValueError(f"Sequence rule {name!r} needs at least two steps")
+        if key not in ENTITY_KEYS:
+            raise ValueError(f"Sequence rule {name!r} has unknown key {key!r}")
+        self.name = name
+        self.steps = [step.get('name', f"step{i + 1}") for i, step in enumerate(steps)]
+        self.patterns = [step['pattern'] for step in steps]
+        for pattern in self.patterns:
+            re.compile(pattern)
+        self.key = key
+        self.max_gap = max_gap
+        self.severity = severity
+        self.description = description or f"Sequence {name} detected"
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['name'], data['steps'], key=data.get('key', 'host'),
+            max_gap=data.get('max_gap', 300), severity=data.get('severity', 'HIGH'),
+            description=data.get('description')
+        )
+
+
+class SequenceDetector:
+    """Streaming multi-step sequence matcher
+
+    Each rule is a chain of states, one per step. For every (rule, entity)
+    the detector keeps the partial matches in flight as ``{next step:
+    (started, last seen)}``, so at most one partial per state. All step
+    patterns of all rules are compiled into one prefiltered
+    SignatureMatcher; an event only touches the (rule, step) pairs whose
+    pattern it matches and the partial matches of its own entity. A
+    partial match whose last step is more than ``max_gap`` seconds old is
+    dropped, lazily on access and by a periodic sweep.
+    """
+
+    def __init__(self, rules=None, sweep_interval=60):
+        self.logger = logging.getLogger(__name__)
+        self.rules = []
+        self.sweep_interval = sweep_interval
+        self.last_sweep = None
+        self.partial = defaultdict(dict)  # (rule index, entity) -> {next step: (started, last)}
+        for rule in rules if rules is not None else self.default_rules():
+            self.add_rule(rule, compile=False)
+        self.compile()
+
+    @staticmethod
+    def default_rules():
+        return [SequenceRule(
+            'suspicious_login',
+            [
+                {'name': 'failed_login', 'pattern': r'Failed login|Failed password|Authentication failure'},
+                {'name': 'successful_login', 'pattern': r'Successful login|Accepted password'},
+                {'name': 'privilege_escalation', 'pattern': r'sudo|\bsu\b'}
+            ],
+            key='source', max_gap=300, severity='HIGH',
+            description="Suspicious login sequence detected"
+        )]
+
+    def add_rule(self, rule, compile=True):
+        if isinstance(rule, dict):
+            rule = SequenceRule.from_dict(rule)
+        self.rules.append(rule)
+        if compile:
+            self.compile()
+
+    def load_rules(self, filepath):
+        """Add sequence rules from a YAML file with a top-level ``sequences`` list"""
+        try:
+            with open(filepath, 'r') as f:
+                data = yaml.safe_load(f) or {}
+            for item in data.get('sequences', []):
+                try:
+                    self.add_rule(item, compile=False)
+                except (re.error, KeyError, TypeError, ValueError) as e:
+                    self.logger.error(f"Skipping invalid sequence rule {item.get('name')!r}: {e}")
+        finally:
+            self.compile()
+
+    def compile(self):
+        """Build the shared step matcher; must be called after editing ``rules``"""
+        steps_by_pattern = defaultdict(list)
+        for rule_index, rule in enumerate(self.rules):
+            for step_index, pattern in enumerate(rule.patterns):
+                steps_by_pattern[pattern].append((rule_index, step_index))
+        self.matcher = SignatureMatcher({'sequence_steps': [
+            {'name': pattern, 'severity': 'INFO', 'pattern': pattern} for pattern in steps_by_pattern
+        ]})
+        self.steps_by_id = [steps_by_pattern[info['pattern']] for _, info in self.matcher.entries]
+        self.partial.clear()
+
+    def process(self, event):
+        """Advance partial matches with one event; returns alerts for completed sequences"""
+        matched = defaultdict(list)
+        for sig_id in self.matcher.matching_ids(event['content']):
+            for rule_index, step_index in self.steps_by_id[sig_id]:
+                matched[rule_index].append(step_index)
+        ts = event_time(event)
+        alerts = []
+        entities = {}
+        for rule_index, steps in matched.items():
+            rule = self.rules[rule_index]
+            if rule.key not in entities:
+                entities[rule.key] = ENTITY_KEYS[rule.key](event)
+            entity = entities[rule.key]
+            started = self.advance(rule_index, rule, entity, sorted(steps, reverse=True), ts)
+            if started is not None:
+                alerts.append(self.build_alert(rule, entity, started, ts))
+        self.sweep(ts)
+        return alerts
+
+    def advance(self, rule_index, rule, entity, steps, ts):
+        """Apply the matched steps (highest first) to one entity
+
+        Returns the start time of the sequence if the rule completed, else None.
+        """
+        key = (rule_index, entity)
+        states = self.partial[key]
+        last = len(rule.steps) - 1
+        completed = None
+        for step in steps:
+            if step == 0:
+                # A new attempt; keeps the most recent start for the gap check
+                states[1] = (ts, ts)
+                continue
+            partial = states.pop(step, None)
+            if partial is None or ts - partial[1] > rule.max_gap:
+                continue
+            if step == last:
+                completed = partial[0]
+            else:
+                states[step + 1] = (partial[0], ts)
+        if not states:
+            del self.partial[key]
+        return completed
+
+    def build_alert(self, rule, entity, started, ts):
+        return {
+            'type': 'sequence',
+            'rule_name': rule.name,
+            'severity': rule.severity,
+            'entity': entity,
+            'steps': list(rule.steps),
+            'duration': ts - started,
+            'timestamp': datetime.fromtimestamp(ts).isoformat(),
+            'description': rule.description
+        }
+
+    def sweep(self, now):
+        """Drop partial matches whose next step can no longer arrive in time"""
+        if self.last_sweep is not None and now - self.last_sweep < self.sweep_interval:
+            return
+        self.last_sweep = now
+        for key in list(self.partial):
+            rule = self.rules[key[0]]
+            states = self.partial[key]
+            for step in [s for s, (_, last) in states.items() if now - last > rule.max_gap]:
+                del states[step]
+            if not states:
+                del self.partial[key]
+
+    def snapshot(self):
+        return {
+            'partial': [
+                (self.rules[rule_index].name, entity, states)
+                for (rule_index, entity), states in self.partial.items()
+            ],
+            'last_sweep': self.last_sweep
+        }
+
+    def restore(self, state):
+        """Reload partial matches; those of rules no longer loaded are dropped"""
+        indexes = {rule.name: i for i, rule in enumerate(self.rules)}
+        self.partial.clear()
+        for name, entity, states in state['partial']:
+            if name in indexes:
+                self.partial[(indexes[name], entity)] = {step: tuple(times) for step, times in states.items()}
+        self.last_sweep = state['last_sweep']
+
+    def active_matches(self):
+        return sum(len(states) for states in self.partial.values())
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import argparse
 import os
 import sys
 import time
@@ -12,19 +13,96 @@ from pyfiglet import Figlet
 from colorama import Fore, Style, init
 import yaml
 import threading
-from queue import Queue
 import json
+from .event_bus import EventBus
+from .templates import TemplateMiner
+from .history import EventHistoryStore
+from .alert_sink import AlertPipeline
+from .checkpoint import CheckpointManager
+from .suppression import AlertSuppressor
+from .metrics import REGISTRY, MetricsServer, StackSampler
 
 # Initialize colorama
 init(autoreset=True)
 
 class AdvancedSIEM:
-    def __init__(self):
+    def __init__(self, workers=0, partition_key='source', alert_sinks=('file',), alert_url=None,
+                 metrics_port=9108, profile=None, checkpoint_interval=300,
+                 archive_dir=os.path.join('state', 'archive')):
         self.console = Console()
-        self.event_queue = Queue()
+        # With workers > 0 the analyzer and AI engine each run as a pool of
+        # processes instead of a thread, partitioned by partition_key
+        self.workers = workers
+        self.partition_key = partition_key
+        # One time-indexed history shared by the engines, filled on publish
+        self.history = EventHistoryStore(retention=1800, max_bytes=256 * 1024 * 1024)
+        self.event_bus = EventBus(capacity=10000, policy='drop_oldest', history=self.history)
+        # Every event and alert is also kept on disk in hourly columnar
+        # segments under archive_dir (None disables the archive)
+        self.archive_dir = archive_dir
+        self.archiver = None
+        if archive_dir and 'archive' not in alert_sinks:
+            alert_sinks = tuple(alert_sinks) + ('archive',)
+        # Alerts are written as NDJSON by a background thread instead of being
+        # pretty-printed to the console on the detection threads. Repeats of
+        # an alert (same type, rule and entity) are folded for 5 minutes.
+        self.alert_pipeline = AlertPipeline.from_names(
+            alert_sinks, path=os.path.join(os.getcwd(), 'state', 'alerts.ndjson'), url=alert_url,
+            archive_dir=archive_dir,
+            capacity=10000, batch_size=500, flush_interval=1.0,
+            suppressor=AlertSuppressor(ttl=300, max_entries=10000)
+        )
+        self.stats_interval = 60  # seconds between subscriber lag reports
+        # Prometheus text on http://127.0.0.1:<metrics_port>/metrics (0 disables)
+        self.metrics_port = metrics_port
+        self.metrics_server = None
+        # Path of a folded-stack profile to sample into, or None
+        self.profile_path = profile
+        self.profiler = None
+        self.register_metrics()
+        self.template_path = os.path.join(os.getcwd(), 'state', 'templates.json')
+        self.template_save_interval = 300  # seconds between template table saves
+        self.template_miner = TemplateMiner()
+        self.analyzer = None  # in-process LogAnalyzer, when not running workers
+        # Detector state is snapshotted every checkpoint_interval seconds and
+        # restored at startup (0 disables both). Worker processes keep their
+        # own state and are not checkpointed; the shared history and the AI
+        # workers' model trainer are.
+        self.checkpoint = (
+            CheckpointManager(os.path.join(os.getcwd(), 'state', 'checkpoint.bin'), interval=checkpoint_interval)
+            if checkpoint_interval else None
+        )
+        self.ai_ready = threading.Event()
         self.should_run = True
         self.setup_logging()
         
+    def register_metrics(self):
+        """Expose history and alert pipeline state as callback metrics"""
+        REGISTRY.gauge('siem_history_events', fn=lambda: len(self.history))
+        REGISTRY.gauge('siem_alert_queue_depth', fn=self.alert_pipeline.queue.qsize)
+        REGISTRY.counter('siem_alerts_dropped_total', fn=lambda: self.alert_pipeline.dropped)
+
+    def register_subscription_metrics(self, subscription):
+        REGISTRY.gauge('siem_queue_depth', fn=lambda: subscription.lag, subscriber=subscription.name)
+        REGISTRY.counter('siem_queue_dropped_total', fn=lambda: subscription.dropped,
+                         subscriber=subscription.name)
+
+    def start_instrumentation(self):
+        """Start the metrics endpoint and, with --profile, the stack sampler"""
+        if self.metrics_port:
+            try:
+                self.metrics_server = MetricsServer(REGISTRY, port=self.metrics_port).start()
+            except OSError as e:
+                self.logger.error(f"Could not serve metrics on port {self.metrics_port}: {str(e)}")
+        if self.profile_path:
+            self.profiler = StackSampler(self.profile_path).start()
+
+    def stop_instrumentation(self):
+        if self.profiler is not None:
+            self.profiler.stop()
+        if self.metrics_server is not None:
+            self.metrics_server.close()
+
     def display_banner(self):
         f = Figlet(font='slant')
         banner = f.renderText('AdvancedSIEM')
@@ -48,68 +126,280 @@ class AdvancedSIEM:
         # Add different collectors for various sources
         sources = ['system', 'network', 'application']
         
+        self.template_miner.load(self.template_path)
         for source in sources:
-            collector = LogCollector(source, self.event_queue)
+            collector = LogCollector(source, self.event_bus, self.template_miner)
             thread = threading.Thread(target=collector.run)
             thread.daemon = True
             thread.start()
             collectors.append(thread)
             
-    def start_analyzer(self):
-        """Start the analyzer in a separate thread"""
+    def start_archiver(self):
+        """Archive published events from a bus subscription of their own"""
+        if not self.archive_dir:
+            return None
+        from .archive import EventArchiver
+        subscription = self.event_bus.subscribe('archive', capacity=50000, policy='drop_oldest')
+        self.register_subscription_metrics(subscription)
+        self.archiver = EventArchiver(subscription, self.archive_dir, segment_rows=65536, flush_interval=60.0)
+        return self.archiver.start()
+
+    def start_worker_pool(self, kind, subscription, on_ready=None):
+        """Run a WorkerPool of the given kind fed from a bus subscription"""
+        from .workers import WorkerPool
+        pool = WorkerPool(kind, workers=self.workers, partition_key=self.partition_key,
+                          handler=self.alert_pipeline.submit_many)
+        # Stage timings stay inside the worker processes; the pool reports totals
+        REGISTRY.counter('siem_events_processed_total', fn=lambda: sum(pool.stats['events']),
+                         engine=f"{kind}_workers")
+        REGISTRY.counter('siem_alerts_total', fn=lambda: pool.stats['alerts'], engine=f"{kind}_workers")
+
+        def start_and_run():
+            try:
+                pool.start()
+            except Exception as e:
+                self.logger.error(f"{kind} workers failed to start: {str(e)}")
+                pool.close()
+                return
+            finally:
+                if on_ready:
+                    on_ready()
+            pool.run(subscription)
+
+        thread = threading.Thread(target=start_and_run, name=subscription.name)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def start_analyzer(self, policy=None):
+        """Start an analyzer instance with its own bus subscription"""
         from .analyzer import LogAnalyzer
-        analyzer = LogAnalyzer(self.event_queue)
-        thread = threading.Thread(target=analyzer.run)
+        subscription = self.event_bus.subscribe('analyzer', policy=policy)
+        self.register_subscription_metrics(subscription)
+        if self.workers:
+            return self.start_worker_pool('analyzer', subscription)
+        analyzer = self.analyzer = LogAnalyzer(subscription, history=self.history, alert_sink=self.alert_pipeline)
+        if self.checkpoint is not None:
+            self.checkpoint.register('analyzer', analyzer)
+        thread = threading.Thread(target=analyzer.run, name=subscription.name)
         thread.daemon = True
         thread.start()
         return thread
         
-    def start_ai_detection(self):
-        """Start AI-based detection system"""
-        from .ai_detection import AIDetectionEngine
-        ai_engine = AIDetectionEngine(self.event_queue)
-        thread = threading.Thread(target=ai_engine.run)
+    def start_ai_detection(self, policy=None, progress=None):
+        """Start an AI detection instance with its own bus subscription
+
+        The engine is built on its own thread because importing TensorFlow
+        and sklearn takes seconds. The subscription exists from the start, so
+        events published meanwhile are buffered in its ring. ``ai_ready`` is
+        set once initialization finishes.
+        """
+        subscription = self.event_bus.subscribe('ai_detection', policy=policy)
+        self.register_subscription_metrics(subscription)
+        if self.workers:
+            # Worker processes score with exported weights and never import
+            # TensorFlow; one engine in this process trains and exports them
+            if progress:
+                progress(f"Starting {self.workers} AI workers", 50)
+
+            def workers_ready():
+                if progress:
+                    progress("AI workers ready", 100)
+                self.ai_ready.set()
+
+            self.start_model_trainer()
+            return self.start_worker_pool('ai', subscription, on_ready=workers_ready)
+
+        def initialize_and_run():
+            try:
+                from .ai_detection import AIDetectionEngine
+                ai_engine = AIDetectionEngine(subscription, progress=progress, history=self.history,
+                                              alert_sink=self.alert_pipeline)
+                if self.checkpoint is not None:
+                    self.checkpoint.register('ai', ai_engine)
+            except Exception as e:
+                self.logger.error(f"AI engine failed to initialize: {str(e)}")
+                return
+            finally:
+                self.ai_ready.set()
+            ai_engine.run()
+
+        thread = threading.Thread(target=initialize_and_run, name=subscription.name)
         thread.daemon = True
         thread.start()
         return thread
+
+    def start_model_trainer(self):
+        """Train the network on the shared history and export it for the AI workers
+
+        The trainer consumes no events. Every export holds the weights and
+        the scaler they were trained behind, which the workers reload.
+        """
+        def initialize_and_train():
+            try:
+                from .ai_detection import AIDetectionEngine
+                trainer = AIDetectionEngine(None, history=self.history)
+                if self.checkpoint is not None:
+                    self.checkpoint.register('ai', trainer)
+            except Exception as e:
+                self.logger.error(f"AI model trainer failed to initialize; AI workers score without "
+                                  f"the neural network: {str(e)}")
+                return
+            self.logger.info("Training the neural network for the AI workers")
+            trainer.start_background_threads()
+
+        thread = threading.Thread(target=initialize_and_train, name='ai_trainer')
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def restore_checkpoint(self):
+        """Load the last checkpoint and restore the shared history from it
+
+        The engines are restored as they register.
+        """
+        if self.checkpoint is None:
+            return
+        self.checkpoint.load()
+        self.checkpoint.register('history', self.history)
+
+    def save_templates(self):
+        """Persist learned log templates for the next warm start"""
+        try:
+            self.template_miner.save(self.template_path)
+        except Exception as e:
+            self.logger.error(f"Error saving log templates: {str(e)}")
+
+    def report_bus_stats(self):
+        """Log lag and drop counters for every bus subscriber"""
+        for name, stats in self.event_bus.stats().items():
+            self.logger.info(
+                f"Subscriber {name}: lag={stats['lag']} dropped={stats['dropped']} "
+                f"consumed={stats['consumed']} policy={stats['policy']}"
+            )
+        history = self.history.stats()
+        self.logger.info(
+            f"Event history: {history['events']} events in {history['segments']} segments, "
+            f"{history['sealed_bytes'] / 1e6:.1f} MB sealed, {history['expired']} expired"
+        )
+        alerts = self.alert_pipeline.stats()
+        self.logger.info(
+            f"Alerts: {alerts['submitted']} submitted, {alerts['queued']} queued, "
+            f"{alerts['dropped']} dropped"
+        )
+        suppression = alerts['suppression']
+        if suppression:
+            self.logger.info(
+                f"Alert suppression: {suppression['passed']} passed, {suppression['suppressed']} "
+                f"folded into {suppression['summaries']} summaries, {suppression['cached']} cached"
+            )
+        if self.analyzer is not None:
+            for pattern, top in self.analyzer.top_entities(5).items():
+                if top:
+                    self.logger.info(
+                        f"Top {pattern} entities: " + ', '.join(f"{entity} ({count})" for entity, count in top)
+                    )
+            for rule, stats in self.analyzer.distinct_detector.stats().items():
+                self.logger.info(
+                    f"Distinct counts {rule}: {stats['entities']} entities tracked, {stats['dense']} "
+                    f"in HyperLogLog, {stats['evictions']} evicted"
+                )
+        if self.archiver is not None:
+            archive = self.archiver.stats()
+            self.logger.info(
+                f"Event archive: {archive['records']} events in {archive['segments']} segments "
+                f"({archive['bytes'] / 1e6:.1f} MB), {archive['pending']} buffered, {archive['lost']} lost"
+            )
+        for name, stats in alerts['sinks'].items():
+            self.logger.info(
+                f"Alert sink {name}: written={stats['written']} dropped={stats['dropped']} "
+                f"flush avg={stats['avg_latency'] * 1000:.1f}ms max={stats['max_latency'] * 1000:.1f}ms"
+            )
         
     def run(self):
         """Main execution method"""
         try:
             self.display_banner()
+            self.start_instrumentation()
             
+            # Collectors and the analyzer consume immediately; the AI engine
+            # buffers events until its heavy imports finish in the background
             with Progress() as progress:
-                task1 = progress.add_task("[cyan]Starting log collectors...", total=100)
+                task1 = progress.add_task("[cyan]Starting log collectors...", total=1)
                 task2 = progress.add_task("[green]Initializing AI engine...", total=100)
-                task3 = progress.add_task("[yellow]Setting up analyzers...", total=100)
-                
-                # Simulate startup progress
-                while not progress.finished:
-                    progress.update(task1, advance=0.9)
-                    progress.update(task2, advance=0.7)
-                    progress.update(task3, advance=0.8)
-                    time.sleep(0.02)
+                task3 = progress.add_task("[yellow]Setting up analyzers...", total=1)
+
+                def ai_progress(description, percent):
+                    progress.update(task2, completed=percent, description=f"[green]{description}...")
+
+                self.restore_checkpoint()
+                self.start_archiver()
+                ai_thread = self.start_ai_detection(progress=ai_progress)
+                self.start_collectors()
+                progress.update(task1, completed=1)
+                analyzer_thread = self.start_analyzer()
+                progress.update(task3, completed=1)
+                self.ai_ready.wait()
+            if self.checkpoint is not None:
+                self.checkpoint.start()
             
             self.console.print("\n[bold green]✓[/bold green] SIEM System initialized successfully!")
             
-            # Start all components
-            self.start_collectors()
-            analyzer_thread = self.start_analyzer()
-            ai_thread = self.start_ai_detection()
-            
             # Keep the main thread running
+            last_report = last_save = time.time()
             while self.should_run:
                 time.sleep(1)
+                if time.time() - last_report >= self.stats_interval:
+                    self.report_bus_stats()
+                    last_report = time.time()
+                if time.time() - last_save >= self.template_save_interval:
+                    self.save_templates()
+                    last_save = time.time()
                 
         except KeyboardInterrupt:
             self.console.print("\n[bold red]Shutting down SIEM system...[/bold red]")
             self.should_run = False
+            self.save_templates()
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+            if self.archiver is not None:
+                self.archiver.close()
+            self.alert_pipeline.close()
+            self.stop_instrumentation()
             sys.exit(0)
         except Exception as e:
             self.logger.error(f"Critical error: {str(e)}")
             self.should_run = False
             sys.exit(1)
 
+def parse_args(argv=None):
+    from .workers import PARTITION_KEYS
+    from .alert_sink import SINK_TYPES
+    parser = argparse.ArgumentParser(description="Advanced Security Information and Event Management System")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="worker processes per detection engine (0 runs engines as threads)")
+    parser.add_argument('--partition-key', choices=sorted(PARTITION_KEYS), default='source',
+                        help="event field that decides which worker analyzes an event")
+    parser.add_argument('--alert-sink', action='append', choices=SINK_TYPES, dest='alert_sinks',
+                        help="where alerts are written as NDJSON, repeatable (default: file)")
+    parser.add_argument('--alert-url', default=None,
+                        help="Elasticsearch-compatible _bulk URL for the http sink")
+    parser.add_argument('--metrics-port', type=int, default=9108,
+                        help="port of the local Prometheus /metrics endpoint (0 disables it)")
+    parser.add_argument('--profile', nargs='?', const=os.path.join('state', 'profile.folded'), default=None,
+                        help="sample thread stacks into a folded-stack file for flame graphs")
+    parser.add_argument('--checkpoint-interval', type=int, default=300,
+                        help="seconds between detector state checkpoints (0 disables checkpoint and restore)")
+    parser.add_argument('--archive-dir', default=os.path.join('state', 'archive'),
+                        help="directory events and alerts are archived to (search it with python3 -m src.archive)")
+    parser.add_argument('--no-archive', action='store_true', help="do not archive events and alerts")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    siem = AdvancedSIEM()
+    args = parse_args()
+    siem = AdvancedSIEM(workers=args.workers, partition_key=args.partition_key,
+                        alert_sinks=args.alert_sinks or ('file',), alert_url=args.alert_url,
+                        metrics_port=args.metrics_port, profile=args.profile,
+                        checkpoint_interval=args.checkpoint_interval,
+                        archive_dir=None if args.no_archive else args.archive_dir)
     siem.run() 
\ No newline at end of file
@@ -0,0 +1,204 @@
+import logging
+import re
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:  # Python < 3.11
+    import sre_parse
+    import sre_constants
+
+_REPEATS = tuple(
+    getattr(sre_constants, name)
+    for name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+    if hasattr(sre_constants, name)
+)
+_ATOMIC_GROUP = getattr(sre_constants, 'ATOMIC_GROUP', None)
+
+# Characters that re.IGNORECASE treats as equal to an ASCII letter but that
+# str.lower() does not map onto one
+_FOLD_EXTRA = str.maketrans({'ı': 'i', 'ſ': 's'})
+
+
+def fold_case(text):
+    """Lowercase text so any IGNORECASE match of an ASCII literal survives"""
+    text = text.lower()
+    if not text.isascii():
+        text = text.translate(_FOLD_EXTRA)
+    return text
+
+
+def _literal_score(literals):
+    """Rank a set of required literals, preferring long and few"""
+    return (min(len(lit) for lit in literals), -len(literals))
+
+
+def _required_literals(parsed):
+    """Return a set of lowercase strings, one of which every match must contain
+
+    Returns None when no such set can be derived, in which case the regex
+    has to be run against every line.
+    """
+    best = None
+    run = []
+
+    def consider(literals):
+        nonlocal best
+        if not literals or not all(lit and lit.isascii() for lit in literals):
+            return
+        if best is None or _literal_score(literals) > _literal_score(best):
+            best = literals
+
+    for op, av in parsed:
+        if op is sre_constants.LITERAL:
+            run.append(chr(av))
+            continue
+        if run:
+            consider({''.join(run).lower()})
+            run = []
+        if op is sre_constants.SUBPATTERN:
+            consider(_required_literals(av[-1]))
+        elif op is _ATOMIC_GROUP:
+            consider(_required_literals(av))
+        elif op is sre_constants.BRANCH:
+            alternatives = [_required_literals(alt) for alt in av[1]]
+            if all(alternatives):
+                consider(set().union(*alternatives))
+        elif op in _REPEATS and av[0] >= 1:
+            consider(_required_literals(av[2]))
+    if run:
+        consider({''.join(run).lower()})
+    return best
+
+
+def required_literals(pattern):
+    """Extract the prefilter literals for a regex pattern string"""
+    try:
+        return _required_literals(sre_parse.parse(pattern))
+    except Exception:
+        return None
+
+
+class AhoCorasick:
+    """Multi-literal matcher reporting which keyword ids occur in a text
+
+    Failure links are folded into the transition tables at build time, so a
+    scan costs at most two dict lookups per character.
+    """
+
+    def __init__(self, keywords):
+        # keywords: iterable of (literal, payload) pairs
+        goto = [{}]
+        outputs = [set()]
+        for literal, payload in keywords:
+            state = 0
+            for ch in literal:
+                nxt = goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[state][ch] = nxt
+                    goto.append({})
+                    outputs.append(set())
+                state = nxt
+            outputs[state].add(payload)
+
+        fail = [0] * len(goto)
+        delta = [None] * len(goto)
+        root = goto[0]
+        delta[0] = {}
+        queue = list(root.values())
+        for state in queue:
+            delta[state] = dict(goto[state])
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, child in goto[state].items():
+                queue.append(child)
+                target = fail[state]
+                while target and ch not in goto[target]:
+                    target = fail[target]
+                fallback = goto[target].get(ch, 0)
+                fail[child] = fallback if fallback != child else 0
+                outputs[child] |= outputs[fail[child]]
+                # Inherit the non-root transitions of the failure state
+                inherited = dict(delta[fail[child]])
+                inherited.update(goto[child])
+                delta[child] = inherited
+
+        self._root = root
+        self._delta = delta
+        self._outputs = [tuple(out) if out else None for out in outputs]
+        self.state_count = len(goto)
+
+    def search(self, text):
+        """Return the set of payloads whose literal occurs in text"""
+        root = self._root
+        delta = self._delta
+        outputs = self._outputs
+        hits = set()
+        state = 0
+        for ch in text:
+            state = delta[state].get(ch) or root.get(ch, 0)
+            out = outputs[state]
+            if out:
+                hits.update(out)
+        return hits
+
+
+class SignatureMatcher:
+    """Compiled form of a signature dictionary
+
+    Every regex is compiled once. Signatures with extractable literals are
+    only evaluated when the Aho-Corasick prefilter finds one of their
+    literals in the folded line; the rest are evaluated on every line.
+    """
+
+    def __init__(self, signatures):
+        self.logger = logging.getLogger(__name__)
+        self.entries = []
+        self.unfiltered = []
+        keywords = []
+
+        for category, sigs in signatures.items():
+            for sig in sigs or []:
+                try:
+                    regex = re.compile(sig['pattern'], re.IGNORECASE)
+                except (re.error, KeyError, TypeError) as e:
+                    self.logger.error(f"Skipping invalid signature {sig.get('name')!r}: {e}")
+                    continue
+                sig_id = len(self.entries)
+                self.entries.append((regex, {
+                    'category': category,
+                    'signature': sig['name'],
+                    'severity': sig['severity'],
+                    'pattern': sig['pattern']
+                }))
+                literals = required_literals(sig['pattern'])
+                if literals:
+                    keywords.extend((lit, sig_id) for lit in literals)
+                else:
+                    self.unfiltered.append(sig_id)
+
+        self.prefilter = AhoCorasick(keywords)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def candidates(self, content):
+        """Signature ids that may match content, in definition order"""
+        ids = self.prefilter.search(fold_case(content))
+        ids.update(self.unfiltered)
+        return sorted(ids)
+
+    def matching_ids(self, content):
+        """Ids of the signatures whose regex hits content, in definition order"""
+        if not content:
+            return []
+        entries = self.entries
+        return [sig_id for sig_id in self.candidates(content) if entries[sig_id][0].search(content)]
+
+    def match(self, content):
+        """Return match dicts for every signature whose regex hits content"""
+        entries = self.entries
+        return [dict(entries[sig_id][1]) for sig_id in self.matching_ids(content)]
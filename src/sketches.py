@@ -0,0 +1,603 @@
+import heapq
+import math
+from array import array
+from collections import OrderedDict, deque
+from hashlib import blake2b
+from operator import add
+
+
+def stable_hash(key):
+    """64-bit hash of a key that is the same in every process and run
+
+    Python's ``hash`` of a string is salted per process, so sketches built
+    on it could not be merged across workers or restored from a snapshot.
+    """
+    data = key.encode('utf-8', 'surrogatepass') if isinstance(key, str) else str(key).encode('utf-8')
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), 'little')
+
+
+class CountMinSketch:
+    """Approximate per-key counts in ``depth`` rows of ``width`` counters
+
+    A key increments one counter per row; its estimate is the smallest of
+    those counters, so it is never below the true count and exceeds it by
+    at most ``2 * total / width`` with probability ``1 - 2 ** -depth``.
+    ``add_conservative`` only raises the counters below the key's new
+    estimate, which keeps collisions far smaller but makes the sketch
+    add-only. Row positions come from one 64-bit hash (double hashing), so
+    callers that update several sketches of the same shape hash a key once
+    with ``positions`` and pass the result to the ``*_at`` methods.
+    """
+
+    def __init__(self, width=8192, depth=4):
+        self.width = width
+        self.depth = depth
+        self.rows = [array('i', bytes(4 * width)) for _ in range(depth)]
+
+    def positions(self, key):
+        h = stable_hash(key)
+        h1 = h & 0xFFFFFFFF
+        h2 = (h >> 32) | 1
+        width = self.width
+        return [(h1 + i * h2) % width for i in range(self.depth)]
+
+    def add_at(self, positions, count=1):
+        for row, position in zip(self.rows, positions):
+            row[position] += count
+
+    def add_conservative(self, positions, count=1):
+        """Conservative update; returns the key's new estimate"""
+        rows = self.rows
+        values = [row[position] for row, position in zip(rows, positions)]
+        target = min(values) + count
+        for row, position, value in zip(rows, positions, values):
+            if value < target:
+                row[position] = target
+        return target
+
+    def estimate_at(self, positions):
+        return min([row[position] for row, position in zip(self.rows, positions)])
+
+    def add(self, key, count=1):
+        self.add_at(self.positions(key), count)
+
+    def estimate(self, key):
+        return self.estimate_at(self.positions(key))
+
+    def merge(self, other):
+        """Add another sketch of the same shape into this one"""
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Count-min sketches must have the same width and depth")
+        self.rows = [array('i', map(add, row, other_row)) for row, other_row in zip(self.rows, other.rows)]
+
+    def clear(self):
+        self.rows = [array('i', bytes(4 * self.width)) for _ in range(self.depth)]
+
+    @property
+    def nbytes(self):
+        return 4 * self.width * self.depth
+
+
+class _ExactCount:
+    """Per-bucket counts of one promoted key
+
+    Each bucket is ``[bucket id, count, seed]``: ``seed`` is the part of the
+    count estimated by the sketch at promotion, the rest was counted exactly.
+    """
+
+    __slots__ = ('buckets', 'total')
+
+    def __init__(self):
+        self.buckets = deque()  # oldest first
+        self.total = 0
+
+    def add(self, bucket, count=1, seed=0):
+        buckets = self.buckets
+        if buckets and buckets[-1][0] == bucket:
+            buckets[-1][1] += count
+            buckets[-1][2] += seed
+        elif not buckets or buckets[-1][0] < bucket:
+            buckets.append([bucket, count, seed])
+        else:
+            # Late event for an older bucket
+            for item in buckets:
+                if item[0] == bucket:
+                    item[1] += count
+                    item[2] += seed
+                    break
+            else:
+                buckets.append([bucket, count, seed])
+                self.buckets = deque(sorted(buckets))
+        self.total += count
+
+    def expire(self, oldest):
+        """Drop buckets before ``oldest`` and return the remaining total"""
+        buckets = self.buckets
+        while buckets and buckets[0][0] < oldest:
+            self.total -= buckets.popleft()[1]
+        return self.total
+
+
+class EntityWindowCounter:
+    """Per-entity event counts over a sliding window, in fixed memory
+
+    The window is split into ``buckets`` sub-windows, each with its own
+    conservatively updated CountMinSketch that is cleared when the bucket
+    leaves the window; a key's count is the sum of its estimates in the
+    live buckets, so any of millions of keys has a count at a fixed memory
+    cost. Up to ``max_exact`` hot keys are promoted to exact per-bucket
+    counters, kept least recently seen first: a key is promoted while there
+    is room, or when its count exceeds that of the least recently seen
+    exact key, which is evicted and its exactly counted events put back
+    into the sketches. A promoted key starts from its sketch estimates and
+    is counted exactly from then on without touching the sketches; the
+    exact keys are the heavy hitters ``top`` reports. Counts never fall
+    below the true count and cover the current bucket and the
+    ``buckets - 1`` before it, so the window is ``timeframe`` seconds to
+    within one bucket.
+
+    Collisions only inflate counts when a bucket holds a sizeable fraction
+    of ``width`` distinct keys; size ``width`` to the events per bucket.
+    """
+
+    def __init__(self, timeframe, buckets=10, width=8192, depth=4, max_exact=4096):
+        self.timeframe = timeframe
+        self.buckets = buckets
+        self.bucket_width = timeframe / buckets
+        self.max_exact = max_exact
+        self.slots = [CountMinSketch(width, depth) for _ in range(buckets)]
+        self.slot_ids = [None] * buckets  # bucket id held by each slot
+        self.slot_sketched = [0] * buckets  # events per slot that went into its sketch
+        self.exact = OrderedDict()  # key -> _ExactCount, least recently seen first
+        self.current = None  # newest bucket id seen
+        self.promotions = 0
+        self.evictions = 0
+
+    def _advance(self, bucket):
+        """Make ``bucket`` the newest, clearing the buckets that leave the window"""
+        start = bucket - self.buckets + 1
+        if self.current is not None:
+            start = max(start, self.current + 1)
+        for bucket_id in range(start, bucket + 1):
+            index = bucket_id % self.buckets
+            if self.slot_sketched[index]:
+                self.slots[index].clear()
+                self.slot_sketched[index] = 0
+            self.slot_ids[index] = bucket_id
+        self.current = bucket
+
+    def _estimates(self, positions):
+        """(bucket id, estimate) for each live bucket where the key may have events"""
+        estimates = []
+        for index, slot in enumerate(self.slots):
+            if not self.slot_sketched[index]:
+                continue
+            # Inlined estimate_at that stops at the first zero counter, the
+            # common case for a key that had no events in the bucket
+            estimate = 0
+            for row, position in zip(slot.rows, positions):
+                value = row[position]
+                if not value:
+                    estimate = 0
+                    break
+                if not estimate or value < estimate:
+                    estimate = value
+            if estimate:
+                estimates.append((self.slot_ids[index], estimate))
+        return estimates
+
+    def add(self, key, ts, count=1):
+        """Count an event for ``key`` at epoch ``ts``; returns the key's count in the window"""
+        bucket = int(ts // self.bucket_width)
+        if self.current is None or bucket > self.current:
+            self._advance(bucket)
+        oldest = self.current - self.buckets + 1
+        if bucket < oldest:
+            # Older than the window: nothing to count
+            return self.count(key)
+
+        exact = self.exact
+        entry = exact.get(key)
+        if entry is not None:
+            exact.move_to_end(key)
+            entry.add(bucket, count)
+            return entry.expire(oldest)
+
+        index = bucket % self.buckets
+        positions = self.slots[index].positions(key)
+        self.slots[index].add_conservative(positions, count)
+        self.slot_sketched[index] += count
+        estimates = self._estimates(positions)
+        estimate = sum([item[1] for item in estimates])
+        if len(exact) >= self.max_exact:
+            victim_key, victim = next(iter(exact.items()))
+            victim_count = victim.expire(oldest)
+            if victim_count and estimate <= victim_count:
+                return estimate
+            del exact[victim_key]
+            self._spill(victim_key, victim, oldest)
+            self.evictions += 1
+        entry = exact[key] = _ExactCount()
+        for bucket_id, seed in sorted(estimates):
+            entry.add(bucket_id, seed, seed)
+        self.promotions += 1
+        return estimate
+
+    def _spill(self, key, entry, oldest):
+        """Put the exactly counted events of an evicted key back into the sketches"""
+        positions = None
+        for bucket_id, count, seed in entry.buckets:
+            if bucket_id < oldest or count == seed:
+                continue
+            index = bucket_id % self.buckets
+            if positions is None:
+                positions = self.slots[index].positions(key)
+            self.slots[index].add_conservative(positions, count - seed)
+            self.slot_sketched[index] += count - seed
+
+    def count(self, key):
+        """Count for ``key`` in the window ending at the newest bucket"""
+        if self.current is None:
+            return 0
+        entry = self.exact.get(key)
+        if entry is not None:
+            return entry.expire(self.current - self.buckets + 1)
+        return sum([item[1] for item in self._estimates(self.slots[0].positions(key))])
+
+    def top(self, n=10):
+        """The ``n`` exact keys with the highest counts, as (key, count) pairs"""
+        if self.current is None:
+            return []
+        oldest = self.current - self.buckets + 1
+        counts = ((key, entry.expire(oldest)) for key, entry in self.exact.items())
+        return [item for item in heapq.nlargest(n, counts, key=lambda item: item[1]) if item[1] > 0]
+
+    def snapshot(self):
+        return {
+            'shape': (self.timeframe, self.buckets, self.slots[0].width, self.slots[0].depth),
+            'rows': [b''.join(row.tobytes() for row in slot.rows) for slot in self.slots],
+            'slot_ids': list(self.slot_ids),
+            'slot_sketched': list(self.slot_sketched),
+            'exact': [(key, [tuple(item) for item in entry.buckets]) for key, entry in self.exact.items()],
+            'current': self.current,
+            'promotions': self.promotions,
+            'evictions': self.evictions
+        }
+
+    def restore(self, state):
+        width, depth = self.slots[0].width, self.slots[0].depth
+        if tuple(state['shape']) != (self.timeframe, self.buckets, width, depth):
+            raise ValueError(f"window shape changed from {tuple(state['shape'])}")
+        for slot, data in zip(self.slots, state['rows']):
+            rows = array('i')
+            rows.frombytes(data)
+            slot.rows = [rows[i * width:(i + 1) * width] for i in range(depth)]
+        self.slot_ids = list(state['slot_ids'])
+        self.slot_sketched = list(state['slot_sketched'])
+        self.exact = OrderedDict()
+        for key, buckets in state['exact']:
+            entry = self.exact[key] = _ExactCount()
+            for bucket_id, count, seed in buckets:
+                entry.add(bucket_id, count, seed)
+        self.current = state['current']
+        self.promotions = state['promotions']
+        self.evictions = state['evictions']
+
+    def stats(self):
+        return {
+            'exact': len(self.exact),
+            'promotions': self.promotions,
+            'evictions': self.evictions,
+            'sketch_bytes': self.slots[0].nbytes * self.buckets
+        }
+
+
+# 2 ** -rank for every register value, for HyperLogLog estimates
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(65)]
+
+
+def _hll_estimate(m, harmonic, zeros):
+    """HyperLogLog estimate from ``m`` registers with the sum of 2 ** -register
+    and the number of zero registers, using linear counting for small counts"""
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / harmonic
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+    return int(round(estimate))
+
+
+class HyperLogLog:
+    """Approximate count of distinct keys in ``2 ** precision`` one-byte registers
+
+    A key's 64-bit hash picks a register with its top ``precision`` bits and
+    the register keeps the longest run of leading zeros (plus one) seen in
+    the remaining bits. The relative error is about
+    ``1.04 / sqrt(2 ** precision)``: 3% at the default 1 KB. Sketches of
+    the same precision merge by taking the larger register, so counts from
+    several workers combine into the count of the union.
+    """
+
+    def __init__(self, precision=10):
+        if not 4 <= precision <= 16:
+            raise ValueError("HyperLogLog precision must be between 4 and 16")
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def register_for(self, h):
+        """(register index, rank) of a 64-bit hash"""
+        bits = 64 - self.precision
+        return h >> bits, bits - (h & ((1 << bits) - 1)).bit_length() + 1
+
+    def add_hash(self, h):
+        """Add a 64-bit hash; returns True if a register changed"""
+        index, rank = self.register_for(h)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+            return True
+        return False
+
+    def add(self, key):
+        return self.add_hash(stable_hash(key))
+
+    def count(self):
+        registers = self.registers
+        return _hll_estimate(
+            len(registers), sum([_INVERSE_POWERS[rank] for rank in registers]), registers.count(0)
+        )
+
+    def merge(self, other):
+        """Fold another sketch of the same precision into this one"""
+        if other.precision != self.precision:
+            raise ValueError("HyperLogLog sketches must have the same precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    @property
+    def nbytes(self):
+        return len(self.registers)
+
+
+class _DistinctSet:
+    """Distinct values of one entity in the window
+
+    Starts exact, as ``{value hash: last bucket seen}`` in the order last
+    seen; past ``exact_limit`` values it turns into one HyperLogLog register
+    array per live bucket plus their union, with the union's harmonic sum
+    and zero count kept current so an estimate costs O(1).
+    """
+
+    __slots__ = ('seen', 'buckets', 'union', 'harmonic', 'zeros', 'last')
+
+    def __init__(self):
+        self.seen = {}
+        self.buckets = None  # deque of [bucket id, registers] once dense
+        self.union = None
+        self.harmonic = 0.0
+        self.zeros = 0
+        self.last = None  # newest bucket with an event
+
+
+class DistinctWindowCounter:
+    """Per-entity distinct value counts over a sliding window
+
+    ``add(entity, value, ts)`` returns how many distinct values the entity
+    has had in the window: the current bucket and the ``buckets - 1``
+    before it, so the window is ``timeframe`` seconds to within one bucket.
+    Entities with up to ``exact_limit`` distinct values are counted
+    exactly; beyond that they switch to one HyperLogLog register array per
+    bucket (``2 ** precision`` bytes each), so an entity holds at most a
+    few KB however many values it sees. Entities whose values all left the
+    window are dropped, and at most ``max_entities`` are tracked, least
+    recently seen evicted first. ``sketch`` returns an entity's window as a
+    HyperLogLog that merges with sketches from other workers.
+    """
+
+    def __init__(self, timeframe, buckets=5, precision=9, exact_limit=32, max_entities=100000):
+        self.timeframe = timeframe
+        self.buckets = buckets
+        self.bucket_width = timeframe / buckets
+        self.precision = precision
+        self.size = 1 << precision
+        self.exact_limit = exact_limit
+        self.max_entities = max_entities
+        self.entities = OrderedDict()  # entity -> _DistinctSet, least recently seen first
+        self.current = None  # newest bucket id seen
+        self.evictions = 0
+
+    def add(self, entity, value, ts):
+        """Count ``value`` for ``entity`` at epoch ``ts``; returns the entity's distinct count"""
+        bucket = int(ts // self.bucket_width)
+        if self.current is None or bucket > self.current:
+            self.current = bucket
+            self._sweep()
+        oldest = self.current - self.buckets + 1
+        if bucket < oldest:
+            # Older than the window: nothing to count
+            return self.count(entity)
+
+        entities = self.entities
+        state = entities.get(entity)
+        if state is None:
+            state = entities[entity] = _DistinctSet()
+            if len(entities) > self.max_entities:
+                entities.popitem(last=False)
+                self.evictions += 1
+        else:
+            entities.move_to_end(entity)
+        if state.last is None or bucket > state.last:
+            state.last = bucket
+
+        h = stable_hash(value)
+        if state.seen is None:
+            # May turn the entity exact again if all its buckets expired
+            self._expire_dense(state, oldest)
+        if state.seen is not None:
+            seen = state.seen
+            self._expire_exact(seen, oldest)
+            previous = seen.get(h)
+            if previous is None or previous < bucket:
+                # Re-inserted so the dict stays ordered by bucket (late
+                # events may outlive the window by a little)
+                seen.pop(h, None)
+                seen[h] = bucket
+            if len(seen) <= self.exact_limit:
+                return len(seen)
+            self._densify(state, oldest)
+            return _hll_estimate(self.size, state.harmonic, state.zeros)
+
+        registers = self._bucket_registers(state, bucket)
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > registers[index]:
+            registers[index] = rank
+            union = state.union
+            previous = union[index]
+            if rank > previous:
+                union[index] = rank
+                state.harmonic += _INVERSE_POWERS[rank] - _INVERSE_POWERS[previous]
+                if not previous:
+                    state.zeros -= 1
+        return _hll_estimate(self.size, state.harmonic, state.zeros)
+
+    @staticmethod
+    def _expire_exact(seen, oldest):
+        while seen:
+            h = next(iter(seen))
+            if seen[h] >= oldest:
+                break
+            del seen[h]
+
+    def _expire_dense(self, state, oldest):
+        buckets = state.buckets
+        if not buckets or buckets[0][0] >= oldest:
+            return
+        while buckets and buckets[0][0] < oldest:
+            buckets.popleft()
+        if not buckets:
+            # Everything expired: start exact again
+            state.seen = {}
+            state.buckets = state.union = None
+            return
+        self._rebuild_union(state)
+
+    def _rebuild_union(self, state):
+        buckets = state.buckets
+        union = buckets[0][1]
+        for _, registers in list(buckets)[1:]:
+            union = bytearray(map(max, union, registers))
+        state.union = bytearray(union)
+        self._recount(state)
+
+    def _bucket_registers(self, state, bucket):
+        buckets = state.buckets
+        for item in reversed(buckets):
+            if item[0] == bucket:
+                return item[1]
+            if item[0] < bucket:
+                break
+        registers = bytearray(self.size)
+        buckets.append([bucket, registers])
+        if len(buckets) > 1 and buckets[-2][0] > bucket:
+            state.buckets = deque(sorted(buckets, key=lambda item: item[0]))
+        return registers
+
+    def _densify(self, state, oldest):
+        """Move an entity's exact values into per-bucket registers"""
+        state.buckets = deque()
+        state.union = bytearray(self.size)
+        bits = 64 - self.precision
+        mask = (1 << bits) - 1
+        by_bucket = {}
+        for h, bucket in state.seen.items():
+            if bucket < oldest:
+                continue
+            registers = by_bucket.get(bucket)
+            if registers is None:
+                registers = by_bucket[bucket] = bytearray(self.size)
+            index = h >> bits
+            rank = bits - (h & mask).bit_length() + 1
+            if rank > registers[index]:
+                registers[index] = rank
+            if rank > state.union[index]:
+                state.union[index] = rank
+        state.buckets.extend([bucket, registers] for bucket, registers in sorted(by_bucket.items()))
+        state.seen = None
+        self._recount(state)
+
+    @staticmethod
+    def _recount(state):
+        union = state.union
+        state.harmonic = sum([_INVERSE_POWERS[rank] for rank in union])
+        state.zeros = union.count(0)
+
+    def _sweep(self):
+        """Drop the least recently seen entities whose values all left the window"""
+        oldest = self.current - self.buckets + 1
+        entities = self.entities
+        while entities:
+            entity, state = next(iter(entities.items()))
+            if state.last >= oldest:
+                break
+            del entities[entity]
+
+    def count(self, entity):
+        """Distinct values of ``entity`` in the window ending at the newest bucket"""
+        state = self.entities.get(entity)
+        if state is None:
+            return 0
+        oldest = self.current - self.buckets + 1
+        if state.seen is not None:
+            self._expire_exact(state.seen, oldest)
+            return len(state.seen)
+        self._expire_dense(state, oldest)
+        if state.seen is not None:
+            return 0
+        return _hll_estimate(self.size, state.harmonic, state.zeros)
+
+    def sketch(self, entity):
+        """The entity's window as a HyperLogLog, for merging across workers"""
+        sketch = HyperLogLog(self.precision)
+        state = self.entities.get(entity)
+        if state is None:
+            return sketch
+        oldest = self.current - self.buckets + 1
+        if state.seen is not None:
+            self._expire_exact(state.seen, oldest)
+            for h in state.seen:
+                sketch.add_hash(h)
+        else:
+            self._expire_dense(state, oldest)
+            if state.union is not None:
+                sketch.registers = bytearray(state.union)
+        return sketch
+
+    def snapshot(self):
+        entities = []
+        for entity, state in self.entities.items():
+            buckets = None if state.buckets is None else [(bucket, bytes(registers)) for bucket, registers in state.buckets]
+            entities.append((entity, state.last, state.seen, buckets))
+        return {
+            'shape': (self.timeframe, self.buckets, self.precision),
+            'entities': entities,
+            'current': self.current,
+            'evictions': self.evictions
+        }
+
+    def restore(self, state):
+        if tuple(state['shape']) != (self.timeframe, self.buckets, self.precision):
+            raise ValueError(f"window shape changed from {tuple(state['shape'])}")
+        self.entities = OrderedDict()
+        for entity, last, seen, buckets in state['entities']:
+            item = self.entities[entity] = _DistinctSet()
+            item.last = last
+            if seen is not None:
+                item.seen = dict(seen)
+            else:
+                item.seen = None
+                item.buckets = deque([bucket, bytearray(registers)] for bucket, registers in buckets)
+                self._rebuild_union(item)
+        self.current = state['current']
+        self.evictions = state['evictions']
+
+    def stats(self):
+        dense = sum(1 for state in self.entities.values() if state.seen is None)
+        return {'entities': len(self.entities), 'dense': dense, 'evictions': self.evictions}
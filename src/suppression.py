@@ -0,0 +1,140 @@
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from .events import ENTITY_KEYS
+
+
+class _Entry:
+    __slots__ = ('alert', 'count', 'first', 'last')
+
+    def __init__(self, alert, now):
+        self.alert = alert
+        self.count = 1
+        self.first = now
+        self.last = now
+
+
+class AlertSuppressor:
+    """Folds repeated alerts into one per (type, rule, entity) and TTL window
+
+    The first alert with a fingerprint passes through and is cached; repeats
+    within ``ttl`` seconds of it only bump the cached count and last-seen
+    time. When the entry expires (or is evicted as least recently used once
+    ``max_entries`` are cached) and it had repeats, a summary is released:
+    a copy of the original alert with ``occurrences``, ``first_seen`` and
+    ``last_seen``. A long incident therefore produces one alert plus one
+    summary per ``ttl`` window. Entries expire in insertion order, so
+    expiry costs O(expired).
+    """
+
+    def __init__(self, ttl=300, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # fingerprint -> _Entry, least recently seen first
+        self.expiries = deque()  # (expires, fingerprint, entry) in insertion order
+        self._lock = threading.Lock()
+        self.passed = 0
+        self.suppressed = 0
+        self.evicted = 0
+        self.summaries = 0
+
+    def fingerprint(self, alert):
+        """(type, rule, entity) that repeats of an alert share
+
+        Alerts without an entity of their own take the host and user of
+        their event, so one signature firing for two attackers stays two
+        alerts. ML anomalies have no rule: the event's template id, or a
+        hash of its content, stands in for one.
+        """
+        alert_type = alert.get('type') or alert.get('detection_type')
+        rule = alert.get('rule_name')
+        if rule is None and 'signature_match' in alert:
+            rule = alert['signature_match'].get('signature')
+        entity = alert.get('entity')
+        event = alert.get('event')
+        if event is not None:
+            if entity is None:
+                entity = (ENTITY_KEYS['host'](event), ENTITY_KEYS['user'](event))
+            if rule is None:
+                rule = event.get('template_id')
+                if rule is None:
+                    rule = zlib.crc32(str(event.get('content', '')).encode('utf-8', 'surrogatepass'))
+        return (alert_type, rule, entity)
+
+    def filter(self, alerts, now=None):
+        """Return the alerts that should be emitted, plus any summaries now due"""
+        if now is None:
+            now = time.time()
+        released = []
+        with self._lock:
+            released.extend(self._expire(now))
+            for alert in alerts:
+                key = self.fingerprint(alert)
+                entry = self.entries.get(key)
+                if entry is not None:
+                    entry.count += 1
+                    entry.last = now
+                    self.entries.move_to_end(key)
+                    self.suppressed += 1
+                    continue
+                entry = self.entries[key] = _Entry(alert, now)
+                self.expiries.append((now + self.ttl, key, entry))
+                self.passed += 1
+                released.append(alert)
+                if len(self.entries) > self.max_entries:
+                    _, old_entry = self.entries.popitem(last=False)
+                    self.evicted += 1
+                    released.extend(self._summary(old_entry))
+        return released
+
+    def expire(self, now=None):
+        """Drop entries older than ``ttl`` and return summaries for those with repeats"""
+        with self._lock:
+            return self._expire(time.time() if now is None else now)
+
+    def _expire(self, now):
+        released = []
+        expiries = self.expiries
+        while expiries and expiries[0][0] <= now:
+            _, key, entry = expiries.popleft()
+            # Skip records of entries already evicted or replaced
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+                released.extend(self._summary(entry))
+        # Evicted entries leave stale expiry records behind; keep them bounded
+        if len(expiries) > 2 * self.max_entries:
+            self.expiries = deque(r for r in expiries if self.entries.get(r[1]) is r[2])
+        return released
+
+    def flush(self):
+        """Release summaries for every cached entry and clear the cache"""
+        with self._lock:
+            released = []
+            for entry in self.entries.values():
+                released.extend(self._summary(entry))
+            self.entries.clear()
+            self.expiries.clear()
+            return released
+
+    def _summary(self, entry):
+        if entry.count < 2:
+            return []
+        self.summaries += 1
+        return [dict(
+            entry.alert,
+            occurrences=entry.count,
+            first_seen=datetime.fromtimestamp(entry.first).isoformat(),
+            last_seen=datetime.fromtimestamp(entry.last).isoformat()
+        )]
+
+    def stats(self):
+        return {
+            'cached': len(self.entries),
+            'passed': self.passed,
+            'suppressed': self.suppressed,
+            'summaries': self.summaries,
+            'evicted': self.evicted
+        }
@@ -0,0 +1,161 @@
+import json
+import logging
+import os
+import threading
+
+
+class FileTailer:
+    """Incrementally read newly appended lines from log files
+
+    For every file the tailer keeps an open handle, its inode, the byte
+    offset read so far and any trailing bytes that are not yet terminated
+    by a newline. Only new bytes are read, in ``chunk_size`` pieces, and a
+    partial last line is held back until the rest of it arrives.
+
+    Rotation is detected by an inode change on the watched path: the rest of
+    the old file is drained from the still-open handle before the new file
+    is read from the beginning. A file that shrinks below the current
+    offset (copytruncate) is re-read from the start.
+
+    Offsets are checkpointed to ``checkpoint_path`` as JSON so a restart
+    resumes after the last complete line instead of re-emitting old data.
+    """
+
+    def __init__(self, checkpoint_path=None, chunk_size=65536, start_at_end=True,
+                 max_line_bytes=1024 * 1024):
+        self.logger = logging.getLogger(__name__)
+        self.checkpoint_path = checkpoint_path
+        self.chunk_size = chunk_size
+        self.start_at_end = start_at_end
+        self.max_line_bytes = max_line_bytes
+        self._files = {}
+        self._lock = threading.Lock()
+        self._saved = self.load_checkpoint()
+
+    def load_checkpoint(self):
+        """Read saved offsets, returning an empty mapping if there are none"""
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return {}
+        try:
+            with open(self.checkpoint_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Error loading tailer checkpoint {self.checkpoint_path}: {e}")
+            return {}
+
+    def checkpoint(self):
+        """Atomically write the offset of the last complete line of each file"""
+        if not self.checkpoint_path:
+            return
+        with self._lock:
+            offsets = dict(self._saved)
+            for path, state in self._files.items():
+                offsets[path] = {
+                    'inode': state['inode'],
+                    'offset': state['offset'] - len(state['partial'])
+                }
+        try:
+            os.makedirs(os.path.dirname(self.checkpoint_path) or '.', exist_ok=True)
+            tmp_path = f"{self.checkpoint_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(offsets, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.checkpoint_path)
+        except Exception as e:
+            self.logger.error(f"Error writing tailer checkpoint {self.checkpoint_path}: {e}")
+
+    def read_lines(self, path):
+        """Return the complete lines appended to path since the last call"""
+        with self._lock:
+            lines = []
+            state = self._files.get(path)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                # Renamed away and not recreated yet: finish the old file
+                if state:
+                    lines.extend(self._drain(state))
+                return lines
+
+            rotated = False
+            if state and state['inode'] != stat.st_ino:
+                lines.extend(self._drain(state, final=True))
+                state['handle'].close()
+                del self._files[path]
+                state = None
+                rotated = True
+
+            if state is None:
+                state = self._open(path, stat, rotated)
+                if state is None:
+                    return lines
+                self._files[path] = state
+            elif stat.st_size < state['offset']:
+                self.logger.info(f"Log file truncated, reading from start: {path}")
+                state['handle'].seek(0)
+                state['offset'] = 0
+                state['partial'] = b''
+
+            lines.extend(self._drain(state))
+            return lines
+
+    def _open(self, path, stat, rotated):
+        try:
+            handle = open(path, 'rb')
+        except OSError as e:
+            self.logger.error(f"Error opening log file {path}: {e}")
+            return None
+
+        state = {'handle': handle, 'inode': stat.st_ino, 'offset': 0, 'partial': b''}
+        saved = self._saved.pop(path, None)
+        if rotated:
+            pass
+        elif saved is not None:
+            # Resume from the checkpoint unless the file was replaced or truncated
+            if saved.get('inode') == stat.st_ino and saved.get('offset', 0) <= stat.st_size:
+                state['offset'] = saved['offset']
+        elif self.start_at_end and stat.st_size:
+            # Skip existing content, but keep an unterminated last line
+            tail_start = max(0, stat.st_size - self.chunk_size)
+            handle.seek(tail_start)
+            tail = handle.read(stat.st_size - tail_start)
+            newline = tail.rfind(b'\n')
+            if newline >= 0 or tail_start == 0:
+                state['partial'] = tail[newline + 1:]
+            state['offset'] = stat.st_size
+        handle.seek(state['offset'])
+        return state
+
+    def _drain(self, state, final=False):
+        lines = []
+        handle = state['handle']
+        partial = state['partial']
+        while True:
+            chunk = handle.read(self.chunk_size)
+            if not chunk:
+                break
+            state['offset'] += len(chunk)
+            parts = (partial + chunk).split(b'\n')
+            partial = parts.pop()
+            lines.extend(self._decode(part) for part in parts)
+            if len(partial) > self.max_line_bytes:
+                lines.append(self._decode(partial))
+                partial = b''
+        if final and partial:
+            lines.append(self._decode(partial))
+            partial = b''
+        state['partial'] = partial
+        return lines
+
+    @staticmethod
+    def _decode(raw):
+        return raw.rstrip(b'\r').decode('utf-8', errors='replace')
+
+    def close(self):
+        """Checkpoint offsets and close all open handles"""
+        self.checkpoint()
+        with self._lock:
+            for state in self._files.values():
+                state['handle'].close()
+            self._files.clear()
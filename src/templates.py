@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import re
+import threading
+
+WILDCARD = '<*>'
+_VARIABLE = re.compile(r'\d')
+
+
+class LogCluster:
+    """A learned template: tokens with WILDCARD where lines differ"""
+
+    __slots__ = ('template_id', 'source', 'tokens', 'size')
+
+    def __init__(self, template_id, source, tokens, size=1):
+        self.template_id = template_id
+        self.source = source
+        self.tokens = tokens
+        self.size = size
+
+    @property
+    def template(self):
+        return ' '.join(self.tokens)
+
+    def to_dict(self):
+        return {
+            'id': self.template_id,
+            'source': self.source,
+            'tokens': list(self.tokens),
+            'size': self.size
+        }
+
+
+class TemplateMiner:
+    """Streaming Drain-style log template miner
+
+    Lines are routed through a fixed-depth parse tree: first by token count,
+    then by their first ``depth - 2`` tokens (tokens containing digits, and
+    tokens beyond ``max_children`` per node, route to a wildcard child).
+    In the leaf, the line joins the most similar cluster if at least
+    ``similarity`` of its positions agree with the template, otherwise a new
+    cluster is created. Each source has its own tree; template ids are
+    unique integers across sources.
+    """
+
+    def __init__(self, depth=4, similarity=0.4, max_children=100):
+        if depth < 3:
+            raise ValueError("Template tree depth must be at least 3")
+        self.logger = logging.getLogger(__name__)
+        self.depth = depth
+        self.similarity = similarity
+        self.max_children = max_children
+        self.trees = {}
+        self.clusters = {}
+        self.next_id = 1
+        self._lock = threading.Lock()
+
+    def add(self, source, content):
+        """Assign content to a template, learning as needed
+
+        Returns ``(template_id, params)`` where params are the line's tokens
+        at the template's wildcard positions.
+        """
+        tokens = content.split()
+        with self._lock:
+            leaf = self._leaf(source, tokens)
+            cluster = self._best_match(leaf, tokens)
+            if cluster is None:
+                cluster = LogCluster(
+                    self.next_id, source,
+                    [WILDCARD if _VARIABLE.search(t) else t for t in tokens]
+                )
+                self.next_id += 1
+                self.clusters[cluster.template_id] = cluster
+                leaf.append(cluster)
+            else:
+                cluster.size += 1
+                template = cluster.tokens
+                for i, token in enumerate(tokens):
+                    if template[i] != token and template[i] != WILDCARD:
+                        template[i] = WILDCARD
+            params = [t for t, tt in zip(tokens, cluster.tokens) if tt == WILDCARD]
+            return cluster.template_id, params
+
+    def _leaf(self, source, tokens):
+        """Walk (and grow) the parse tree down to the cluster list for tokens"""
+        node = self.trees.setdefault(source, {})
+        node = node.setdefault(len(tokens), {})
+        for token in tokens[:self.depth - 2]:
+            if _VARIABLE.search(token):
+                token = WILDCARD
+            if token not in node and len(node) >= self.max_children:
+                token = WILDCARD
+            node = node.setdefault(token, {})
+        return node.setdefault(None, [])
+
+    def _best_match(self, leaf, tokens):
+        best = None
+        best_score = (-1.0, -1)
+        for cluster in leaf:
+            same = 0
+            wildcards = 0
+            for token, template in zip(tokens, cluster.tokens):
+                if template == WILDCARD:
+                    wildcards += 1
+                elif template == token:
+                    same += 1
+            score = (same / len(tokens) if tokens else 1.0, wildcards)
+            if score > best_score:
+                best, best_score = cluster, score
+        if best is not None and best_score[0] >= self.similarity:
+            return best
+        return None
+
+    def template(self, template_id):
+        cluster = self.clusters.get(template_id)
+        return cluster.template if cluster else None
+
+    def save(self, path):
+        """Atomically persist the template table as JSON"""
+        with self._lock:
+            data = {
+                'depth': self.depth,
+                'similarity': self.similarity,
+                'next_id': self.next_id,
+                'clusters': [c.to_dict() for c in self.clusters.values()]
+            }
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        """Reload a saved template table so a warm start skips relearning"""
+        if not os.path.exists(path):
+            return False
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            self.logger.error(f"Error loading templates from {path}: {e}")
+            return False
+        with self._lock:
+            self.trees = {}
+            self.clusters = {}
+            for item in data.get('clusters', []):
+                cluster = LogCluster(item['id'], item['source'], item['tokens'], item['size'])
+                self.clusters[cluster.template_id] = cluster
+                self._leaf(cluster.source, cluster.tokens).append(cluster)
+            self.next_id = max(data.get('next_id', 1), max(self.clusters, default=0) + 1)
+        self.logger.info(f"Loaded {len(self.clusters)} log templates from {path}")
+        return True
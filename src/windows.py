@@ -0,0 +1,56 @@
+import time
+from array import array
+from bisect import insort
+from collections import deque
+from datetime import datetime
+
+
+def to_epoch(timestamp):
+    """Convert an ISO 8601 string, datetime or epoch number to epoch seconds"""
+    if isinstance(timestamp, (int, float)):
+        return float(timestamp)
+    if isinstance(timestamp, datetime):
+        return timestamp.timestamp()
+    return datetime.fromisoformat(timestamp).timestamp()
+
+
+class SlidingWindowCounter:
+    """Count events whose timestamp lies within the trailing ``timeframe`` seconds
+
+    Timestamps are kept sorted in a deque and expired from the left, so
+    adding an event and reading the count cost O(1) amortized when events
+    arrive roughly in time order. Late events are inserted in place.
+    """
+
+    def __init__(self, timeframe):
+        self.timeframe = timeframe
+        self._times = deque()
+
+    def add(self, timestamp):
+        """Record an event at the given epoch timestamp"""
+        times = self._times
+        if not times or timestamp >= times[-1]:
+            times.append(timestamp)
+        else:
+            insort(times, timestamp)
+
+    def count(self, now=None):
+        """Number of recorded events newer than ``now - timeframe``"""
+        if now is None:
+            now = time.time()
+        cutoff = now - self.timeframe
+        times = self._times
+        while times and times[0] <= cutoff:
+            times.popleft()
+        return len(times)
+
+    def snapshot(self):
+        return array('d', self._times).tobytes()
+
+    def restore(self, state):
+        times = array('d')
+        times.frombytes(state)
+        self._times = deque(times)
+
+    def __len__(self):
+        return len(self._times)
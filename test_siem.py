@@ -1,12 +1,26 @@
 #!/usr/bin/env python3
 
+import os
 import time
 import json
 import logging
-from datetime import datetime
+from datetime import datetime, timezone
 from rich.console import Console
+from src.events import Event, pack_events, unpack_events
+from src.history import EventHistoryStore
+from src.minhash import NearDuplicateIndex
+from src.parsers import LineParser
+from src.analyzer import LogAnalyzer
+from src.archive import ArchiveReader, ArchiveWriter, event_record
+from src.checkpoint import CheckpointManager
+from src.cardinality import DistinctCountDetector
 from src.siem_core import AdvancedSIEM
-from queue import Queue
+from src.replay import LogReplayer
+from src.sequences import SequenceDetector, SequenceRule
+from src.sketches import DistinctWindowCounter, EntityWindowCounter
+from src.suppression import AlertSuppressor
+from src.tailer import FileTailer
+from src.windows import SlidingWindowCounter
 
 def generate_test_events():
     """Generate test events to verify detection capabilities"""
@@ -54,7 +68,7 @@ def test_siem():
         console.print("[green]✓[/green] SIEM initialized successfully")
     except Exception as e:
         console.print(f"[red]✗[/red] SIEM initialization failed: {str(e)}")
-        return False
+        raise
     
     # Test banner display
     try:
@@ -90,8 +104,8 @@ def test_siem():
         # Process test events
         for event in test_events:
             try:
-                # Add event to queue
-                siem.event_queue.put(event)
+                # Publish event to every subscribed engine
+                siem.event_bus.publish(event)
                 console.print(f"[yellow]Event added:[/yellow] {event['content'][:50]}...")
                 
                 # Give time for processing
@@ -103,13 +117,377 @@ def test_siem():
         # Wait for processing to complete
         console.print("\n[bold yellow]Waiting for event processing...[/bold yellow]")
         time.sleep(5)
-        
-        console.print("\n[bold green]Testing completed![/bold green]")
-        return True
+        delivered = siem.event_bus.stats()
         
     except Exception as e:
         console.print(f"\n[red]Error during testing:[/red] {str(e)}")
-        return False
+        raise
+
+    # Every subscriber must have seen every event
+    for name, stats in delivered.items():
+        assert stats['received'] == len(test_events), f"{name} missed events: {stats}"
+        console.print(f"[green]✓[/green] {name} received {stats['received']} events")
+    
+    console.print("\n[bold green]Testing completed![/bold green]")
+
+def test_tailer_rotation_truncation_and_checkpoint(tmp_path):
+    """The tailer resumes from its checkpoint and survives rotation and truncation"""
+    path = str(tmp_path / 'app.log')
+    checkpoint = str(tmp_path / 'offsets.json')
+    with open(path, 'w') as f:
+        f.write('a\nb\npar')
+    tailer = FileTailer(checkpoint_path=checkpoint, start_at_end=False)
+    assert tailer.read_lines(path) == ['a', 'b']
+    with open(path, 'a') as f:
+        f.write('tial\n')
+    assert tailer.read_lines(path) == ['partial']
+
+    # Lines written while stopped are read after a restart, and only those
+    with open(path, 'a') as f:
+        f.write('c\n')
+    tailer.close()
+    tailer = FileTailer(checkpoint_path=checkpoint, start_at_end=False)
+    assert tailer.read_lines(path) == ['c']
+
+    # Rotation: the rest of the old file comes before the new one
+    with open(path, 'a') as f:
+        f.write('d\n')
+    os.rename(path, path + '.1')
+    with open(path, 'w') as f:
+        f.write('e\n')
+    assert tailer.read_lines(path) == ['d', 'e']
+
+    # Truncation in place (copytruncate) re-reads from the start
+    with open(path, 'a') as f:
+        f.write('fghij\n')
+    assert tailer.read_lines(path) == ['fghij']
+    with open(path, 'w') as f:
+        f.write('k\n')
+    assert tailer.read_lines(path) == ['k']
+    tailer.close()
+    assert FileTailer(checkpoint_path=checkpoint, start_at_end=False).read_lines(path) == []
+
+def test_sliding_window_expiry():
+    """Events leave the window once older than the timeframe, late ones included"""
+    window = SlidingWindowCounter(60)
+    for ts in (100.0, 130.0, 110.0, 150.0):
+        window.add(ts)
+    assert window.count(now=150.0) == 4
+    # The cutoff is exclusive: an event exactly timeframe old has expired
+    assert window.count(now=160.0) == 3
+    assert window.count(now=185.0) == 2
+    restored = SlidingWindowCounter(60)
+    restored.restore(window.snapshot())
+    assert restored.count(now=185.0) == 2
+    assert restored.count(now=211.0) == 0
+
+def test_near_duplicate_counts_survive_restore():
+    """A restored index counts, adds and expires like the original"""
+    base = 'kernel audit denied write to /var/lib/app/data by process worker pid {} on node'
+    index = NearDuplicateIndex(window=60)
+    assert [index.add_and_count('system', base.format(n), 100.0 + n, now=100.0 + n)
+            for n in range(3)] == [1, 2, 3]
+    assert index.add_and_count('system', 'disk full on /dev/sda1', 103.0, now=103.0) == 1
+
+    restored = NearDuplicateIndex(window=60)
+    restored.restore(index.snapshot())
+    for copy in (index, restored):
+        # A repeat, then a new near-duplicate that needs the LSH buckets
+        assert copy.add_and_count('system', base.format(0), 104.0, now=104.0) == 4
+        assert copy.add_and_count('system', base.format(9), 105.0, now=105.0) == 5
+        # The first two events have left the window
+        assert copy.add_and_count('system', base.format(8), 161.5, now=161.5) == 4
+
+    def entries(near_duplicates):
+        tokens, counts, _, neighbours, times, _ = near_duplicates.snapshot()['system']
+        shingles = [frozenset(entry) for entry in tokens]
+        return times, {entry: (count, frozenset(shingles[i] for i in ids))
+                       for entry, count, ids in zip(shingles, counts, neighbours)}
+    assert entries(restored) == entries(index)
+
+def test_event_reads_like_a_dict_and_round_trips():
+    """Events answer dict lookups and survive a pack/unpack round-trip"""
+    event = Event.from_dict({
+        'timestamp': '2024-05-01T12:00:00',
+        'source': 'system',
+        'content': 'Failed login attempt from IP 10.0.0.5',
+        'severity': 'WARNING',
+        'host': '10.0.0.5'
+    })
+    assert event.ts == datetime(2024, 5, 1, 12).timestamp()
+    assert event['timestamp'] == '2024-05-01T12:00:00'
+    assert event['host'] == '10.0.0.5' and event.get('user') is None
+    assert 'template_id' not in event and 'file' not in event
+    assert set(event) == {'timestamp', 'source', 'content', 'severity', 'host'}
+    restored, = unpack_events(pack_events([event]))
+    assert restored.to_dict() == event.to_dict()
+
+def test_history_range_bounds():
+    """range keeps start <= ts < end across segments, late events and unsealed ones"""
+    history = EventHistoryStore(retention=10**6, segment_size=4)
+    events = [Event(float(ts), 'system' if ts % 3 else 'network', f'line {ts}')
+              for ts in list(range(20)) + [5.5, 20.0, 21.0]]
+    for event in events:
+        # The late 5.5 is sealed with 20 and 21 into the sixth segment
+        history.append(event)
+    history.append(Event(22.0, 'system', 'line 22'))
+    assert history.stats()['segments'] == 6
+    stored = sorted(events, key=lambda e: e.ts) + [history.latest(1)[0]]
+
+    def expected(start, end, source=None):
+        return [e.ts for e in stored if (start is None or e.ts >= start)
+                and (end is None or e.ts < end) and (source is None or e.source == source)]
+
+    for start, end in [(None, None), (4.0, 8.0), (5.5, 6.0), (None, 5.5), (7.0, None),
+                       (19.0, 22.0), (21.5, 30.0), (8.0, 8.0), (30.0, None)]:
+        for source in (None, 'network'):
+            found = [e.ts for e in history.range(start, end, source)]
+            assert found == expected(start, end, source), (start, end, source)
+
+def test_shipped_correlation_rules_fire():
+    """Each correlation rule joins its host-keyed and user-keyed alerts"""
+    def feed(analyzer, lines, start):
+        alerts = []
+        for i, content in enumerate(lines):
+            alerts.extend(analyzer.process_event(Event(start + i, 'system', content, 'WARNING')))
+        return [(a['rule_name'], a['entity']) for a in alerts if a['type'] == 'correlation']
+
+    now = time.time()
+    brute_force = ['Failed login attempt from IP 10.0.0.5 for user bob'] * 5
+    sudo = ['sudo su - root executed by user bob'] * 3
+    transfer = ['large file transfer of 900 MB to 203.0.113.7 by user bob'] * 2
+    analyzer = LogAnalyzer(None)
+    assert feed(analyzer, brute_force, now) == []
+    assert feed(analyzer, sudo, now + 10) == [('potential_attack', 'bob')]
+    assert feed(analyzer, transfer, now + 20) == [('data_breach', 'bob')]
+
+    # Alerts for unrelated entities do not correlate
+    analyzer = LogAnalyzer(None)
+    feed(analyzer, ['Failed login attempt from IP 10.0.0.9 for user alice'] * 5, now)
+    assert feed(analyzer, sudo, now + 10) == []
+
+def test_sequence_fires_in_order_and_times_out():
+    """A sequence completes per entity within max_gap and is dropped once a gap is exceeded"""
+    rule = SequenceRule('recon_then_exploit', [
+        {'name': 'scan', 'pattern': r'nmap'},
+        {'name': 'login', 'pattern': r'Accepted password'},
+        {'name': 'exploit', 'pattern': r'/bin/sh'}
+    ], key='host', max_gap=60)
+
+    def run(detector, steps):
+        return [alert for ts, ip, content in steps
+                for alert in detector.process(Event(ts, 'network', f"{content} from {ip}"))]
+
+    detector = SequenceDetector([rule])
+    alerts = run(detector, [(0, '10.0.0.5', 'nmap scan'), (10, '10.0.0.9', 'nmap scan'),
+                            (30, '10.0.0.5', 'Accepted password'), (40, '10.0.0.7', 'exec /bin/sh')])
+    assert alerts == []
+    # The partial match survives a checkpoint
+    restored = SequenceDetector([rule])
+    restored.restore(detector.snapshot())
+    alerts = run(restored, [(80, '10.0.0.5', 'exec /bin/sh')])
+    assert [(a['entity'], a['duration']) for a in alerts] == [('10.0.0.5', 80)]
+
+    # A step more than max_gap after the previous one does not continue the sequence
+    alerts = run(detector, [(100, '10.0.0.9', 'Accepted password'), (110, '10.0.0.9', 'exec /bin/sh')])
+    assert alerts == []
+    assert run(detector, [(300, '10.0.0.5', 'exec /bin/sh')]) == []
+    assert detector.active_matches() == 0
+
+def test_suppression_keeps_distinct_anomalies():
+    """Unrelated ML anomalies from one source are not folded into one alert"""
+    suppressor = AlertSuppressor(ttl=300)
+    now = time.time()
+    anomalies = [
+        {
+            'event': Event(now, 'system', content, 'WARNING'),
+            'detection_type': 'ml',
+            'anomaly_score': 0.95,
+            'timestamp': datetime.fromtimestamp(now).isoformat(),
+            'severity': 'HIGH'
+        }
+        for content in ('Kernel module loaded from /tmp/x.ko', 'Disk /dev/sda1 read-only remount')
+    ]
+    assert suppressor.filter(anomalies, now=now) == anomalies
+    # A repeat of the first anomaly is still folded
+    assert suppressor.filter([dict(anomalies[0])], now=now + 1) == []
+
+def test_replay_drops_lines_live_collection_would(tmp_path):
+    """Replay applies the source's collector keywords unless told not to"""
+    path = str(tmp_path / 'system.log')
+    with open(path, 'w') as f:
+        f.write('[2024-03-20 10:00:00] Failed login attempt from IP 10.0.0.5\n'
+                '[2024-03-20 10:00:01] health check ok\n')
+    for filter_keywords, events in ((True, 1), (False, 2)):
+        replayer = LogReplayer(alert_path=str(tmp_path / 'alerts.ndjson'), analyzer=False, ai=False,
+                               filter_keywords=filter_keywords)
+        stats = replayer.replay([path])
+        assert (stats['events'], stats['filtered']) == (events, 2 - events)
+
+def test_line_parser_formats():
+    """Each format yields its time, severity, message and entity fields"""
+    local = datetime(2024, 3, 20, 10, 15, 23).timestamp()
+    utc = datetime(2024, 3, 20, 10, 15, 23, tzinfo=timezone.utc).timestamp()
+    cases = [
+        ('{"@timestamp": "2024-03-20T10:15:23Z", "level": "ERROR", "msg": "db failed", "src_ip": "10.0.0.7", "dst_port": 5432}',
+         utc, 'ERROR', 'db failed', {'level': 'error', 'ip': '10.0.0.7', 'dst_port': '5432', 'format': 'json'}),
+        ('<38>1 2024-03-20T10:15:23Z web1 sudo - - - bob : TTY=pts/0 ; USER=root ; COMMAND=/bin/bash',
+         utc, 'INFO', 'bob : TTY=pts/0 ; USER=root ; COMMAND=/bin/bash',
+         {'hostname': 'web1', 'program': 'sudo', 'user': 'bob', 'format': 'syslog'}),
+        ('Mar 20 10:15:23 web1 sshd[42]: Failed password for alice from 10.0.0.5 port 22 ssh2',
+         local, 'ERROR', 'Failed password for alice from 10.0.0.5 port 22 ssh2',
+         {'hostname': 'web1', 'program': 'sshd', 'pid': '42', 'ip': '10.0.0.5', 'user': 'alice', 'format': 'syslog'}),
+        ('10.0.0.5 - alice [20/Mar/2024:10:15:23 +0000] "GET /admin HTTP/1.1" 403 512 "-" "curl/8.0"',
+         utc, 'WARNING', '"GET /admin HTTP/1.1" 403 512 "-" "curl/8.0"',
+         {'ip': '10.0.0.5', 'status': 403, 'user': 'alice', 'format': 'nginx'}),
+        ('[2024-03-20 10:15:23] WARNING: disk failed', local, 'WARNING', 'disk failed',
+         {'level': 'warning', 'format': 'bracket'}),
+        ('critical: plain failed line', 1.0, 'CRITICAL', 'critical: plain failed line', {'format': 'plain'}),
+    ]
+    parser = LineParser(keywords=['failed', 'error', 'sudo', '403'], year=2024)
+    for line, ts, severity, content, attrs in cases:
+        event = parser.parse(line, 'system', default_ts=1.0)
+        assert (event.ts, event.severity, event.content, event.attrs) == (ts, severity, content, attrs), line
+    assert parser.parse('[2024-03-20 10:15:23] INFO: all good', 'system') is None
+    assert parser.stats == {'lines': 7, 'events': 6, 'unparsed': 1}
+
+def test_entity_window_counts_and_threshold():
+    """Per-entity counts stay exact for hot and sketched keys and expire by bucket"""
+    window = EntityWindowCounter(100, buckets=10, max_exact=2)
+    assert [window.add('10.0.0.5', 1000.0 + i) for i in range(5)] == [1, 2, 3, 4, 5]
+    for i in range(50):
+        window.add(f"10.1.0.{i}", 1005.0)
+    assert [window.add('10.0.0.6', 1006.0) for _ in range(3)] == [1, 2, 3]
+    assert window.count('10.0.0.5') == 5 and window.count('10.1.0.7') == 1
+    assert window.top(1) == [('10.0.0.5', 5)]
+    # The bucket holding 1000-1009 leaves the window once 1100 is reached
+    assert window.add('10.0.0.5', 1095.0) == 6
+    assert window.add('10.0.0.5', 1101.0) == 2
+    assert window.count('10.0.0.6') == 0
+
+    # brute_force alerts on the fifth failure from one IP, not across IPs
+    analyzer = LogAnalyzer(None)
+    now = time.time()
+    failures = [f"Failed login attempt from IP 10.0.0.{5 + i % 2}" for i in range(9)]
+    alerts = [alert for i, content in enumerate(failures)
+              for alert in analyzer.analyze_patterns(Event(now + i, 'system', content))]
+    assert [(a['entity'], a['matched_events']) for a in alerts] == [('10.0.0.5', 5)]
+
+def test_distinct_window_counts_and_threshold():
+    """Distinct counts are exact up to exact_limit, estimated beyond, and expire"""
+    window = DistinctWindowCounter(100, buckets=5, exact_limit=32)
+    counts = [window.add('10.0.0.9', port, 1000.0) for port in range(32)]
+    assert counts == list(range(1, 33))
+    assert window.add('10.0.0.9', 5, 1001.0) == 32
+    for port in range(32, 2000):
+        estimate = window.add('10.0.0.9', port, 1002.0)
+    assert abs(estimate - 2000) < 0.15 * 2000
+    restored = DistinctWindowCounter(100, buckets=5, exact_limit=32)
+    restored.restore(window.snapshot())
+    assert restored.count('10.0.0.9') == window.count('10.0.0.9')
+    # Past the last bucket holding its values the entity starts from nothing
+    assert window.add('10.0.0.9', 1, 1100.0) == 1
+    assert window.add('10.0.0.8', 1, 1200.0) == 1
+    assert window.count('10.0.0.9') == 0
+
+    # password_spray fires once one IP has failed logins for ten users
+    detector = DistinctCountDetector()
+    now = time.time()
+    alerts = []
+    for i in range(12):
+        content = f"Failed password for invalid user user{i % 11} from 10.0.0.9 port 22 ssh2"
+        alerts.append(detector.process(Event(now + i, 'auth', content)))
+    assert [len(found) for found in alerts] == [0] * 9 + [1, 1, 1]
+    assert [(a['rule_name'], a['entity'], a['distinct_count']) for a in alerts[-1]] == \
+        [('password_spray', '10.0.0.9', 11)]
+    assert detector.process(Event(now + 20, 'auth', "Failed password for root from 10.0.0.7")) == []
+
+class _State:
+    def __init__(self, state=None):
+        self.state = state
+        self.broken = False
+
+    def snapshot(self):
+        if self.broken:
+            raise RuntimeError("snapshot failed")
+        return self.state
+
+    def restore(self, state):
+        self.state = state
+
+
+def test_checkpoint_sections_survive_corruption_and_failed_snapshots(tmp_path, caplog):
+    """A corrupt section is skipped on load; a failed snapshot keeps the last good copy"""
+    path = str(tmp_path / 'checkpoint.bin')
+    manager = CheckpointManager(path, interval=0)
+    history, analyzer = _State({'events': [1, 2, 3]}), _State({'alerts': ['a']})
+    manager.register('history', history)
+    manager.register('analyzer', analyzer)
+    assert manager.save()
+    analyzer.state = {'alerts': ['a', 'b']}
+    analyzer.broken = True
+    with caplog.at_level(logging.WARNING, logger='src.checkpoint'):
+        assert manager.save()
+    assert "Could not snapshot analyzer, keeping its previous state" in caplog.text
+
+    loaded = CheckpointManager(path, interval=0)
+    assert loaded.load()
+    restored = _State()
+    assert loaded.register('analyzer', restored)
+    assert restored.state == {'alerts': ['a']}
+    # history is not registered yet: its loaded section is written back as is
+    assert loaded.save()
+
+    # Flip a byte inside the analyzer section's payload
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    data[data.index(b'analyzer') + len('analyzer') + 2] ^= 0xFF
+    with open(path, 'wb') as f:
+        f.write(data)
+    caplog.clear()
+    reloaded = CheckpointManager(path, interval=0)
+    with caplog.at_level(logging.WARNING, logger='src.checkpoint'):
+        assert reloaded.load()
+    assert "Skipping corrupt section 'analyzer'" in caplog.text
+    history, analyzer = _State(), _State()
+    assert reloaded.register('history', history)
+    assert not reloaded.register('analyzer', analyzer)
+    assert history.state == {'events': [1, 2, 3]} and analyzer.state is None
+
+def test_archive_queries_prune_partitions_and_segments(tmp_path):
+    """Queries only open partitions and segments their time range and source allow"""
+    base = 1700000000 // 3600 * 3600
+    writer = ArchiveWriter(str(tmp_path), 'events', segment_rows=10)
+    # Per hour: a segment of ten system events, then one of ten auth events
+    for hour in range(3):
+        for i in range(20):
+            source = 'system' if i < 10 else 'auth'
+            content = f"Failed password for admin {i}" if source == 'auth' else f"disk check {i}"
+            writer.add(event_record(Event(base + hour * 3600 + i * 60, source, content)))
+    # A late event lands in its own hour as a third, overlapping segment
+    writer.add(event_record(Event(base + 30, 'system', "late disk check", severity='HIGH')))
+    writer.flush()
+    reader = ArchiveReader(str(tmp_path))
+
+    found = list(reader.query(start=base + 3600, end=base + 7200))
+    assert [event.ts for event in found] == [base + 3600 + i * 60 for i in range(20)]
+    assert reader.last_scan['partitions_pruned'] == 2 and reader.last_scan['segments'] == 2
+
+    found = list(reader.query(start=base + 4200, end=base + 7200, source='auth'))
+    assert [event.content for event in found] == [f"Failed password for admin {i}" for i in range(10, 20)]
+    assert reader.last_scan['segments'] == 1 and reader.last_scan['segments_pruned'] == 1
+
+    found = list(reader.query(start=base, end=base + 120))
+    assert [(event.ts, event.content) for event in found] == [
+        (base, "disk check 0"), (base + 30, "late disk check"), (base + 60, "disk check 1")]
+    assert reader.last_scan['segments'] == 2 and reader.last_scan['segments_pruned'] == 1
+
+    assert reader.count(contains="Failed password") == 30
+    assert reader.last_scan['segments_pruned'] == 0
+    assert reader.count(source='system', severity='HIGH') == 1
+    assert [event.ts for event in reader.query(source='auth', limit=3)] == [base + 600, base + 660, base + 720]
+    assert reader.count(start=base + 3 * 3600) == 0
+    assert reader.last_scan['partitions_pruned'] == 3
 
 if __name__ == "__main__":
     # Set up logging